@@ -0,0 +1,42 @@
+"""Benchmark the peak memory (RSS) and time of :meth:`~pylinac.ct.CatPhan504.analyze` in each precision mode
+of :func:`~pylinac.settings.set_precision`. Each mode is run in a fresh process since the peak RSS of a process
+only ever grows.
+
+Run as a script: ``python benchmarks/bench_ct_precision.py [path/to/catphan.zip]``.
+"""
+import os.path as osp
+import resource
+import subprocess
+import sys
+import time
+
+DEFAULT_ZIP = osp.join(osp.dirname(osp.dirname(osp.abspath(__file__))), 'tests_basic', 'test_files', 'CBCT', 'CBCT_4.zip')
+MODES = ('float64', 'float32', 'int16')
+
+
+def measure(zip_path, precision):
+    """Load and analyze the dataset in the current process; print the peak RSS in MB and the time in s."""
+    from pylinac import settings
+    from pylinac.ct import CatPhan504
+    settings.set_precision(precision)
+    start = time.perf_counter()
+    cbct = CatPhan504.from_zip(zip_path)
+    cbct.analyze()
+    duration = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kB on Linux
+    print(peak_rss, duration, cbct.ctp486.uniformity_index, cbct.ctp528.mtf(50))
+
+
+def run(zip_path=DEFAULT_ZIP):
+    for precision in MODES:
+        output = subprocess.check_output([sys.executable, __file__, zip_path, precision], universal_newlines=True)
+        peak_rss, duration, uniformity_index, mtf50 = (float(val) for val in output.split()[-4:])
+        print("{:>8}: peak RSS {:7.1f}MB; time {:5.2f}s; uniformity index {:6.2f}; MTF 50% {:4.2f}".format(
+            precision, peak_rss, duration, uniformity_index, mtf50))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        measure(*sys.argv[1:])
+    else:
+        run(*sys.argv[1:])
@@ -0,0 +1,31 @@
+"""Benchmark the whole-array vs tiled & threaded image filters of :meth:`~pylinac.core.image.BaseImage.filter`.
+
+Run as a script: ``python benchmarks/bench_image_filter.py``.
+"""
+import timeit
+
+import numpy as np
+
+from pylinac.core import image
+
+SHAPE = (4000, 3000)  # roughly a 0.1mm-resolution scanned film
+FILTERS = (('median', 5), ('fast_median', 5), ('gaussian', 2))
+
+
+def run():
+    array = np.random.RandomState(0).rand(*SHAPE).astype(np.float32)
+    for kind, size in FILTERS:
+        def whole():
+            image.load(array).filter(size, kind=kind)
+
+        def tiled():
+            image.load(array).filter(size, kind=kind, tile_size=512)
+
+        whole_time = min(timeit.repeat(whole, number=1, repeat=3))
+        tiled_time = min(timeit.repeat(tiled, number=1, repeat=3))
+        print("{:>12} (size {}): whole {:6.3f}s; tiled {:6.3f}s; speedup {:4.1f}x".format(
+            kind, size, whole_time, tiled_time, whole_time / tiled_time))
+
+
+if __name__ == '__main__':
+    run()
@@ -12,10 +12,10 @@ if sys.version_info[0] < 3 or sys.version_info[1] < 6:
 from pylinac.ct import CatPhan504, CatPhan600, CatPhan503, CatPhan604
 from pylinac.core import decorators, geometry, image, io, mask, profile, roi, utilities
 from pylinac.core.utilities import clear_data_files, assign2machine
-from pylinac.flatsym import FlatSym
+from pylinac.flatsym import FlatSym, FlatSymSeries
 from pylinac.planar_imaging import LeedsTOR, StandardImagingQC3, LasVegas
 from pylinac.log_analyzer import load_log, Dynalog, TrajectoryLog, MachineLogs
-from pylinac.picketfence import PicketFence  # must be after log analyzer
+from pylinac.picketfence import PicketFence, PicketFenceSeries  # must be after log analyzer
 from pylinac.starshot import Starshot
 from pylinac.vmat import DRMLC, DRGS
 from pylinac.winston_lutz import WinstonLutz
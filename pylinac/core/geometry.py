@@ -5,6 +5,7 @@ from typing import Union, Optional, List, Iterable, Tuple
 
 import numpy as np
 import matplotlib.pyplot as plt
+from scipy import optimize
 from matplotlib.patches import Circle as mpl_Circle
 from matplotlib.patches import Rectangle as mpl_Rectangle
 
@@ -325,6 +326,112 @@ class Line:
         axes.plot((self.point1.x, self.point2.x), (self.point1.y, self.point2.y), linewidth=width, color=color)
 
 
+def lines_as_arrays(lines: Iterable[Line]) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the first and second points of the lines as two (N, 3) arrays. Used with :func:`distances_to_lines`."""
+    lines = list(lines)
+    starts = np.array([line.point1.as_array() for line in lines], dtype=float)
+    ends = np.array([line.point2.as_array() for line in lines], dtype=float)
+    return starts, ends
+
+
+def distances_to_lines(point: Union[Point, np.ndarray], starts: np.ndarray, ends: np.ndarray,
+                       gradient: bool=False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+    """Calculate the minimum distances from a point to N infinite lines in one call.
+    This is the vectorized equivalent of calling :meth:`Line.distance_to` for each line.
+
+    Parameters
+    ----------
+    point : Point, array
+        The point to calculate distances from. If an array, a 2 element array is treated as (x, y, 0).
+    starts : numpy.ndarray
+        The first point of each line as an (N, 3) array.
+    ends : numpy.ndarray
+        The second point of each line as an (N, 3) array.
+    gradient : bool
+        If True, the gradient of each distance with respect to the point coordinates is also returned
+        as an (N, 3) array.
+    """
+    point = _as_xyz(point)
+    directions = ends - starts
+    directions /= np.sqrt(np.sum(directions ** 2, axis=1))[:, np.newaxis]
+    offsets = point - starts
+    # remove the component along the line; what's left is the perpendicular vector from line to point
+    perpendiculars = offsets - np.sum(offsets * directions, axis=1)[:, np.newaxis] * directions
+    distances = np.sqrt(np.sum(perpendiculars ** 2, axis=1))
+    if not gradient:
+        return distances
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gradients = np.where(distances[:, np.newaxis] > 0, perpendiculars / distances[:, np.newaxis], 0)
+    return distances, gradients
+
+
+def distances_to_points(point: Union[Point, np.ndarray], points: np.ndarray,
+                        gradient: bool=False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+    """Calculate the distances from a point to N points (or vector tips) in one call.
+    This is the vectorized equivalent of calling :meth:`Vector.distance_to` for each vector.
+
+    Parameters
+    ----------
+    point : Point, array
+        The point to calculate distances from. If an array, a 2 element array is treated as (x, y, 0).
+    points : numpy.ndarray
+        The other points as an (N, 3) array.
+    gradient : bool
+        If True, the gradient of each distance with respect to the point coordinates is also returned
+        as an (N, 3) array.
+    """
+    offsets = _as_xyz(point) - points
+    distances = np.sqrt(np.sum(offsets ** 2, axis=1))
+    if not gradient:
+        return distances
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gradients = np.where(distances[:, np.newaxis] > 0, offsets / distances[:, np.newaxis], 0)
+    return distances, gradients
+
+
+def minimax_point_to_lines_2d(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Find the point in the x-y plane whose maximum distance to N lines is smallest, i.e. the center and radius of the
+    smallest circle that touches all the lines. The distance to a line in 2D is an absolute linear function of the
+    point, so the problem is solved exactly as a linear program.
+
+    Parameters
+    ----------
+    starts : numpy.ndarray
+        The first point of each line as an (N, 2) or (N, 3) array. Only x and y are used.
+    ends : numpy.ndarray
+        The second point of each line, like ``starts``.
+
+    Returns
+    -------
+    center : numpy.ndarray
+        The (x, y) location of the minimax point.
+    radius : float
+        The maximum distance from the center to any line.
+    """
+    directions = ends[:, :2] - starts[:, :2]
+    normals = np.column_stack((-directions[:, 1], directions[:, 0]))
+    normals /= np.sqrt(np.sum(normals ** 2, axis=1))[:, np.newaxis]
+    offsets = np.sum(normals * starts[:, :2], axis=1)
+    # minimize r subject to -r <= normal . p - offset <= r for every line
+    ones = np.ones((len(normals), 1))
+    a_ub = np.vstack((np.hstack((normals, -ones)), np.hstack((-normals, -ones))))
+    b_ub = np.concatenate((offsets, -offsets))
+    result = optimize.linprog(c=[0, 0, 1], A_ub=a_ub, b_ub=b_ub, bounds=[(None, None), (None, None), (0, None)])
+    if not result.success:
+        raise ValueError("Unable to find the minimax point of the lines: {}".format(result.message))
+    return result.x[:2], float(result.x[2])
+
+
+def _as_xyz(point: Union[Point, np.ndarray]) -> np.ndarray:
+    """Convert a Point or 2/3-element array to a 3-element float array."""
+    if isinstance(point, Point):
+        return point.as_array().astype(float)
+    point = np.asarray(point, dtype=float)
+    if point.size == 2:
+        point = np.append(point, 0.0)
+    return point
+
+
 class Rectangle:
     """A rectangle with width, height, center Point, top-left corner Point, and bottom-left corner Point."""
     width: Union[int, float]
@@ -1,13 +1,16 @@
 """This module holds classes for image loading and manipulation."""
+import concurrent.futures
 import copy
 from collections import Counter
 from datetime import datetime
 from functools import lru_cache
 from io import BytesIO
+from itertools import chain
+import multiprocessing
 import re
 import os.path as osp
 import os
-from typing import Union, Sequence, List, Any, Tuple, Optional
+from typing import Union, Sequence, List, Any, Tuple, Optional, Iterable
 
 import pydicom
 from pydicom.errors import InvalidDicomError
@@ -24,7 +27,7 @@ from .geometry import Point
 from .io import get_url, TemporaryZipDirectory, retrieve_filenames, is_dicom_image, retrieve_dicom_file
 from .profile import stretch as stretcharray
 from .typing import NumberLike
-from ..settings import get_dicom_cmap
+from ..settings import get_dicom_cmap, get_image_dtype
 
 ARRAY = 'Array'
 DICOM = 'DICOM'
@@ -179,6 +182,8 @@ def load_url(url: str, progress_bar: bool=True, **kwargs):
 def load_multiples(image_file_list: List, method: str='mean', stretch: bool=True, **kwargs) -> ImageLike:
     """Combine multiple image files into one superimposed image.
 
+    The images are loaded and combined one at a time, so only the first image and the running combination are held in memory.
+
     Parameters
     ----------
     image_file_list : list
@@ -198,30 +203,141 @@ def load_multiples(image_file_list: List, method: str='mean', stretch: bool=True
         >>> paths = ['starshot1.tif', 'starshot2.tif']
         >>> superimposed_img = load_multiples(paths)
     """
-    # load images
-    img_list = [load(path, **kwargs) for path in image_file_list]
-    first_img = img_list[0]
+    first_img = load(image_file_list[0], **kwargs)
+    other_imgs = (load(path, **kwargs) for path in image_file_list[1:])
+    # replace array of first object and return
+    first_img.array = superimpose(chain((first_img,), other_imgs), method=method, stretch=stretch)
+    first_img.check_inversion()
+    return first_img
+
+
+def superimpose(images: Iterable[ImageLike], method: str='mean', stretch: bool=True) -> np.ndarray:
+    """Combine the arrays of images into one superimposed array.
+
+    The images are consumed one at a time and added to a running combination, so an iterator of images that are loaded
+    lazily (e.g. a generator) never has more than one image in memory. The combination is the same as stacking the
+    arrays and taking the mean, max, or sum along the stack.
+
+    Parameters
+    ----------
+    images : iterable of images
+        The images to be superimposed. The first image sets the shape and, if stretching, the data type to stretch to.
+    method : {'mean', 'max', 'sum'}
+        A string specifying how the image values should be combined.
+    stretch : bool
+        Whether to normalize the images being combined by stretching their high/low values to the same values across images.
+        Each image's array is stretched in place.
 
-    # check that all images are the same size and stretch if need be
-    for img in img_list:
+    Returns
+    -------
+    ndarray
+    """
+    if method not in ('mean', 'max', 'sum'):
+        raise ValueError("Method must be one of 'mean', 'max', or 'sum'; got {}".format(method))
+    images = iter(images)
+    first_img = next(images)
+    if stretch:
+        first_img.array = stretcharray(first_img.array, fill_dtype=first_img.array.dtype)
+    if method == 'max':
+        combined_arr = first_img.array.copy()
+    else:
+        # accumulate in the same type numpy uses to sum or average the array type
+        reduce = np.mean if method == 'mean' else np.sum
+        combined_arr = first_img.array.astype(reduce(first_img.array[:1, :1]).dtype)
+    num_images = 1
+    for img in images:
+        # check that all images are the same size and stretch if need be
         if img.shape != first_img.shape:
             raise ValueError("Images were not the same shape")
         if stretch:
             img.array = stretcharray(img.array, fill_dtype=first_img.array.dtype)
-
-    # stack and combine arrays
-    new_array = np.dstack(tuple(img.array for img in img_list))
+        if method == 'max':
+            np.maximum(combined_arr, img.array, out=combined_arr)
+        else:
+            combined_arr += img.array
+        num_images += 1
     if method == 'mean':
-        combined_arr = np.mean(new_array, axis=2)
-    elif method == 'max':
-        combined_arr = np.max(new_array, axis=2)
-    elif method == 'sum':
-        combined_arr = np.sum(new_array, axis=2)
+        combined_arr /= num_images
+    return combined_arr
 
-    # replace array of first object and return
-    first_img.array = combined_arr
-    first_img.check_inversion()
-    return first_img
+
+def downsample(array: np.ndarray, factor: int) -> np.ndarray:
+    """Downsample a 2D array by averaging blocks of ``factor`` x ``factor`` pixels.
+    Trailing rows and columns that do not fill a whole block are dropped.
+
+    Parameters
+    ----------
+    array : numpy.ndarray
+        The 2D array to downsample.
+    factor : int
+        The edge length of the averaged blocks. A factor of 1 or less returns the array as-is.
+    """
+    factor = int(factor)
+    if factor <= 1:
+        return array
+    rows, cols = (array.shape[0] // factor) * factor, (array.shape[1] // factor) * factor
+    return array[:rows, :cols].reshape(rows // factor, factor, cols // factor, factor).mean(axis=(1, 3))
+
+
+def _filter_array(array: np.ndarray, size: NumberLike, kind: str) -> np.ndarray:
+    """Apply the given filter kind to an array. See :meth:`~pylinac.core.image.BaseImage.filter`."""
+    if kind == 'median':
+        return ndimage.median_filter(array, size=size)
+    elif kind == 'fast_median':
+        # separable approximation: a row median followed by a column median. Costs O(size) per pixel vs O(size**2)
+        size = int(round(size))
+        return ndimage.median_filter(ndimage.median_filter(array, size=(1, size)), size=(size, 1))
+    elif kind == 'gaussian':
+        return ndimage.gaussian_filter(array, sigma=size)
+
+
+def _filter_halo(size: NumberLike, kind: str) -> int:
+    """The number of neighboring pixels a filter of the given kind & size reaches on each side of a pixel."""
+    if kind == 'gaussian':
+        # scipy truncates the gaussian kernel at 4 sigma
+        return int(4.0 * float(size) + 0.5) + 1
+    return int(np.ceil(size)) // 2 + 1
+
+
+def _filter_tiled(array: np.ndarray, size: NumberLike, kind: str, tile_size: int=512, workers: int=None) -> np.ndarray:
+    """Filter an array by splitting it into tiles padded by a halo of neighboring pixels and filtering the tiles
+    on a thread pool. The scipy.ndimage filters release the GIL, so the tiles are filtered concurrently.
+    The result is identical to filtering the whole array at once.
+
+    Parameters
+    ----------
+    array : numpy.ndarray
+        The 2D array to filter.
+    size : int, float
+        The filter size in pixels; for a gaussian filter this is sigma.
+    kind : {'median', 'fast_median', 'gaussian'}
+        The kind of filter.
+    tile_size : int
+        The edge length of the (unpadded) square tiles in pixels.
+    workers : int, None
+        The number of threads to use. If None, uses the number of CPUs.
+    """
+    if tile_size < 1:
+        raise ValueError("Tile size must be a positive integer")
+    workers = workers or multiprocessing.cpu_count()
+    halo = _filter_halo(size, kind)
+    output = np.empty_like(array)
+    n_rows, n_cols = array.shape
+
+    def filter_tile(row: int, col: int):
+        row_end, col_end = min(row + tile_size, n_rows), min(col + tile_size, n_cols)
+        # pad the tile with real neighbor pixels; at the array border ndimage's reflection matches the whole-array case
+        pad_row, pad_col = max(row - halo, 0), max(col - halo, 0)
+        padded = array[pad_row:min(row_end + halo, n_rows), pad_col:min(col_end + halo, n_cols)]
+        filtered = _filter_array(padded, size, kind)
+        output[row:row_end, col:col_end] = filtered[row - pad_row:row_end - pad_row, col - pad_col:col_end - pad_col]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(filter_tile, row, col)
+                   for row in range(0, n_rows, tile_size) for col in range(0, n_cols, tile_size)]
+        for future in futures:
+            future.result()  # re-raise any exception from the thread
+    return output
 
 
 def _is_dicom(path: str) -> bool:
@@ -328,8 +444,9 @@ class BaseImage:
             plt.show()
         return ax
 
-    @value_accept(kind=('median', 'gaussian'))
-    def filter(self, size: Union[float, int]=0.05, kind: str='median'):
+    @value_accept(kind=('median', 'fast_median', 'gaussian'))
+    def filter(self, size: Union[float, int]=0.05, kind: str='median', tile_size: Optional[int]=None,
+               workers: Optional[int]=None):
         """Filter the profile.
 
         Parameters
@@ -339,8 +456,17 @@ class BaseImage:
             If a float, the size is the ratio of the length. Must be in the range 0-1.
             E.g. if size=0.1 for a 1000-element array, the filter will be 100 elements.
             If an int, the filter is the size passed.
-        kind : {'median', 'gaussian'}
+        kind : {'median', 'fast_median', 'gaussian'}
             The kind of filter to apply. If gaussian, *size* is the sigma value.
+            ``fast_median`` is a separable approximation of the median filter (a median along the rows followed by a
+            median along the columns); it is much faster for large filter sizes.
+        tile_size : int, None
+            If given, the image is split into square tiles of this many pixels, each padded with enough neighboring
+            pixels for the filter, and the tiles are filtered concurrently on a thread pool. The result is identical
+            to filtering the whole image; this is simply faster for large images such as scanned film.
+        workers : int, None
+            The number of threads used for tiled filtering. If passed without ``tile_size``, a tile size
+            of 512 pixels is used. If None (default), the number of CPUs is used.
         """
         if isinstance(size, float):
             if 0 < size < 1:
@@ -349,10 +475,10 @@ class BaseImage:
             else:
                 raise TypeError("Float was passed but was not between 0 and 1")
 
-        if kind == 'median':
-            self.array = ndimage.median_filter(self.array, size=size)
-        elif kind == 'gaussian':
-            self.array = ndimage.gaussian_filter(self.array, sigma=size)
+        if tile_size is not None or workers is not None:
+            self.array = _filter_tiled(self.array, size, kind, tile_size=tile_size or 512, workers=workers)
+        else:
+            self.array = _filter_array(self.array, size, kind)
 
     @type_accept(pixels=int)
     def crop(self, pixels: int=15, edges: Tuple[str, ...]=('top', 'bottom', 'left', 'right')):
@@ -692,7 +818,22 @@ class DicomImage(BaseImage):
             self.array = ds.pixel_array
         # convert values to proper HU: real_values = slope * raw + intercept
         if self.metadata.SOPClassUID.name == 'CT Image Storage':
-            self.array = int(self.metadata.RescaleSlope)*self.array + int(self.metadata.RescaleIntercept)
+            ct_dtype = get_image_dtype()
+            if ct_dtype is None:
+                self.array = int(self.metadata.RescaleSlope)*self.array + int(self.metadata.RescaleIntercept)
+            elif np.issubdtype(ct_dtype, np.integer):
+                # rescale in a wide type; the values must fit the narrow type before it is cast
+                rescaled = int(self.metadata.RescaleSlope)*self.array.astype(np.int32) + int(self.metadata.RescaleIntercept)
+                limits = np.iinfo(ct_dtype)
+                if rescaled.min() < limits.min or rescaled.max() > limits.max:
+                    raise ValueError(f"The rescaled values of {path} ({rescaled.min()} to {rescaled.max()}) are outside "
+                                     f"the range of {np.dtype(ct_dtype).name}; use a floating point precision instead")
+                self.array = rescaled.astype(ct_dtype)
+            else:
+                # rescale in place so no wider temporaries are made
+                self.array = self.array.astype(ct_dtype)
+                self.array *= int(self.metadata.RescaleSlope)
+                self.array += int(self.metadata.RescaleIntercept)
 
     def save(self, filename: str) -> str:
         """Save the image instance back out to a .dcm file.
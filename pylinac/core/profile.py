@@ -136,6 +136,21 @@ class ProfileMixin:
         return self.values[items]
 
 
+def _find_initial_peak(values: np.ndarray) -> NumberLike:
+    """Find the largest peak near the middle of a profile, moving the search region left until one is found."""
+    lf_edge = 0.2
+    rt_edge = 0.8
+    while True:
+        _, initial_peak_arr = peak_detect(values, max_number=1, search_region=(lf_edge, rt_edge))
+        try:
+            return initial_peak_arr[0]
+        except IndexError:
+            lf_edge -= 0.01
+            rt_edge -= 0.01
+            if lf_edge < 0:
+                raise ValueError("A reasonable initial peak was not found in the profile. Ensure peak is not at profile edge")
+
+
 class SingleProfile(ProfileMixin):
     """A profile that has one large signal, e.g. a radiation beam profile.
     Signal analysis methods are given, mostly based on FWXM calculations.
@@ -229,18 +244,7 @@ class SingleProfile(ProfileMixin):
         """
         # if not passed, get one by peak searching.
         if initial_peak is None:
-            lf_edge = 0.2
-            rt_edge = 0.8
-            while True:
-                _, initial_peak_arr = peak_detect(self.values, max_number=1, search_region=(lf_edge, rt_edge))
-                try:
-                    initial_peak = initial_peak_arr[0]
-                    break
-                except IndexError:
-                    lf_edge -= 0.01
-                    rt_edge -= 0.01
-                    if lf_edge < 0:
-                        raise ValueError("A reasonable initial peak was not found in the profile. Ensure peak is not at profile edge")
+            initial_peak = _find_initial_peak(self.values)
         # otherwise use the one passed.
         elif len(self.values) < initial_peak < 0:
             raise IndexError("Initial peak that was passed was not reasonably within the profile x_data range")
@@ -680,6 +684,34 @@ class MultiProfile(ProfileMixin):
         return subprofiles
 
 
+INTERPOLATION_ORDERS = {'nearest': 0, 'bilinear': 1}
+
+
+@lru_cache(maxsize=128)
+def _circle_radians(size: float, start_angle: float, ccw: bool) -> np.ndarray:
+    """The angles of the samples of a circle profile. The array is cached and read-only."""
+    interval = (2 * np.pi) / size
+    rads = np.arange(0 + start_angle, (2 * np.pi) + start_angle - interval, interval)
+    if ccw:
+        rads = rads[::-1]
+    rads.setflags(write=False)
+    return rads
+
+
+@lru_cache(maxsize=32)
+def _collapsed_circle_grid(center_x: float, center_y: float, radius: float, width_ratio: float, num_profiles: int,
+                           sampling_ratio: float, start_angle: float, ccw: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """The (y, x) sampling coordinates of a collapsed circle profile; one row per sampling radius.
+    The arrays are cached and read-only."""
+    radii = np.linspace(start=radius * (1 - width_ratio), stop=radius * (1 + width_ratio), num=num_profiles)
+    rads = _circle_radians(np.pi * radii.max() * 2 * sampling_ratio, start_angle, ccw)
+    y = np.outer(radii, np.sin(rads)) + center_y
+    x = np.outer(radii, np.cos(rads)) + center_x
+    y.setflags(write=False)
+    x.setflags(write=False)
+    return y, x
+
+
 class CircleProfile(MultiProfile, Circle):
     """A profile in the shape of a circle.
 
@@ -699,8 +731,10 @@ class CircleProfile(MultiProfile, Circle):
     _x_locations: Optional[np.ndarray]
     _y_locations: Optional[np.ndarray]
 
+    @value_accept(interpolation=tuple(INTERPOLATION_ORDERS))
     def __init__(self, center: Point, radius: NumberLike, image_array: np.ndarray,
-                 start_angle: Union[float, int]=0, ccw: bool=True, sampling_ratio: float=1.0):
+                 start_angle: Union[float, int]=0, ccw: bool=True, sampling_ratio: float=1.0,
+                 interpolation: str='nearest'):
         """
         Parameters
         ----------
@@ -715,6 +749,8 @@ class CircleProfile(MultiProfile, Circle):
             The ratio of pixel sampling to real pixels. E.g. if 1.0, the profile will have approximately
             the same number of elements as was encountered in the profile. A value of 2.0 will sample
             the profile at 2x the number of elements.
+        interpolation : {'nearest', 'bilinear'}
+            How the image is sampled at the profile locations.
 
         See Also
         --------
@@ -726,6 +762,7 @@ class CircleProfile(MultiProfile, Circle):
         self.start_angle = start_angle
         self.ccw = ccw
         self.sampling_ratio = sampling_ratio
+        self.interpolation = interpolation
         self._x_locations = None
         self._y_locations = None
         MultiProfile.__init__(self, self._profile)
@@ -737,11 +774,7 @@ class CircleProfile(MultiProfile, Circle):
 
     @property
     def _radians(self) -> np.ndarray:
-        interval = (2 * np.pi) / self.size
-        rads = np.arange(0 + self.start_angle, (2 * np.pi) + self.start_angle - interval, interval)
-        if self.ccw:
-            rads = rads[::-1]
-        return rads
+        return _circle_radians(self.size, self.start_angle, self.ccw)
 
     @property
     def x_locations(self) -> np.ndarray:
@@ -770,7 +803,8 @@ class CircleProfile(MultiProfile, Circle):
     @property
     def _profile(self) -> np.ndarray:
         """The actual profile array; private attr that is passed to MultiProfile."""
-        return ndimage.map_coordinates(self.image_array, [self.y_locations, self.x_locations], order=0)
+        return ndimage.map_coordinates(self.image_array, [self.y_locations, self.x_locations],
+                                       order=INTERPOLATION_ORDERS[self.interpolation])
 
     def find_peaks(self, threshold: Union[float, int]=0.3, min_distance: Union[float, int]=0.05,
                    max_number: int=None, search_region: Tuple[float, float]=(0.0, 1.0), kind: str='index') -> np.ndarray:
@@ -851,7 +885,8 @@ class CollapsedCircleProfile(CircleProfile):
 
     @value_accept(width_ratio=(0, 1))
     def __init__(self, center: Point, radius: NumberLike, image_array: np.ndarray, start_angle: int=0,
-                 ccw: bool=True, sampling_ratio: float=1.0, width_ratio: float=0.1, num_profiles: int=20):
+                 ccw: bool=True, sampling_ratio: float=1.0, width_ratio: float=0.1, num_profiles: int=20,
+                 interpolation: str='nearest'):
         """
         Parameters
         ----------
@@ -860,6 +895,7 @@ class CollapsedCircleProfile(CircleProfile):
             and the width_ratio is 0.2, the "thickness" will be 4 pixels.
         num_profiles : int
             The number of profiles to sample in the band. Profiles are distributed evenly within the band.
+            All the profiles are sampled in a single call on a cached coordinate grid.
 
         See Also
         --------
@@ -867,7 +903,7 @@ class CollapsedCircleProfile(CircleProfile):
         """
         self.width_ratio = width_ratio
         self.num_profiles = num_profiles
-        super().__init__(center, radius, image_array, start_angle, ccw, sampling_ratio)
+        super().__init__(center, radius, image_array, start_angle, ccw, sampling_ratio, interpolation)
 
     @property
     def _radii(self) -> np.ndarray:
@@ -879,33 +915,28 @@ class CollapsedCircleProfile(CircleProfile):
         return np.pi * max(self._radii) * 2 * self.sampling_ratio
 
     @property
-    def _multi_x_locations(self) -> List:
-        """List of x-locations of the sampling profiles"""
-        x = []
-        cos = np.cos(self._radians)
-        # extract profile for each circle radii
-        for radius in self._radii:
-            x.append(cos * radius + self.center.x)
-        return x
+    def _grid(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The (y, x) sampling coordinates; one row per sampling radius."""
+        return _collapsed_circle_grid(self.center.x, self.center.y, self.radius, self.width_ratio, self.num_profiles,
+                                      self.sampling_ratio, self.start_angle, self.ccw)
+
+    @property
+    def _multi_x_locations(self) -> np.ndarray:
+        """x-locations of the sampling profiles; one row per profile."""
+        return self._grid[1]
 
     @property
-    def _multi_y_locations(self) -> List:
-        """List of x-locations of the sampling profiles"""
-        y = []
-        sin = np.sin(self._radians)
-        # extract profile for each circle radii
-        for radius in self._radii:
-            y.append(sin * radius + self.center.y)
-        return y
+    def _multi_y_locations(self) -> np.ndarray:
+        """y-locations of the sampling profiles; one row per profile."""
+        return self._grid[0]
 
     @property
     def _profile(self) -> np.ndarray:
         """The actual profile array; private attr that is passed to MultiProfile."""
-        profile = np.zeros(len(self._multi_x_locations[0]))
-        for radius, x, y in zip(self._radii, self._multi_x_locations, self._multi_y_locations):
-            profile += ndimage.map_coordinates(self.image_array, [y, x], order=0)
-        profile /= self.num_profiles
-        return profile
+        y, x = self._grid
+        profiles = ndimage.map_coordinates(self.image_array, [y.ravel(), x.ravel()], output=np.float64,
+                                           order=INTERPOLATION_ORDERS[self.interpolation])
+        return profiles.reshape(y.shape).sum(axis=0) / self.num_profiles
 
     def plot2axes(self, axes: plt.Axes=None, edgecolor: str='black', fill: bool=False, plot_peaks: bool=True):
         """Add 2 circles to the axes: one at the maximum and minimum radius of the ROI.
@@ -971,9 +1002,6 @@ def peak_detect(values: np.ndarray, threshold: Union[float, int]=None, min_dista
     ValueError
         If float not between 0 and 1 passed to threshold.
     """
-    peak_vals = []  # a list to hold the y-values of the peaks. Will be converted to a numpy array
-    peak_idxs = []  # ditto for x-values (index) of y data.
-
     if find_min_instead:
         values = -values
 
@@ -1016,49 +1044,30 @@ def peak_detect(values: np.ndarray, threshold: Union[float, int]=None, min_dista
     values_diff = np.diff(values.astype(float))  # y and y_diff must be converted to signed type.
 
     """Find all potential peaks"""
-    for idx in range(len(values_diff) - 1):
-        # For each item of the diff array, check if:
-        # 1) The y-value is above the threshold.
-        # 2) The value of y_diff is positive (negative for valley search), it means the y-value changed upward.
-        # 3) The next y_diff value is zero or negative (or positive for valley search); a positive-then-negative diff value means the value
-        # is a peak of some kind. If the diff is zero it could be a flat peak, which still counts.
-
-        # 1)
-        if values[idx + 1] < threshold:
-            continue
-
-        y1_gradient = values_diff[idx] > 0
-        y2_gradient = values_diff[idx + 1] <= 0
-
-        # 2) & 3)
-        if y1_gradient and y2_gradient:
-            # If the next value isn't zero it's a single-pixel peak. Easy enough.
-            if values_diff[idx + 1] != 0:
-                peak_vals.append(values[idx + 1])
-                peak_idxs.append(idx + 1 + left_index)
-            # elif idx >= len(y_diff) - 1:
-            #     pass
-            # Else if the diff value is zero, it could be a flat peak, or it could keep going up; we don't know yet.
-            else:
-                # Continue on until we find the next nonzero diff value.
-                try:
-                    shift = 0
-                    while values_diff[(idx + 1) + shift] == 0:
-                        shift += 1
-                        if (idx + 1 + shift) >= (len(values_diff) - 1):
-                            break
-                    # If the next diff is negative (or positive for min), we've found a peak. Also put the peak at the center of the flat
-                    # region.
-                    is_a_peak = values_diff[(idx + 1) + shift] < 0
-                    if is_a_peak:
-                        peak_vals.append(values[int((idx + 1) + np.round(shift / 2))])
-                        peak_idxs.append((idx + 1 + left_index) + np.round(shift / 2))
-                except IndexError:
-                    pass
-
-    # convert to numpy arrays
-    peak_vals = np.array(peak_vals)
-    peak_idxs = np.array(peak_idxs)
+    # A potential peak is a point above the threshold where the values go up (positive diff) and then
+    # down or flat (zero or negative diff). A flat run is a peak only if it then goes down; the peak is put at the
+    # center of the flat region. A flat run that reaches the end of the search region is cut off at the end.
+    num_diff = len(values_diff)
+    candidates = np.arange(1, num_diff)
+    candidates = candidates[(values[candidates] >= threshold) & (values_diff[candidates - 1] > 0) &
+                            (values_diff[candidates] <= 0)]
+    shifts = np.zeros(len(candidates), dtype=int)
+    is_a_peak = values_diff[candidates] != 0
+    flat = candidates[~is_a_peak]
+    if len(flat):
+        nonzero_diffs = np.flatnonzero(values_diff)
+        next_nonzero = np.append(nonzero_diffs, num_diff)[np.searchsorted(nonzero_diffs, flat)]
+        flat_shifts = np.minimum(next_nonzero - flat, np.maximum(num_diff - 1 - flat, 1))
+        in_range = flat + flat_shifts <= num_diff - 1
+        flat_is_peak = np.zeros(len(flat), dtype=bool)
+        flat_is_peak[in_range] = values_diff[(flat + flat_shifts)[in_range]] < 0
+        shifts[~is_a_peak] = flat_shifts
+        is_a_peak[~is_a_peak] = flat_is_peak
+    candidates, shifts, centered = candidates[is_a_peak], shifts[is_a_peak], shifts[is_a_peak] != 0
+    half_shifts = np.round(shifts / 2)
+    peak_vals = values[(candidates + half_shifts).astype(int)]
+    # flat peaks are centered with a float shift, which makes the indices floats
+    peak_idxs = candidates + left_index + (half_shifts if centered.any() else 0)
 
     """Enforce the min_peak_distance by removing smaller peaks."""
     # For each peak, determine if the next peak is within the min peak width range.
@@ -1087,3 +1096,89 @@ def peak_detect(values: np.ndarray, threshold: Union[float, int]=None, min_dista
         peak_vals = -peak_vals
 
     return peak_vals, peak_idxs
+
+
+def fwxm_edges(profiles: np.ndarray, x: int=50, interpolate: bool=False, initial_peaks: np.ndarray=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the left and right FWXM penumbra indices of each of a stack of profiles.
+
+    This gives the same points as :meth:`~pylinac.core.profile.SingleProfile._penumbra_point` for each row,
+    but the side grounding, interpolation, and penumbra search are done on all the rows at once.
+
+    Parameters
+    ----------
+    profiles : ndarray
+        A 2D array of profiles; one profile per row.
+    x : int
+        The percent height of the profiles. E.g. x = 50 is 50% height, i.e. FWHM.
+    interpolate : bool
+        If True, interpolates the values to give more accurate points.
+    initial_peaks : ndarray, optional
+        The index of a point within the field of each profile, from which the penumbra search starts.
+        If None (default), the peak of each profile is found as :class:`~pylinac.core.profile.SingleProfile` does.
+
+    Returns
+    -------
+    left, right : ndarray
+        The penumbra index of each side of each profile; NaN where the penumbra wasn't found on that side.
+    """
+    profiles = np.atleast_2d(profiles).astype(float)
+    length = profiles.shape[1]
+    factor = SingleProfile.interpolation_factor if interpolate else 1
+    if initial_peaks is None:
+        initial_peaks = np.array([int(_find_initial_peak(values)) for values in profiles], dtype=int)
+    initial_peaks = np.asarray(initial_peaks, dtype=int)
+    columns = np.arange(length)
+    # each side is grounded by its own minimum
+    left_values = profiles - np.where(columns < initial_peaks[:, np.newaxis], profiles, np.inf).min(axis=1)[:, np.newaxis]
+    right_values = profiles - np.where(columns >= initial_peaks[:, np.newaxis], profiles, np.inf).min(axis=1)[:, np.newaxis]
+    if interpolate:
+        indices = np.linspace(start=0, stop=length-1, num=length)
+        indices_interp = np.linspace(start=0, stop=length-1, num=(length-1) * factor)
+        left_values = np.array([np.interp(indices_interp, indices, values) for values in left_values])
+        right_values = np.array([np.interp(indices_interp, indices, values) for values in right_values])
+        columns = np.arange(left_values.shape[1])
+    starts = (initial_peaks * factor)[:, np.newaxis]
+
+    # the penumbra point is the first point below the threshold moving outward from the peak, inclusive
+    left_below = (left_values < left_values.max(axis=1, keepdims=True) * (x / 100)) & (columns <= starts)
+    left_points = np.where(left_below.any(axis=1), len(columns) - 1 - left_below[:, ::-1].argmax(axis=1), np.nan)
+    right_below = (right_values < right_values.max(axis=1, keepdims=True) * (x / 100)) & (columns >= starts)
+    right_points = np.where(right_below.any(axis=1), right_below.argmax(axis=1), np.nan)
+    return left_points / factor, right_points / factor
+
+
+def fwxm_centers(profiles: np.ndarray, x: int=50, interpolate: bool=False) -> np.ndarray:
+    """Return the FWXM center index of each of a stack of profiles.
+
+    This gives the same result as calling :meth:`~pylinac.core.profile.SingleProfile.fwxm_center` on each row.
+    See :func:`~pylinac.core.profile.fwxm_edges`.
+
+    Parameters
+    ----------
+    profiles : ndarray
+        A 2D array of profiles; one profile per row.
+    x : int
+        The percent height of the profiles. E.g. x = 50 is 50% height, i.e. FWHM.
+    interpolate : bool
+        If True, interpolates the values to give a more accurate FWXM center.
+
+    Returns
+    -------
+    ndarray
+        The center index of each profile.
+
+    Raises
+    ------
+    IndexError
+        If the penumbra of a profile is beyond the right side of the profile.
+    """
+    left_points, right_points = fwxm_edges(profiles, x, interpolate)
+    if np.isnan(right_points).any():
+        raise IndexError("The point of interest was beyond the profile; i.e. the profile may be cut off on the side")
+    # like SingleProfile, a penumbra beyond the left side is taken as the element before the profile
+    factor = SingleProfile.interpolation_factor if interpolate else 1
+    left_points = np.where(np.isnan(left_points), -1 / factor, left_points)
+    centers = np.abs(left_points + np.abs(right_points - left_points) / 2)
+    if not interpolate:
+        centers = np.round(centers).astype(int)
+    return centers
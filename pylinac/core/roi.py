@@ -1,12 +1,13 @@
 
 from functools import lru_cache
-from typing import Union, Tuple, Optional
+from typing import Union, Tuple, Optional, Sequence, Dict
 
 import numpy as np
 
 from skimage.measure._regionprops import _RegionProperties
 
 from .geometry import Circle, Point, Rectangle
+from ..settings import get_float_dtype
 
 
 def bbox_center(region: _RegionProperties) -> Point:
@@ -27,6 +28,226 @@ def bbox_center(region: _RegionProperties) -> Point:
     return Point(x, y)
 
 
+@lru_cache(maxsize=64)
+def _disk_stencil(radius: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the flattened (row, column) offsets of the square that bounds a disk of the given radius
+    for any sub-pixel center. Offsets are relative to the floor of the center."""
+    extent = int(np.ceil(radius))
+    offsets = np.arange(-extent, extent + 2)
+    dy, dx = np.meshgrid(offsets, offsets, indexing='ij')
+    return dy.ravel(), dx.ravel()
+
+
+def disk_stats(array: np.ndarray, centers: Sequence[Point], radii: Sequence[float]) -> Dict[str, np.ndarray]:
+    """Calculate the statistics of many disk-shaped ROIs of an array in one call.
+
+    Only the pixels within the bounding box of each disk are sampled; the whole array is never copied.
+    A pixel is part of a disk if its distance to the disk center is less than or equal to the radius.
+
+    Parameters
+    ----------
+    array : ndarray, image
+        The 2D array or image the disks are on.
+    centers : sequence of :class:`~pylinac.core.geometry.Point`
+        The centers of the disks.
+    radii : sequence of float
+        The radii of the disks.
+
+    Returns
+    -------
+    dict
+        The 'median', 'mean', 'std', 'min', and 'max' of each disk as arrays in the order of ``centers``.
+        Disks with no pixels in the array are NaN.
+    """
+    n_rows, n_cols = array.shape[0], array.shape[1]
+    rows, cols, counts = [], [], []
+    for center, radius in zip(centers, radii):
+        dy, dx = _disk_stencil(float(radius))
+        row0, col0 = np.floor(center.y), np.floor(center.x)
+        roi_rows, roi_cols = dy + int(row0), dx + int(col0)
+        inside = ((dy - (center.y - row0)) ** 2 + (dx - (center.x - col0)) ** 2 <= radius ** 2) & \
+                 (roi_rows >= 0) & (roi_rows < n_rows) & (roi_cols >= 0) & (roi_cols < n_cols)
+        rows.append(roi_rows[inside])
+        cols.append(roi_cols[inside])
+        counts.append(np.count_nonzero(inside))
+    counts = np.asarray(counts)
+    stats = {key: np.full(len(counts), np.nan) for key in ('median', 'mean', 'std', 'min', 'max')}
+    filled = counts > 0
+    if not filled.any():
+        return stats
+    values = np.asarray(array[np.concatenate(rows), np.concatenate(cols)], dtype=float)
+    counts = counts[filled]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    labels = np.repeat(np.arange(len(counts)), counts)
+    mean = np.add.reduceat(values, starts) / counts
+    stats['mean'][filled] = mean
+    stats['std'][filled] = np.sqrt(np.add.reduceat((values - mean[labels]) ** 2, starts) / counts)
+    stats['min'][filled] = np.minimum.reduceat(values, starts)
+    stats['max'][filled] = np.maximum.reduceat(values, starts)
+    # sort within each disk; the median is the mean of the middle element(s)
+    sorted_values = values[np.lexsort((values, labels))]
+    stats['median'][filled] = (sorted_values[starts + (counts - 1) // 2] + sorted_values[starts + counts // 2]) / 2
+    return stats
+
+
+def integral_image(array: np.ndarray) -> np.ndarray:
+    """Return the integral image (summed-area table) of a 2D array.
+
+    The table is padded with a leading row and column of zeros so that the sum of ``array[r0:r1, c0:c1]`` is
+    ``table[r1, c1] - table[r0, c1] - table[r1, c0] + table[r0, c0]``.
+    """
+    table = np.zeros((array.shape[0] + 1, array.shape[1] + 1))
+    np.cumsum(np.cumsum(array, axis=0, dtype=float), axis=1, out=table[1:, 1:])
+    return table
+
+
+def box_means(table: np.ndarray, bounds) -> np.ndarray:
+    """Return the mean of each axis-aligned box of an array from its integral image. Each sum costs four lookups
+    regardless of the box size.
+
+    Bounds may be fractional; partially covered pixels are then weighted by the area covered, which is done by
+    bilinear interpolation of the integral image. Boxes are clipped to the array, so a box running past its edge is
+    the mean of the pixels inside it.
+
+    Parameters
+    ----------
+    table : ndarray
+        The integral image of the array; see :func:`integral_image`.
+    bounds : array-like
+        An (N, 4) sequence of the (top, bottom, left, right) pixel edges of each box. Integer bounds cover
+        ``array[top:bottom, left:right]``.
+    """
+    top, bottom, left, right = np.asarray(bounds, dtype=float).reshape(-1, 4).T
+    top, bottom = np.clip(top, 0, table.shape[0] - 1), np.clip(bottom, 0, table.shape[0] - 1)
+    left, right = np.clip(left, 0, table.shape[1] - 1), np.clip(right, 0, table.shape[1] - 1)
+
+    def table_at(rows, cols):
+        r0 = np.minimum(np.floor(rows).astype(int), table.shape[0] - 2)
+        c0 = np.minimum(np.floor(cols).astype(int), table.shape[1] - 2)
+        dr, dc = rows - r0, cols - c0
+        return (table[r0, c0] * (1 - dr) * (1 - dc) + table[r0 + 1, c0] * dr * (1 - dc) +
+                table[r0, c0 + 1] * (1 - dr) * dc + table[r0 + 1, c0 + 1] * dr * dc)
+
+    sums = table_at(bottom, right) - table_at(top, right) - table_at(bottom, left) + table_at(top, left)
+    return sums / ((bottom - top) * (right - left))
+
+
+def sliding_window_stats(array: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Calculate the mean and standard deviation of every square window of an array using integral images.
+
+    The cost is independent of the window size.
+
+    Parameters
+    ----------
+    array : ndarray
+        The 2D array.
+    size : int
+        The width of the square window in pixels.
+
+    Returns
+    -------
+    mean, std : ndarray
+        Arrays of shape ``(rows - size + 1, cols - size + 1)``; element (i, j) is for the window ``array[i:i+size, j:j+size]``.
+    """
+    size = int(size)
+    if not 0 < size <= min(array.shape):
+        raise ValueError("The window size must be between 1 and the smallest array dimension; got {}".format(size))
+    array = np.asarray(array, dtype=float)
+    # subtract the mean first so the sum of squares doesn't lose precision
+    offset = array.mean()
+    centered = array - offset
+    n = size ** 2
+
+    def window_sums(table):
+        return table[size:, size:] - table[:-size, size:] - table[size:, :-size] + table[:-size, :-size]
+
+    sums = window_sums(integral_image(centered))
+    square_sums = window_sums(integral_image(centered ** 2))
+    mean = sums / n
+    std = np.sqrt(np.clip(square_sums / n - mean ** 2, 0, None))
+    return mean + offset, std
+
+
+def measure_disk_rois(rois: Sequence['DiskROI']):
+    """Calculate the statistics of many disk ROIs of the same array in one call to :func:`disk_stats`
+    and set them on each ROI."""
+    rois = list(rois)
+    if not rois:
+        return
+    stats = disk_stats(rois[0]._array, [roi.center for roi in rois], [roi.radius for roi in rois])
+    for idx, roi in enumerate(rois):
+        roi._stats = {key: float(value[idx]) for key, value in stats.items()}
+
+
+def _measure_unmeasured(rois: Sequence['DiskROI']):
+    """Measure the ROIs whose statistics haven't been calculated yet in one call to :func:`measure_disk_rois`."""
+    measure_disk_rois([roi for roi in rois if roi._stats is None])
+
+
+def _contrast(values, backgrounds):
+    """The contrast of ROI values compared to their backgrounds: (ROI - backg) / (ROI + backg)."""
+    return np.abs((values - backgrounds) / (values + backgrounds))
+
+
+def _contrast_to_noise(values, backgrounds, stds):
+    """The contrast to noise ratio of ROI values: (Signal - Background)/Stdev."""
+    return np.abs(values - backgrounds) / stds
+
+
+def _rmtf(maxs, mins, norms):
+    """The relative MTF of ROIs from their max and min values: (max - min) / (max + min) / norm."""
+    return (maxs - mins) / (maxs + mins) / norms
+
+
+def low_contrast_values(rois: Sequence['LowContrastDiskROI']) -> Dict[str, np.ndarray]:
+    """Calculate the contrast and contrast-to-noise of many low-contrast ROIs as arrays.
+
+    ROIs that haven't been measured are measured together in one call to :func:`disk_stats`.
+
+    Parameters
+    ----------
+    rois : sequence of :class:`~pylinac.core.roi.LowContrastDiskROI`
+        The ROIs; their backgrounds must be set.
+
+    Returns
+    -------
+    dict
+        The 'contrast', 'cnr', 'contrast_constant', and 'cnr_constant' of each ROI in the order of ``rois``.
+    """
+    rois = list(rois)
+    _measure_unmeasured(rois)
+    values = np.array([roi.pixel_value for roi in rois], dtype=float)
+    backgrounds = np.array([roi.background for roi in rois], dtype=float)
+    stds = np.array([roi.std for roi in rois], dtype=float)
+    diameters = np.array([roi.diameter for roi in rois], dtype=float)
+    contrast = _contrast(values, backgrounds)
+    cnr = _contrast_to_noise(values, backgrounds, stds)
+    return {'contrast': contrast, 'cnr': cnr, 'contrast_constant': contrast * diameters, 'cnr_constant': cnr * diameters}
+
+
+def high_contrast_values(rois: Sequence['HighContrastDiskROI']) -> np.ndarray:
+    """Calculate the relative MTF of many high-contrast ROIs as an array.
+
+    ROIs that haven't been measured are measured together in one call to :func:`disk_stats`.
+
+    Parameters
+    ----------
+    rois : sequence of :class:`~pylinac.core.roi.HighContrastDiskROI`
+        The ROIs.
+
+    Returns
+    -------
+    ndarray
+        The rMTF of each ROI in the order of ``rois``, normalized by the ``mtf_norm`` of the ROI if it has one.
+    """
+    rois = list(rois)
+    _measure_unmeasured(rois)
+    maxs = np.array([roi.max for roi in rois], dtype=float)
+    mins = np.array([roi.min for roi in rois], dtype=float)
+    norms = np.array([1 if roi.mtf_norm is None else roi.mtf_norm for roi in rois], dtype=float)
+    return _rmtf(maxs, mins, norms)
+
+
 class DiskROI(Circle):
     """An class representing a disk-shaped Region of Interest."""
     def __init__(self, array: np.ndarray, angle: Union[float, int], roi_radius: Union[float, int],
@@ -48,6 +269,7 @@ class DiskROI(Circle):
         center = self._get_shifted_center(angle, dist_from_center, phantom_center)
         super().__init__(center_point=center, radius=roi_radius)
         self._array = array
+        self._stats = None
 
     @staticmethod
     def _get_shifted_center(angle: Union[float, int], dist_from_center: Union[float, int], phantom_center: Point):
@@ -56,23 +278,29 @@ class DiskROI(Circle):
         x_shift = np.cos(np.deg2rad(angle)) * dist_from_center
         return Point(phantom_center.x + x_shift, phantom_center.y + y_shift)
 
+    @property
+    def stats(self) -> Dict[str, float]:
+        """The median, mean, std, min, and max of the pixel values of the ROI. See :func:`disk_stats`."""
+        if self._stats is None:
+            stats = disk_stats(self._array, [self.center], [self.radius])
+            self._stats = {key: float(value[0]) for key, value in stats.items()}
+        return self._stats
+
     @property
     def pixel_value(self) -> np.ndarray:
         """The median pixel value of the ROI."""
-        masked_img = self.circle_mask()
-        return np.nanmedian(masked_img)
+        return self.stats['median']
 
     @property
     def std(self) -> np.ndarray:
         """The standard deviation of the pixel values."""
-        masked_img = self.circle_mask()
-        return np.nanstd(masked_img)
+        return self.stats['std']
 
     @lru_cache(maxsize=1)
     def circle_mask(self) -> np.ndarray:
         """Return a mask of the image, only showing the circular ROI."""
         # http://scikit-image.org/docs/dev/auto_examples/plot_camera_numpy.html
-        masked_array = np.copy(self._array).astype(np.float)
+        masked_array = np.array(self._array, dtype=get_float_dtype())
         l_x, l_y = self._array.shape[0], self._array.shape[1]
         X, Y = np.ogrid[:l_x, :l_y]
         outer_disk_mask = (X - self.center.y) ** 2 + (Y - self.center.x) ** 2 > self.radius ** 2
@@ -102,12 +330,12 @@ class LowContrastDiskROI(DiskROI):
     @property
     def contrast_to_noise(self) -> float:
         """The contrast to noise ratio of the bubble: (Signal - Background)/Stdev."""
-        return abs(self.pixel_value - self.background) / self.std
+        return _contrast_to_noise(self.pixel_value, self.background, self.std)
 
     @property
     def contrast(self) -> float:
         """The contrast of the bubble compared to background: (ROI - backg) / (ROI + backg)."""
-        return abs((self.pixel_value - self.background) / (self.pixel_value + self.background))
+        return _contrast(self.pixel_value, self.background)
 
     @property
     def cnr_constant(self) -> float:
@@ -169,10 +397,7 @@ class HighContrastDiskROI(DiskROI):
     @property
     def mtf(self) -> np.ndarray:
         """The contrast of the bubble compared to background: (ROI - backg) / (ROI + backg)."""
-        mtf = (self.max - self.min) / (self.max + self.min)
-        if self.mtf_norm is not None:
-            mtf /= self.mtf_norm
-        return mtf
+        return _rmtf(self.max, self.min, 1 if self.mtf_norm is None else self.mtf_norm)
 
     @property
     def passed(self) -> np.ndarray:
@@ -187,14 +412,12 @@ class HighContrastDiskROI(DiskROI):
     @property
     def max(self) -> np.ndarray:
         """The max pixel value of the ROI."""
-        masked_img = self.circle_mask()
-        return np.nanmax(masked_img)
+        return self.stats['max']
 
     @property
     def min(self) -> np.ndarray:
         """The min pixel value of the ROI."""
-        masked_img = self.circle_mask()
-        return np.nanmin(masked_img)
+        return self.stats['min']
 
 
 class RectangleROI(Rectangle):
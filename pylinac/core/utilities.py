@@ -1,11 +1,12 @@
 """Utility functions for pylinac."""
-from collections import Iterable
+from collections import Iterable, OrderedDict
+import concurrent.futures
 import decimal
 import os
 import os.path as osp
 import subprocess
 import struct
-from typing import Union, Sequence
+from typing import Union, Sequence, Callable, List
 
 import pydicom
 import numpy as np
@@ -25,6 +26,76 @@ def clear_data_files():
     print("Pylinac data files cleared.")
 
 
+def thread_map(func: Callable, iterable, workers: int=1) -> list:
+    """Apply the function to each item, concurrently in a thread pool if more than one worker is requested.
+
+    Parameters
+    ----------
+    func : callable
+        The function applied to each item.
+    iterable : iterable
+        The items.
+    workers : int
+        The number of threads. If 1 (default), the items are processed serially in this thread.
+
+    Returns
+    -------
+    list
+        The results, in the order of the items.
+    """
+    if workers > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, iterable))
+    return [func(item) for item in iterable]
+
+
+def run_batch(analyze: Callable, summarize: Callable, items: Sequence, workers: int=1) -> List[dict]:
+    """Analyze many items (e.g. datasets or image pairs) independently, in a process pool if more than one worker is
+    requested. A failing item records its error in its result rather than stopping the batch.
+
+    Parameters
+    ----------
+    analyze : callable
+        ``analyze(item, timings)`` returns the analysis of an item and records the seconds spent in each of its stages
+        in the ``timings`` dict. It must be picklable (e.g. a module-level function or a partial of one) if ``workers``
+        is greater than 1.
+    summarize : callable
+        ``summarize(item, analysis)`` returns the result dict of an item; ``analysis`` is None if the analysis failed.
+        It is run where the item was analyzed, so only the result is sent back from a worker process.
+    items : sequence
+        The items to analyze.
+    workers : int
+        The number of items analyzed concurrently in a process pool. Default is 1 (serial, in this process).
+
+    Returns
+    -------
+    list of dict
+        The result of each item, in the order of the items, with the added keys 'error' (the repr of the exception,
+        or None if the analysis succeeded) and 'timings'.
+    """
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_run_batch_item, analyze, summarize, item) for item in items]
+            results = []
+            for item, future in zip(items, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:  # e.g. the worker process died
+                    results.append(dict(summarize(item, None), error=repr(e), timings=OrderedDict()))
+            return results
+    return [_run_batch_item(analyze, summarize, item) for item in items]
+
+
+def _run_batch_item(analyze: Callable, summarize: Callable, item) -> dict:
+    """Analyze and summarize one item of :func:`run_batch`. Module-level so it can be run in a process pool."""
+    timings = OrderedDict()
+    try:
+        result, error = summarize(item, analyze(item, timings)), None
+    except Exception as e:
+        result, error = summarize(item, None), repr(e)
+    return dict(result, error=error, timings=timings)
+
+
 def assign2machine(source_file: str, machine_file: str):
     """Assign a DICOM RT Plan file to a specific machine. The source file is overwritten to contain
     the machine of the machine file.
@@ -11,12 +11,16 @@ Features:
   Any field size or field extent is allowed.
 """
 from abc import abstractmethod
-from collections import OrderedDict
+from collections import OrderedDict, Counter
+import concurrent.futures
+import copy
 from datetime import datetime
-from functools import lru_cache
+from functools import lru_cache, partial
+import hashlib
 import io
 from os import path as osp
 import os
+import time
 import webbrowser
 import zipfile
 from typing import Optional
@@ -32,10 +36,21 @@ from .core.decorators import value_accept
 from .core.geometry import Point, Line
 from .core.io import get_url, retrieve_demo_file
 from .core import pdf
-from .core.profile import CollapsedCircleProfile, SingleProfile
-from .core.roi import DiskROI, RectangleROI, LowContrastDiskROI
-from .core.utilities import simple_round
-from .settings import get_dicom_cmap
+from .core.profile import CollapsedCircleProfile, SingleProfile, peak_detect
+from .core.roi import DiskROI, RectangleROI, LowContrastDiskROI, measure_disk_rois, sliding_window_stats
+from .core.utilities import simple_round, run_batch
+from .settings import get_dicom_cmap, get_float_dtype, get_precision
+
+
+# the origin slice, roll and analyzed modules of each localized dataset, keyed by CatPhanBase.dataset_id,
+# the region window and precision. Only the most recent MAX_LOCALIZATIONS are kept since the modules hold their slices.
+_localizations = OrderedDict()
+MAX_LOCALIZATIONS = 10
+
+
+def clear_localizations():
+    """Forget the cached origin slice, roll and module measurements of all previously analyzed datasets."""
+    _localizations.clear()
 
 
 class HUDiskROI(DiskROI):
@@ -176,13 +191,25 @@ class Slice:
         self.image = image.load(array)
         self.catphan_size = catphan.catphan_size
         self.mm_per_pixel = catphan.mm_per_pixel
+        self.region_window_mm = catphan.region_window_mm
+        self._analysis_counts = catphan._analysis_counts
+        self._phan_center = None
+        self._phantom_regions = None
+        self._window_center = None
 
     @property
     def __getitem__(self, item):
         return self.image.array[item]
 
+    def __deepcopy__(self, memo):
+        # the phantom regions are shared; skimage regions can't be deep-copied and aren't modified
+        copied = type(self).__new__(type(self))
+        memo[id(self)] = copied
+        memo[id(self._phantom_regions)] = self._phantom_regions
+        copied.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        return copied
+
     @property
-    @lru_cache(maxsize=1)
     def phan_center(self):
         """Determine the location of the center of the phantom.
 
@@ -191,16 +218,23 @@ class Slice:
         2) an ROI is within the size criteria of the catphan
         3) the ROI area that is filled compared to the bounding box area is close to that of a circle
 
+        The center is memoized per slice.
+
         Raises
         ------
         ValueError
             If any of the above conditions are not met.
         """
+        if self._phan_center is None:
+            self._phan_center = self._find_phan_center()
+        return self._phan_center
+
+    def _find_phan_center(self):
         # convert the slice to binary and label ROIs
-        edges = filters.scharr(self.image.as_type(np.float))
+        edges = filters.scharr(self.image[self.window(self.region_window_mm)].astype(get_float_dtype()))
         if np.max(edges) < 0.1:
             raise ValueError("Unable to locate Catphan")
-        larr, regionprops, num_roi = get_regions(self, fill_holes=True, threshold='mean')
+        larr, regionprops, num_roi = self.phantom_regions
         # check that there is at least 1 ROI
         if num_roi < 1 or num_roi is None:
             raise ValueError("Unable to locate the CatPhan")
@@ -210,6 +244,60 @@ class Slice:
         center_pixel = catphan_region.centroid
         return Point(center_pixel[1], center_pixel[0])
 
+    @property
+    def phantom_regions(self):
+        """The labeled array, regionprops, and number of regions of the filled slice used to find the phantom.
+        The region analysis is memoized per slice."""
+        if self._phantom_regions is None:
+            self._analysis_counts['regions'] += 1
+            self._phantom_regions = get_regions(self, fill_holes=True, threshold='mean', window_mm=self.region_window_mm)
+        return self._phantom_regions
+
+    def window(self, size_mm=None):
+        """The index of a square window about the approximate phantom center (see :attr:`window_center`).
+
+        Parameters
+        ----------
+        size_mm : float, None
+            The width of the window in mm. If None, the window is the whole image.
+
+        Returns
+        -------
+        tuple of slices
+        """
+        if size_mm is None:
+            return slice(None), slice(None)
+        half_size = size_mm / 2 / self.mm_per_pixel
+        center = self.window_center
+        rows, cols = self.image.shape
+        return (slice(min(max(int(center.y - half_size), 0), rows), min(max(int(center.y + half_size), 0), rows)),
+                slice(min(max(int(center.x - half_size), 0), cols), min(max(int(center.x + half_size), 0), cols)))
+
+    @property
+    def window_center(self):
+        """A coarse estimate of the phantom center that :meth:`window` is centered on, so an off-center phantom
+        isn't cut by the window. It is the centroid of the largest above-mean region of a block-averaged copy of the
+        slice, or the image center if there is no such region. Memoized per slice.
+
+        Returns
+        -------
+        Point
+        """
+        if self._window_center is None:
+            array = self.image.array
+            scale = max(int(max(array.shape) / 64), 1)
+            rows, cols = (dim // scale * scale for dim in array.shape)
+            coarse = np.asarray(array[:rows, :cols], dtype=float)
+            coarse = coarse.reshape(rows // scale, scale, cols // scale, scale).mean(axis=(1, 3))
+            labeled, num_regions = ndimage.label(coarse > coarse.mean())
+            if num_regions < 1:
+                self._window_center = self.image.center
+            else:
+                largest = np.argmax(np.bincount(labeled.ravel())[1:]) + 1
+                y, x = ndimage.center_of_mass(labeled == largest)
+                self._window_center = Point((x + 0.5) * scale - 0.5, (y + 0.5) * scale - 0.5)
+        return self._window_center
+
 
 class CatPhanModule(Slice, ROIManagerMixin):
     """Base class for a CTP module.
@@ -254,6 +342,26 @@ class CatPhanModule(Slice, ROIManagerMixin):
         """
         return int(self.origin_slice+round(self._offset/self.slice_thickness))
 
+    def is_current(self, catphan, offset):
+        """Whether the module was built at the same location of the phantom and can be reused.
+
+        Parameters
+        ----------
+        catphan : `~pylinac.cbct.CatPhanBase` instance.
+        offset : int, float
+        """
+        return (self.origin_slice == catphan.origin_slice and self.catphan_roll == catphan.catphan_roll and
+                self._offset == offset and self.region_window_mm == catphan.region_window_mm)
+
+    def set_tolerances(self, tolerance):
+        """Set the tolerance(s) of the module and its ROIs. Only pass/fail is re-evaluated; no image is re-analyzed.
+
+        Parameters
+        ----------
+        tolerance : float
+        """
+        self.tolerance = tolerance
+
     @abstractmethod
     def _setup_rois(self):
         pass
@@ -362,6 +470,15 @@ class CTP404(CatPhanModule):
             self.pad = 0
         self.thickness_image = Slice(catphan, combine_method='mean', num_slices=self.num_slices+self.pad, slice_num=self.slice_num).image
 
+    def set_tolerances(self, hu_tolerance, thickness_tolerance, scaling_tolerance):
+        self.hu_tolerance = hu_tolerance
+        self.thickness_tolerance = thickness_tolerance
+        self.scaling_tolerance = scaling_tolerance
+        for roi in self.hu_rois.values():
+            roi.tolerance = hu_tolerance
+        for line in self.lines.values():
+            line.tolerance = scaling_tolerance
+
     def _setup_rois(self):
         self._setup_hu_rois()
         self._setup_thickness_rois()
@@ -503,12 +620,19 @@ class CTP486(CatPhanModule):
         'Center': {'angle': 0},
     }
 
+    def set_tolerances(self, tolerance):
+        super().set_tolerances(tolerance)
+        for roi in self.rois.values():
+            roi.tolerance = tolerance
+
     def _setup_rois(self):
         self.rois = OrderedDict()
         for name, data in self.roi_data.items():
             distance = self.dist2rois if name != 'Center' else 0
             self.rois[name] = HUDiskROI(self.image, data['angle']+self.catphan_roll, self.roi_radius, distance,
                                         self.phan_center, 0, self.tolerance)
+        # the medians of all the ROIs are calculated in one pass
+        measure_disk_rois(self.rois.values())
 
     def plot_profiles(self, axis=None):
         """Plot the horizontal and vertical profiles of the Uniformity slice.
@@ -538,21 +662,56 @@ class CTP486(CatPhanModule):
         """Boolean specifying whether all the ROIs passed within tolerance."""
         return all(roi.passed for roi in self.rois.values())
 
+    @property
+    def _roi_values(self):
+        return np.array([roi.pixel_value for roi in self.rois.values()])
+
     @property
     def uniformity_index(self):
         """The Uniformity Index"""
-        center = self.rois['Center']
-        uis = [100*((roi.pixel_value-center.pixel_value)/(center.pixel_value+1000)) for roi in self.rois.values()]
-        abs_uis = np.abs(uis)
-        return uis[np.argmax(abs_uis)]
+        center = self.rois['Center'].pixel_value
+        uis = 100*(self._roi_values - center)/(center + 1000)
+        return uis[np.argmax(np.abs(uis))]
 
     @property
     def integral_non_uniformity(self):
         """The Integral Non-Uniformity"""
-        maxhu = max(roi.pixel_value for roi in self.rois.values())
-        minhu = min(roi.pixel_value for roi in self.rois.values())
+        values = self._roi_values
+        maxhu, minhu = values.max(), values.min()
         return (maxhu - minhu)/(maxhu + minhu + 2000)
 
+    @property
+    def uniformity_window(self):
+        """The index of the square window about the phantom center that bounds the uniformity ROIs.
+
+        Returns
+        -------
+        tuple of slices
+        """
+        half_size = self.dist2rois + self.roi_radius
+        center = self.phan_center
+        return (slice(max(int(center.y - half_size), 0), max(int(np.ceil(center.y + half_size)) + 1, 0)),
+                slice(max(int(center.x - half_size), 0), max(int(np.ceil(center.x + half_size)) + 1, 0)))
+
+    def uniformity_map(self, size_mm=None):
+        """Calculate the mean and standard deviation of a square window slid across the uniformity region.
+
+        Integral images are used, so the map costs about the same as a few ROIs regardless of the window size.
+
+        Parameters
+        ----------
+        size_mm : float, None
+            The width of the window in mm. If None, the ROI diameter is used.
+
+        Returns
+        -------
+        mean, std : ndarray
+            The HU mean and standard deviation maps. Element (i, j) is for the window whose upper-left pixel is at
+            (i, j) of the :attr:`uniformity_window`.
+        """
+        size = 2*self.roi_radius if size_mm is None else size_mm / self.mm_per_pixel
+        return sliding_window_stats(self.image.array[self.uniformity_window], max(int(round(size)), 1))
+
 
 class CTP528(CatPhanModule):
     """Class for analysis of the Spatial Resolution slice of the CBCT dicom data set.
@@ -572,7 +731,9 @@ class CTP528(CatPhanModule):
     num_slices = 3
 
     def _setup_rois(self):
-        pass
+        self._circle_profile = None
+        self._mtfs = None
+        self._mtf_curve = None
 
     @property
     def sr_rois(self):
@@ -604,7 +765,6 @@ class CTP528(CatPhanModule):
         return [v['lp/mm'] for v in self.sr_rois.values()]
 
     @property
-    @lru_cache(maxsize=1)
     def mtfs(self):
         """The Relative MTF of the line pairs, normalized to the first region.
 
@@ -612,18 +772,24 @@ class CTP528(CatPhanModule):
         -------
         dict
         """
+        if self._mtfs is None:
+            self._mtfs = self._calculate_mtfs()
+        return self._mtfs
+
+    def _calculate_mtfs(self):
+        # the peaks of each region are detected once and both their values and indices are used
+        values = self.circle_profile.values
         mtfs = OrderedDict()
         for key, value in self.sr_rois.items():
-            max_values = self.circle_profile.find_peaks(min_distance=value['peak spacing'], max_number=value['num peaks'],
-                                                        search_region=(value['start'], value['end']), kind='value')
+            max_values, max_indices = peak_detect(values, threshold=0.3, min_distance=value['peak spacing'],
+                                                  max_number=value['num peaks'], search_region=(value['start'], value['end']))
             # check that the right number of peaks were found before continuing, otherwise stop searching for regions
             if len(max_values) != value['num peaks']:
                 break
             upper_mean = max_values.mean()
-            max_indices = self.circle_profile.find_peaks(min_distance=value['peak spacing'], max_number=value['num peaks'],
-                                                         search_region=(value['start'], value['end']), kind='index')
-            lower_mean = self.circle_profile.find_valleys(min_distance=value['peak spacing'], max_number=value['num valleys'],
-                                                          search_region=(min(max_indices), max(max_indices)), kind='value').mean()
+            min_values, _ = peak_detect(values, threshold=0.3, min_distance=value['peak spacing'], max_number=value['num valleys'],
+                                        search_region=(min(max_indices), max(max_indices)), find_min_instead=True)
+            lower_mean = min_values.mean()
             mtfs[key] = (upper_mean - lower_mean) / (upper_mean + lower_mean)
         if not mtfs:
             raise ValueError("Did not find any spatial resolution pairs to analyze. File an issue on github (https://github.com/jrkerns/pylinac/issues) if this is a valid dataset.")
@@ -658,7 +824,6 @@ class CTP528(CatPhanModule):
             self.ccw = True
 
     @property
-    @lru_cache(maxsize=1)
     def circle_profile(self):
         """Calculate the median profile of the Line Pair region.
 
@@ -666,20 +831,32 @@ class CTP528(CatPhanModule):
         -------
         :class:`pylinac.core.profile.CollapsedCircleProfile` : A 1D profile of the Line Pair region.
         """
-        circle_profile = CollapsedCircleProfile(self.phan_center, self.radius2linepairs, image_array=self.image,
-                                                start_angle=self.start_angle + np.deg2rad(self.catphan_roll),
-                                                width_ratio=0.04, sampling_ratio=2, ccw=self.ccw)
-        circle_profile.filter(0.001, kind='gaussian')
-        circle_profile.ground()
-        return circle_profile
+        if self._circle_profile is None:
+            circle_profile = CollapsedCircleProfile(self.phan_center, self.radius2linepairs, image_array=self.image,
+                                                    start_angle=self.start_angle + np.deg2rad(self.catphan_roll),
+                                                    width_ratio=0.04, sampling_ratio=2, ccw=self.ccw)
+            circle_profile.filter(0.001, kind='gaussian')
+            circle_profile.ground()
+            self._circle_profile = circle_profile
+        return self._circle_profile
+
+    @property
+    def _interpolated_mtf(self):
+        """The line-pair frequencies and the relative MTF interpolated at 0.01 lp/mm."""
+        if self._mtf_curve is None:
+            y_vals = list(self.mtfs.values())
+            x_vals_intrp = np.arange(self.lp_freq[0], self.lp_freq[len(y_vals)-1], 0.01)
+            x_vals = self.lp_freq[:len(y_vals)]
+            self._mtf_curve = (x_vals_intrp, np.interp(x_vals_intrp, x_vals, y_vals))
+        return self._mtf_curve
 
     def mtf(self, percent=None, region=None):
         """Return the MTF value of the spatial resolution. Only one of the two parameters may be used.
 
         Parameters
         ----------
-        percent : int, float
-            The percent relative MTF; i.e. 0-100.
+        percent : int, float, sequence
+            The percent relative MTF; i.e. 0-100. If a sequence, the resolutions of all the percents are returned as a list.
         region : int
             The line-pair region desired (1-6).
 
@@ -690,12 +867,11 @@ class CTP528(CatPhanModule):
         if (region is None and percent is None) or (region is not None and percent is not None):
             raise ValueError("Must pass in either region or percent")
         if percent is not None:
-            y_vals = list(self.mtfs.values())
-            x_vals_intrp = np.arange(self.lp_freq[0], self.lp_freq[len(y_vals)-1], 0.01)
-            x_vals = self.lp_freq[:len(y_vals)]
-            y_vals_intrp = np.interp(x_vals_intrp, x_vals, y_vals)
-            mtf_percent = x_vals_intrp[np.argmin(np.abs(y_vals_intrp - (percent / 100)))]
-            return simple_round(mtf_percent, 2)
+            x_vals_intrp, y_vals_intrp = self._interpolated_mtf
+            percents = np.atleast_1d(percent) / 100
+            mtf_percents = x_vals_intrp[np.argmin(np.abs(y_vals_intrp[np.newaxis, :] - percents[:, np.newaxis]), axis=1)]
+            mtf_percents = [simple_round(mtf_percent, 2) for mtf_percent in mtf_percents]
+            return mtf_percents if np.ndim(percent) else mtf_percents[0]
         elif region is not None:
             return self.line_pair_mtfs[region]
 
@@ -783,6 +959,13 @@ class CTP515(CatPhanModule):
         self.cnr_threshold = cnr_threshold
         super().__init__(catphan, tolerance=tolerance, offset=offset)
 
+    def set_tolerances(self, tolerance, cnr_threshold):
+        super().set_tolerances(tolerance)
+        self.cnr_threshold = cnr_threshold
+        for rois in (self.rois, self.inner_bg_rois, self.outer_bg_rois):
+            for roi in rois.values():
+                roi.cnr_threshold = cnr_threshold
+
     def _setup_rois(self):
         self.rois = OrderedDict()
         self.inner_bg_rois = OrderedDict()
@@ -830,7 +1013,7 @@ class CTP515(CatPhanModule):
     @property
     def overall_passed(self):
         """Whether there were enough low contrast ROIs "seen"."""
-        return sum(roi.passed_constant for roi in self.rois.values()) >= self.tolerance
+        return self.rois_visible >= self.tolerance
 
     def plot_contrast(self, axis=None):
         """Plot the contrast constant.
@@ -862,6 +1045,7 @@ class CatPhanBase:
     air_bubble_radius_mm = 7
     localization_radius = 59
     was_from_zip = False
+    region_window_mm = 300  # the window about the approximate phantom center used to find the phantom; None uses the whole slice
     modules = {
         CTP404: {'offset': 0},
     }
@@ -882,6 +1066,9 @@ class CatPhanBase:
         """
         self.origin_slice = 0
         self.catphan_roll = 0
+        self._analysis_counts = Counter()
+        self._dataset_id = None
+        self.analyzed_modules = {}
         if not osp.isdir(folderpath):
             raise NotADirectoryError("Path given was not a Directory/Folder")
         self.dicom_stack = image.DicomImageStack(folderpath, check_uid=check_uid)
@@ -949,17 +1136,17 @@ class CatPhanBase:
         plot(self.ctp404, hu_ax)
         hu_lin_ax = plt.subplot2grid(grid_size, (0, 2))
         self.ctp404.plot_linearity(hu_lin_ax)
-        if CTP486 in self.modules:
+        if CTP486 in self.analyzed_modules:
             unif_ax = plt.subplot2grid(grid_size, (0, 0))
             plot(self.ctp486, unif_ax)
             unif_prof_ax = plt.subplot2grid(grid_size, (1, 2), colspan=2)
             self.ctp486.plot_profiles(unif_prof_ax)
-        if CTP528 in self.modules:
+        if CTP528 in self.analyzed_modules:
             sr_ax = plt.subplot2grid(grid_size, (1, 0))
             plot(self.ctp528, sr_ax)
             mtf_ax = plt.subplot2grid(grid_size, (0, 3))
             self.ctp528.plot_mtf(mtf_ax)
-        if CTP515 in self.modules:
+        if CTP515 in self.analyzed_modules:
             locon_ax = plt.subplot2grid(grid_size, (1, 1))
             plot(self.ctp515, locon_ax)
 
@@ -1063,9 +1250,48 @@ class CatPhanBase:
         print('MTFs: {}'.format(mtfs))
 
     def localize(self):
-        """Find the slice number of the catphan's HU linearity module and roll angle"""
-        self.origin_slice = self.find_origin_slice()
-        self.catphan_roll = self.find_phantom_roll()
+        """Find the slice number of the catphan's HU linearity module and roll angle.
+
+        The result is kept per dataset (see :attr:`dataset_id`), region window and precision setting,
+        so loading the same dataset again is not re-localized. See :func:`clear_localizations`.
+        """
+        cached = self._cached_dataset()
+        if cached is None:
+            self.origin_slice = self.find_origin_slice()
+            self.catphan_roll = self.find_phantom_roll()
+            _localizations[self._dataset_key] = {'localization': (self.origin_slice, self.catphan_roll), 'modules': {}}
+            while len(_localizations) > MAX_LOCALIZATIONS:
+                _localizations.popitem(last=False)
+        else:
+            self.origin_slice, self.catphan_roll = cached['localization']
+
+    @property
+    def _dataset_key(self):
+        """The key of the dataset in the localization cache."""
+        return self.dataset_id, self.region_window_mm, get_precision()
+
+    def _cached_dataset(self):
+        """The cached localization and modules of the dataset, or None if it hasn't been localized."""
+        cached = _localizations.get(self._dataset_key)
+        if cached is not None:
+            _localizations.move_to_end(self._dataset_key)
+        return cached
+
+    @property
+    def dataset_id(self):
+        """The identity of the loaded dataset: the phantom model and a digest of the image data.
+        The pixel data is used rather than the instance UIDs since anonymization may make the UIDs the same across datasets.
+
+        Returns
+        -------
+        tuple
+        """
+        if self._dataset_id is None:
+            digest = hashlib.sha1()
+            for img in self.dicom_stack:
+                digest.update(np.ascontiguousarray(img.array))
+            self._dataset_id = (self._model, digest.hexdigest())
+        return self._dataset_id
 
     @property
     def mm_per_pixel(self):
@@ -1138,7 +1364,7 @@ class CatPhanBase:
 
         # get edges and make ROIs from it
         slice = Slice(self, self.origin_slice)
-        larr, regions, _ = get_regions(slice)
+        larr, regions, _ = get_regions(slice, window_mm=self.region_window_mm)
         # find appropriate ROIs and grab the two most centrally positioned ones
         hu_bubbles = [r for r in regions if (is_right_area(r) and is_right_eccentricity(r))]
         central_bubbles = sorted(hu_bubbles, key=lambda x: abs(x.centroid[1] - slice.phan_center.x))[:2]
@@ -1149,6 +1375,17 @@ class CatPhanBase:
         anglroll = np.rad2deg(phan_roll) - 90
         return anglroll
 
+    @property
+    def num_region_analyses(self):
+        """The number of phantom region analyses (edge filtering, labeling, and regionprops) performed by the last
+        call to :meth:`analyze`, or by the localization if not yet analyzed.
+
+        Returns
+        -------
+        int
+        """
+        return self._analysis_counts['regions']
+
     @property
     def num_images(self):
         """Return the number of images loaded.
@@ -1197,15 +1434,16 @@ class CatPhanBase:
             ],
         ]
         module_images = [('hu', 'lin')]
-        if CTP528 in self.modules:
+        if CTP528 in self.analyzed_modules:
+            mtf80, mtf50, mtf30 = self.ctp528.mtf([80, 50, 30])
             add = [' - CTP528 Results - ',
-             'MTF 80% (lp/mm): {:2.2f}'.format(self.ctp528.mtf(80)),
-             'MTF 50% (lp/mm): {:2.2f}'.format(self.ctp528.mtf(50)),
-             'MTF 30% (lp/mm): {:2.2f}'.format(self.ctp528.mtf(30)),
+             'MTF 80% (lp/mm): {:2.2f}'.format(mtf80),
+             'MTF 50% (lp/mm): {:2.2f}'.format(mtf50),
+             'MTF 30% (lp/mm): {:2.2f}'.format(mtf30),
             ]
             module_texts.append(add)
             module_images.append(('sp', 'mtf'))
-        if CTP486 in self.modules:
+        if CTP486 in self.analyzed_modules:
             add = [' - CTP486 Results - ',
              'Uniformity tolerance: {}'.format(self.ctp486.tolerance),
              'Uniformity ROIs: {}'.format(self.ctp486.get_ROI_vals()),
@@ -1214,7 +1452,7 @@ class CatPhanBase:
             ]
             module_texts.append(add)
             module_images.append(('un', 'prof'))
-        if CTP515 in self.modules:
+        if CTP515 in self.analyzed_modules:
             add = [' - CTP515 Results - ',
              'CNR threshold: {}'.format(self.ctp515.cnr_threshold),
              'Low contrast ROIs "seen": {}'.format(self.ctp515.rois_visible)
@@ -1260,7 +1498,7 @@ class CatPhanBase:
                 pass
 
     def analyze(self, hu_tolerance=40, scaling_tolerance=1, thickness_tolerance=0.2,
-                low_contrast_tolerance=1, cnr_threshold=15, zip_after=False):
+                low_contrast_tolerance=1, cnr_threshold=15, zip_after=False, modules=None, workers=1):
         """Single-method full analysis of CBCT DICOM files.
 
         Parameters
@@ -1281,16 +1519,63 @@ class CatPhanBase:
         zip_after : bool
             If the CT images were not compressed before analysis and this is set to true, pylinac will compress
             the analyzed images into a ZIP archive.
+        modules : iterable of module classes, optional
+            The modules to analyze, e.g. ``(CTP486,)``. The CTP404 is always analyzed. If None (default),
+            all the modules of the phantom are analyzed.
+
+            .. note:: Modules already analyzed at the same phantom location, including by another instance of the same
+                      dataset (see :func:`clear_localizations`), are not rebuilt; only the tolerances are updated and
+                      pass/fail re-evaluated from the measured values.
+        workers : int
+            The number of threads used to build the modules concurrently. Default is 1 (serial).
         """
-        self.ctp404 = CTP404(self, offset=0, hu_tolerance=hu_tolerance, thickness_tolerance=thickness_tolerance,
-                             scaling_tolerance=scaling_tolerance)
-        if CTP486 in self.modules:
-            self.ctp486 = CTP486(self, offset=self.modules[CTP486]['offset'], tolerance=hu_tolerance)
-        if CTP528 in self.modules:
-            self.ctp528 = CTP528(self, offset=self.modules[CTP528]['offset'], tolerance=None)
-        if CTP515 in self.modules:
-            self.ctp515 = CTP515(self, tolerance=low_contrast_tolerance, cnr_threshold=cnr_threshold,
-                                 offset=self.modules[CTP515]['offset'])
+        if modules is None:
+            modules = self.modules
+        unknown = [module for module in modules if module not in self.modules and module is not CTP404]
+        if unknown:
+            raise ValueError("The module(s) {} are not part of the CatPhan {}".format(unknown, self._model))
+        tolerances = OrderedDict()
+        tolerances[CTP404] = {'hu_tolerance': hu_tolerance, 'thickness_tolerance': thickness_tolerance,
+                              'scaling_tolerance': scaling_tolerance}
+        if CTP486 in modules:
+            tolerances[CTP486] = {'tolerance': hu_tolerance}
+        if CTP528 in modules:
+            tolerances[CTP528] = {'tolerance': None}
+        if CTP515 in modules:
+            tolerances[CTP515] = {'tolerance': low_contrast_tolerance, 'cnr_threshold': cnr_threshold}
+        offsets = {module: self.modules.get(module, {'offset': 0})['offset'] for module in tolerances}
+
+        # modules already built at the same location, by this instance or another one of the same dataset,
+        # only need their pass/fail re-evaluated
+        cached = self._cached_dataset()
+        cached_modules = cached['modules'] if cached is not None else {}
+        built = {}
+        for module in tolerances:
+            existing = getattr(self, module.attr_name, None)
+            if not (isinstance(existing, module) and existing.is_current(self, offsets[module])):
+                existing = cached_modules.get(module)
+                if existing is None or not existing.is_current(self, offsets[module]):
+                    continue
+                # a copy, so the tolerances of one instance don't change another's results
+                existing = copy.deepcopy(existing)
+                existing._analysis_counts = self._analysis_counts
+            existing.set_tolerances(**tolerances[module])
+            built[module] = existing
+        to_build = [module for module in tolerances if module not in built]
+
+        self._analysis_counts.clear()
+        if workers > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {module: executor.submit(module, self, offset=offsets[module], **tolerances[module])
+                           for module in to_build}
+                built.update({module: future.result() for module, future in futures.items()})
+        else:
+            built.update({module: module(self, offset=offsets[module], **tolerances[module]) for module in to_build})
+        for module, ctp_module in built.items():
+            setattr(self, module.attr_name, ctp_module)
+        if cached is not None:
+            cached['modules'].update((module, built[module]) for module in to_build)
+        self.analyzed_modules = {module: {'offset': offsets[module]} for module in tolerances}
         if zip_after and not self.was_from_zip:
             self._zip_images()
 
@@ -1309,7 +1594,7 @@ class CatPhanBase:
                                                          self.ctp404.avg_line_length, self.ctp404.passed_geometry,
                                                          self.ctp404.meas_slice_thickness,
                                                          self.ctp404.passed_thickness)
-        if CTP486 in self.modules:
+        if CTP486 in self.analyzed_modules:
             add = ('Uniformity ROIs: {}\n'
                   'Uniformity index: {:2.3f}\n'
                   'Integral non-uniformity: {:2.4f}\n'
@@ -1317,10 +1602,10 @@ class CatPhanBase:
                                                          self.ctp486.integral_non_uniformity,
                                                          self.ctp486.overall_passed)
             string += add
-        if CTP528 in self.modules:
+        if CTP528 in self.analyzed_modules:
             add = ('MTF 50% (lp/mm): {:2.2f}\n').format(self.ctp528.mtf(50))
             string += add
-        if CTP515 in self.modules:
+        if CTP515 in self.analyzed_modules:
             add = ('Low contrast ROIs "seen": {}\n').format(self.ctp515.rois_visible)
             string += add
         return string
@@ -1416,24 +1701,115 @@ class CatPhan600(CatPhanBase):
         cbct.plot_analyzed_image(show)
 
 
-def get_regions(slice_or_arr, fill_holes=False, clear_borders=True, threshold='otsu'):
-    """Get the skimage regions of a black & white image."""
+def analyze_batch(paths, catphan=CatPhan504, workers=1, publish_dir=None, **kwargs):
+    """Load, analyze, and optionally publish many CatPhan datasets.
+
+    Each dataset is handled independently; a failure is recorded in its result rather than stopping the batch.
+
+    Parameters
+    ----------
+    paths : sequence of str
+        The folders and/or ZIP archives of the datasets.
+    catphan : CatPhan class
+        The CatPhan class to analyze the datasets with, e.g. :class:`CatPhan604`.
+    workers : int
+        The number of datasets analyzed concurrently in a process pool. Default is 1 (serial, in this process).
+    publish_dir : str, optional
+        If given, a PDF report of each dataset is saved in this directory, named after the dataset.
+    kwargs
+        Passed to :meth:`~pylinac.ct.CatPhanBase.analyze`.
+
+    Returns
+    -------
+    list of dict
+        One result per dataset in the order of ``paths``. Each has the keys 'path', 'passed', 'hu', 'uniformity_index',
+        'mtf50', 'slice_thickness', 'error' (None if the analysis succeeded), 'publish_error' (None unless the PDF
+        report of an analyzed dataset failed), and 'timings', the seconds spent in the 'load', 'analyze', and 'publish' stages.
+    """
+    return run_batch(partial(_analyze_dataset, catphan=catphan, publish_dir=publish_dir, kwargs=kwargs), _batch_result,
+                     paths, workers)
+
+
+def _analyze_dataset(path, timings, catphan, publish_dir, kwargs):
+    """Load, analyze, and optionally publish one dataset of :func:`analyze_batch`. Returns the CatPhan and the publishing
+    error, if any; a failed report doesn't discard the analysis. Module-level so it can be run in a process pool."""
+    start = time.perf_counter()
+    if zipfile.is_zipfile(path):
+        cbct = catphan.from_zip(path)
+    else:
+        cbct = catphan(path)
+    timings['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cbct.analyze(**kwargs)
+    timings['analyze'] = time.perf_counter() - start
+
+    publish_error = None
+    if publish_dir is not None:
+        start = time.perf_counter()
+        try:
+            name = osp.splitext(osp.basename(osp.normpath(path)))[0]
+            cbct.publish_pdf(osp.join(publish_dir, name + '.pdf'))
+        except Exception as e:
+            publish_error = e
+        finally:
+            plt.close('all')
+        timings['publish'] = time.perf_counter() - start
+    return cbct, publish_error
+
+
+def _batch_result(path, analysis=None):
+    """Return the compact result of a batch dataset; ``analysis`` is the CatPhan and publishing error, or None if the
+    analysis failed."""
+    result = {'path': path, 'passed': None, 'hu': None, 'uniformity_index': None, 'mtf50': None,
+              'slice_thickness': None, 'publish_error': None}
+    if analysis is not None:
+        cbct, publish_error = analysis
+        result['publish_error'] = None if publish_error is None else repr(publish_error)
+        passed = [cbct.ctp404.passed_hu, cbct.ctp404.passed_thickness, cbct.ctp404.passed_geometry]
+        result['hu'] = cbct.ctp404.hu_roi_vals
+        result['slice_thickness'] = cbct.ctp404.meas_slice_thickness
+        if CTP486 in cbct.analyzed_modules:
+            result['uniformity_index'] = cbct.ctp486.uniformity_index
+            passed.append(cbct.ctp486.overall_passed)
+        if CTP528 in cbct.analyzed_modules:
+            result['mtf50'] = cbct.ctp528.mtf(50)
+        if CTP515 in cbct.analyzed_modules:
+            passed.append(cbct.ctp515.overall_passed)
+        result['passed'] = bool(all(passed))
+    return result
+
+
+def get_regions(slice_or_arr, fill_holes=False, clear_borders=True, threshold='otsu', window_mm=None):
+    """Get the skimage regions of a black & white image.
+
+    If a :class:`Slice` and ``window_mm`` are passed, only a square window of that width (in mm) about the approximate
+    phantom center (see :attr:`Slice.window_center`) is filtered and labeled. The labeled array is still the size of the
+    slice so region coordinates are unaffected.
+    The threshold is taken from a 200mm box about the slice center, or the whole window if it is smaller.
+    Region properties are computed lazily, so only those accessed (e.g. filled_area, centroid, eccentricity) are calculated.
+    """
     if threshold == 'otsu':
         thresmeth = filters.threshold_otsu
     elif threshold == 'mean':
         thresmeth = np.mean
     if isinstance(slice_or_arr, Slice):
-        edges = filters.scharr(slice_or_arr.image.array.astype(np.float))
+        window = slice_or_arr.window(window_mm)
+        array = slice_or_arr.image.array
+        edges = filters.scharr(array[window].astype(get_float_dtype()))
         center = slice_or_arr.image.center
     elif isinstance(slice_or_arr, np.ndarray):
-        edges = filters.scharr(slice_or_arr.astype(np.float))
+        edges = filters.scharr(slice_or_arr.astype(get_float_dtype()))
         center = (int(edges.shape[1]/2), int(edges.shape[0]/2))
     edges = filters.gaussian(edges, sigma=1)
     if isinstance(slice_or_arr, Slice):
+        # a 200mm box about the center, clipped to the window
         box_size = 100/slice_or_arr.mm_per_pixel
-        thres_img = edges[int(center.y-box_size):int(center.y+box_size),
-                          int(center.x-box_size):int(center.x+box_size)]
-        thres = thresmeth(thres_img)
+        y_offset, x_offset = window[0].start or 0, window[1].start or 0
+        top, bottom = (int(np.clip(int(center.y + sign*box_size) - y_offset, 0, edges.shape[0])) for sign in (-1, 1))
+        left, right = (int(np.clip(int(center.x + sign*box_size) - x_offset, 0, edges.shape[1])) for sign in (-1, 1))
+        thres_img = edges[top:bottom, left:right]
+        thres = thresmeth(thres_img if thres_img.size else edges)
     else:
         thres = thresmeth(edges)
     bw = edges > thres
@@ -1442,6 +1818,11 @@ def get_regions(slice_or_arr, fill_holes=False, clear_borders=True, threshold='o
     if fill_holes:
         bw = ndimage.binary_fill_holes(bw)
     labeled_arr, num_roi = measure.label(bw, return_num=True)
+    if isinstance(slice_or_arr, Slice) and window_mm is not None:
+        # place the window back into slice coordinates
+        full_labels, full_edges = np.zeros(array.shape, dtype=labeled_arr.dtype), np.zeros(array.shape, dtype=edges.dtype)
+        full_labels[window], full_edges[window] = labeled_arr, edges
+        labeled_arr, edges = full_labels, full_edges
     regionprops = measure.regionprops(labeled_arr, edges)
     return labeled_arr, regionprops, num_roi
 
@@ -1470,7 +1851,7 @@ def combine_surrounding_slices(dicomstack, nominal_slice_num, slices_plusminus=1
     arrays = tuple(dicomstack[s].array for s in slices)
     array_stack = np.dstack(arrays)
     if mode == 'mean':
-        combined_array = np.mean(array_stack, 2)
+        combined_array = np.mean(array_stack, 2, dtype=get_float_dtype())
     elif mode == 'median':
         combined_array = np.median(array_stack, 2)
     else:
@@ -1,15 +1,17 @@
 """Module for analyzing images, either film or EPID, for flatness and symmetry."""
 import io
 import os.path as osp
-from typing import Tuple
+from typing import Tuple, Sequence
 
 import matplotlib.pyplot as plt
+import numpy as np
+from scipy import ndimage
 
-from pylinac.core.utilities import open_path
+from pylinac.core.utilities import open_path, thread_map
 from .core.exceptions import NotAnalyzed
 from .core.io import retrieve_demo_file
 from .core.image import LinacDicomImage
-from .core.profile import SingleProfile
+from .core.profile import SingleProfile, fwxm_edges
 from .core import pdf
 from .settings import get_dicom_cmap
 
@@ -38,14 +40,8 @@ def symmetry_point_difference(profile: SingleProfile):
     lt_edge, rt_edge = profile.field_edges(field_width=0.8)
     cax = profile.fwxm_center()
     dcax = profile.values[cax]
-    max_val = 0
-    sym_array = []
-    for lt_pt, rt_pt in zip(values, values[::-1]):
-        val = 100 * abs(lt_pt - rt_pt) / dcax
-        sym_array.append(val)
-        if val > max_val:
-            max_val = val
-    symmetry = max_val
+    sym_array = 100 * np.abs(values - values[::-1]) / dcax
+    symmetry = max(sym_array.max(), 0) if sym_array.size else 0
     return symmetry, sym_array, lt_edge, rt_edge
 
 
@@ -53,17 +49,35 @@ def symmetry_pdq_iec(profile: SingleProfile):
     """Symmetry calculation by way of PDQ IEC"""
     values = profile.field_values(field_width=0.8)
     lt_edge, rt_edge = profile.field_edges(field_width=0.8)
-    max_val = 0
-    sym_array = []
-    for lt_pt, rt_pt in zip(values, values[::-1]):
-        val = max(abs(lt_pt / rt_pt), abs(rt_pt / lt_pt))
-        sym_array.append(val)
-        if val > max_val:
-            max_val = val
-    symmetry = 100 * max_val
+    sym_array = np.maximum(np.abs(values / values[::-1]), np.abs(values[::-1] / values))
+    symmetry = 100 * max(sym_array.max(), 0) if sym_array.size else 0
     return symmetry, sym_array, lt_edge, rt_edge
 
 
+def flatness_varian_map(field_values: np.ndarray) -> np.ndarray:
+    """The Varian flatness of each row of field values. Rows are NaN-padded."""
+    dmax = np.nanmax(field_values, axis=1)
+    dmin = np.nanmin(field_values, axis=1)
+    return 100 * np.abs(dmax - dmin) / (dmax + dmin)
+
+
+def flatness_elekta_map(field_values: np.ndarray) -> np.ndarray:
+    """The Elekta flatness of each row of field values. Rows are NaN-padded."""
+    return 100 * np.nanmax(field_values, axis=1) / np.nanmin(field_values, axis=1)
+
+
+def symmetry_point_difference_map(field_values: np.ndarray, mirrored_values: np.ndarray, cax_values: np.ndarray) -> np.ndarray:
+    """The point difference symmetry of each row of field values. ``mirrored_values`` are the field values
+    reflected about the field center and ``cax_values`` the profile values at the CAX."""
+    return 100 * np.nanmax(np.abs(field_values - mirrored_values), axis=1) / cax_values
+
+
+def symmetry_pdq_iec_map(field_values: np.ndarray, mirrored_values: np.ndarray, cax_values: np.ndarray) -> np.ndarray:
+    """The PDQ IEC symmetry of each row of field values. See :func:`symmetry_point_difference_map`."""
+    quotients = np.abs(field_values / mirrored_values)
+    return 100 * np.nanmax(np.maximum(quotients, 1 / quotients), axis=1)
+
+
 SYMMETRY_EQUATIONS = {
     'varian': symmetry_point_difference,
     'point difference': symmetry_point_difference,
@@ -77,6 +91,90 @@ FLATNESS_EQUATIONS = {
     'siemens': flatness_varian,
     'iec': flatness_elekta,
 }
+SYMMETRY_MAP_EQUATIONS = {
+    'varian': symmetry_point_difference_map,
+    'point difference': symmetry_point_difference_map,
+    'elekta': symmetry_pdq_iec_map,
+    'pdq iec': symmetry_pdq_iec_map,
+}
+FLATNESS_MAP_EQUATIONS = {
+    'varian': flatness_varian_map,
+    'elekta': flatness_elekta_map,
+    'vom80': flatness_varian_map,
+    'siemens': flatness_varian_map,
+    'iec': flatness_elekta_map,
+}
+
+
+def profile_map(profiles: np.ndarray, flatness_method: str='varian', symmetry_method: str='varian',
+                field_width: float=0.8) -> dict:
+    """Calculate the field edges, flatness, and symmetry of a stack of profiles at once.
+
+    The results match those of :class:`~pylinac.core.profile.SingleProfile` and the ``FLATNESS_EQUATIONS`` and
+    ``SYMMETRY_EQUATIONS`` for each profile, except that the penumbra search starts from the maximum
+    of the central 60% of each profile rather than a detected peak.
+
+    Parameters
+    ----------
+    profiles : ndarray
+        A 2D array of profiles; one profile per row.
+    flatness_method : {'varian', 'elekta', 'vom80', 'siemens', 'iec'}
+        The flatness algorithm; see ``FLATNESS_MAP_EQUATIONS``.
+    symmetry_method : {'varian', 'elekta', 'point difference', 'pdq iec'}
+        The symmetry algorithm; see ``SYMMETRY_MAP_EQUATIONS``.
+    field_width : float
+        The ratio of the FWHM that flatness and symmetry are evaluated over.
+
+    Returns
+    -------
+    dict
+        Arrays of the 'left' and 'right' FWHM edges, the 'center', the 'field left' and 'field right' edges of the
+        evaluated region, and the 'flatness' and 'symmetry' of each profile. Profiles that don't cross the field,
+        i.e. whose maximum is less than half that of the brightest profile, are NaN.
+    """
+    profiles = np.asarray(profiles, dtype=float)
+    num_profiles, length = profiles.shape
+    rows = np.arange(num_profiles)[:, np.newaxis]
+    search = slice(int(round(0.2 * length)), int(round(0.8 * length)))
+    initial_peaks = profiles[:, search].argmax(axis=1) + search.start
+    left, right = fwxm_edges(profiles, initial_peaks=initial_peaks)
+    maxes = profiles.max(axis=1)
+    floor = profiles.min()
+    in_field = ~np.isnan(left) & ~np.isnan(right) & (maxes - floor >= (maxes.max() - floor) / 2)
+
+    # field edges as SingleProfile.field_edges() calculates them
+    left, right = np.where(in_field, left, 0), np.where(in_field, right, 0)
+    width = right - left
+    center = np.round(np.abs(left + width / 2))
+    field_left = np.clip(np.round(center - field_width * width / 2), 0, length).astype(int)
+    field_right = np.clip(np.round(center + field_width * width / 2), 0, length).astype(int)
+
+    # gather the field values left-aligned and their mirror about the field center, padded with NaN
+    offsets = np.arange(max(int((field_right - field_left).max()), 1))
+    in_window = offsets < (field_right - field_left)[:, np.newaxis]
+    field_values = np.where(in_window, profiles[rows, np.clip(field_left[:, np.newaxis] + offsets, 0, length - 1)], np.nan)
+    mirrored_values = np.where(in_window, profiles[rows, np.clip(field_right[:, np.newaxis] - 1 - offsets, 0, length - 1)], np.nan)
+    in_field &= in_window.any(axis=1)
+    field_values[~in_field] = mirrored_values[~in_field] = 1
+    cax_values = profiles[rows[:, 0], center.astype(int)]
+
+    flatness = FLATNESS_MAP_EQUATIONS[flatness_method.lower()](field_values)
+    symmetry = SYMMETRY_MAP_EQUATIONS[symmetry_method.lower()](field_values, mirrored_values, cax_values)
+    results = {'left': left, 'right': right, 'center': center, 'field left': field_left, 'field right': field_right,
+               'flatness': flatness, 'symmetry': symmetry}
+    return {key: np.where(in_field, value, np.nan) for key, value in results.items()}
+
+
+def diagonal_profiles(array: np.ndarray) -> np.ndarray:
+    """Sample the two corner-to-corner diagonals of an array with linear interpolation. The first runs from the
+    top-left to the bottom-right corner and the second from the bottom-left to the top-right corner. Samples are
+    about one pixel apart."""
+    num_rows, num_cols = array.shape
+    num = int(round(np.hypot(num_rows, num_cols)))
+    rows = np.linspace(0, num_rows - 1, num)
+    cols = np.linspace(0, num_cols - 1, num)
+    coords = np.array([[rows, cols], [rows[::-1], cols]])
+    return np.array([ndimage.map_coordinates(np.asarray(array, dtype=float), coord, order=1) for coord in coords])
 
 
 class FlatSym(LinacDicomImage):
@@ -90,6 +188,8 @@ class FlatSym(LinacDicomImage):
         Contains the method of calculation and the vertical and horizontal flatness data including the value.
     positions : dict
         The position ratio used for analysis for vertical and horizontal.
+    maps : dict
+        The flatness & symmetry of every row, column, and diagonal of the image; see :meth:`analyze_map`.
     """
 
     def __init__(self, path: str):
@@ -103,6 +203,7 @@ class FlatSym(LinacDicomImage):
         self.symmetry: dict = {}
         self.flatness: dict = {}
         self.positions: dict = {}
+        self.maps: dict = {}
         self._is_analyzed: bool = False
 
     @classmethod
@@ -140,6 +241,34 @@ class FlatSym(LinacDicomImage):
         self.positions = {'vertical': vert_position, 'horizontal': horiz_position}
         self._is_analyzed = True
 
+    def analyze_map(self, flatness_method: str='varian', symmetry_method: str='varian') -> dict:
+        """Calculate the field edges, flatness & symmetry along every row and column of the image and along its
+        two diagonals at once. This is useful for trending off-axis changes such as beam steering.
+
+        Parameters
+        ----------
+        flatness_method : {'varian', 'elekta', 'vom80', 'siemens', 'iec'}
+            The flatness algorithm. See :ref:`analysis_definitions` for equations.
+        symmetry_method : {'varian', 'elekta', 'point difference', 'pdq iec'}
+            The symmetry algorithm. See :ref:`analysis_definitions` for equations.
+
+        Returns
+        -------
+        dict
+            The methods used and the 'rows', 'columns', and 'diagonals' results of :func:`profile_map`.
+            E.g. ``maps['rows']['flatness'][100]`` is the flatness along row 100. Rows and columns outside the
+            field are NaN. The diagonals are sampled by :func:`diagonal_profiles`.
+        """
+        array = np.asarray(self.array, dtype=float)
+        self.maps = {
+            'flatness method': flatness_method,
+            'symmetry method': symmetry_method,
+            'rows': profile_map(array, flatness_method, symmetry_method),
+            'columns': profile_map(np.ascontiguousarray(array.T), flatness_method, symmetry_method),
+            'diagonals': profile_map(diagonal_profiles(array), flatness_method, symmetry_method),
+        }
+        return self.maps
+
     def results(self) -> str:
         """Get the results of the analysis.
 
@@ -311,7 +440,7 @@ class FlatSym(LinacDicomImage):
         axis.axvline(data['profile right'], color='g', linestyle='-.')
         axis.axvline(cax_idx, color='m', linestyle='-.')
         # plot symmetry array
-        if not data['array'] == 0:
+        if not np.isscalar(data['array']):
             twin_axis = axis.twinx()
             twin_axis.plot(range(cax_idx, data['profile right']), data['array'][int(round(len(data['array'])/2)):])
             twin_axis.set_ylabel("Symmetry (%)")
@@ -328,6 +457,143 @@ class FlatSym(LinacDicomImage):
         plt.savefig(filename)
 
 
+class FlatSymSeries:
+    """Analyze a series of flatness & symmetry images with the same settings, e.g. the daily EPID images of one energy.
+
+    Images are loaded and analyzed concurrently. Nothing is plotted or rendered during analysis; plots and the
+    PDF are only made when requested.
+
+    Attributes
+    ----------
+    images : list
+        The :class:`~pylinac.flatsym.FlatSym` of each image, in the order given.
+
+    Examples
+    --------
+    Analyze a week of images and get the statistics of the series:
+        >>> series = FlatSymSeries(['6x_mon.dcm', '6x_tue.dcm', '6x_wed.dcm', '6x_thu.dcm', '6x_fri.dcm'], workers=4)
+        >>> series.analyze(flatness_method='varian', symmetry_method='varian')
+        >>> series.statistics()['vertical symmetry']['max']
+    """
+    columns = ('vertical flatness', 'horizontal flatness', 'vertical symmetry', 'horizontal symmetry',
+               'vertical field size', 'horizontal field size')
+
+    def __init__(self, filenames: Sequence, workers: int=1):
+        """
+        Parameters
+        ----------
+        filenames : sequence
+            The paths of the images.
+        workers : int
+            The number of images loaded and analyzed concurrently in a thread pool. Default is 1 (serial).
+        """
+        self.workers = workers
+        self.images = thread_map(FlatSym, filenames, self.workers)
+        self._is_analyzed = False
+
+    def analyze(self, flatness_method: str, symmetry_method: str, vert_position: float=0.5, horiz_position: float=0.5):
+        """Analyze all the images with the same settings. See :meth:`~pylinac.flatsym.FlatSym.analyze` for parameter info."""
+        thread_map(lambda fs: fs.analyze(flatness_method, symmetry_method, vert_position, horiz_position), self.images,
+                   self.workers)
+        self._is_analyzed = True
+
+    @property
+    def profiles(self) -> dict:
+        """The analyzed 'vertical' and 'horizontal' profiles of all the images, each stacked into an array of shape
+        (images, profile length). Profiles shorter than the longest one are padded with NaN."""
+        if not self._is_analyzed:
+            raise NotAnalyzed("Series is not analyzed yet. Use analyze() first.")
+        profiles = {}
+        for direction in ('vertical', 'horizontal'):
+            values = [fs.flatness[direction]['profile'].values for fs in self.images]
+            stack = np.full((len(values), max(len(v) for v in values)), np.nan)
+            for idx, profile_values in enumerate(values):
+                stack[idx, :len(profile_values)] = profile_values
+            profiles[direction] = stack
+        return profiles
+
+    def summary(self) -> dict:
+        """The results of each image as a table: a dict of the file names ('file') and of an array per column of
+        :attr:`columns`, in the order of the images. Flatness and symmetry are in %; the field sizes are the FWHM
+        of the profiles in mm."""
+        if not self._is_analyzed:
+            raise NotAnalyzed("Series is not analyzed yet. Use analyze() first.")
+        table = {'file': [fs.path for fs in self.images]}
+        for direction in ('vertical', 'horizontal'):
+            table[f'{direction} flatness'] = np.array([fs.flatness[direction]['value'] for fs in self.images])
+            table[f'{direction} symmetry'] = np.array([fs.symmetry[direction]['value'] for fs in self.images])
+            table[f'{direction} field size'] = np.array([fs.flatness[direction]['profile'].fwxm() / fs.dpmm
+                                                         for fs in self.images])
+        return table
+
+    def statistics(self) -> dict:
+        """The 'mean', 'std', 'min', and 'max' of each of the :attr:`columns` of the :meth:`summary` across the series."""
+        table = self.summary()
+        return {column: {'mean': table[column].mean(), 'std': table[column].std(),
+                         'min': table[column].min(), 'max': table[column].max()}
+                for column in self.columns}
+
+    def results(self) -> str:
+        """Get the statistics of the series as a string."""
+        statistics = self.statistics()
+        lines = ['Flatness & Symmetry Series',
+                 '==========================',
+                 f'Images: {len(self.images)}',
+                 f"Flatness method: {self.images[0].flatness['method'].capitalize()}",
+                 f"Symmetry method: {self.images[0].symmetry['method'].capitalize()}"]
+        for column in self.columns:
+            stats = statistics[column]
+            unit = 'mm' if 'size' in column else '%'
+            lines.append(f"{column.capitalize()}: mean {stats['mean']:.2f}{unit}, std {stats['std']:.2f}{unit}, "
+                         f"min {stats['min']:.2f}{unit}, max {stats['max']:.2f}{unit}")
+        return '\n'.join(lines) + '\n'
+
+    def plot(self, show: bool=True):
+        """Plot the flatness and symmetry of each image across the series.
+
+        Parameters
+        ----------
+        show : bool
+            Whether to show the plot when called.
+        """
+        table = self.summary()
+        fig, (flat_ax, sym_ax) = plt.subplots(2, 1, sharex=True)
+        for axis, quantity in zip((flat_ax, sym_ax), ('flatness', 'symmetry')):
+            for direction in ('vertical', 'horizontal'):
+                axis.plot(table[f'{direction} {quantity}'], marker='o', label=direction.capitalize())
+            axis.set_ylabel(f'{quantity.capitalize()} (%)')
+            axis.grid(True)
+            axis.legend()
+        sym_ax.set_xlabel('Image #')
+        plt.suptitle("Flatness & Symmetry Series")
+        if show:
+            plt.show()
+
+    def publish_pdf(self, filename: str, open_file: bool=False, metadata: dict=None):
+        """Publish (print) a PDF containing the statistics and trend plot of the series. The PDF of an individual
+        image can be published from :attr:`images`.
+
+        Parameters
+        ----------
+        filename : (str, file-like object}
+            The file to write the results to.
+        open_file : bool
+            Whether to open the file using the default program after creation.
+        metadata : dict
+            Extra data to be passed and shown in the PDF. The key and value will be shown with a colon.
+        """
+        canvas = pdf.PylinacCanvas(filename, page_title="Flatness & Symmetry Series Analysis", metadata=metadata)
+        canvas.add_text(text=self.results().splitlines(), location=(1, 25.5), font_size=10)
+        data = io.BytesIO()
+        self.plot(show=False)
+        plt.savefig(data)
+        canvas.add_image(data, location=(1, 3), dimensions=(19, 17))
+        canvas.finish()
+
+        if open_file:
+            open_path(filename)
+
+
 def _remove_ticklabels(axis: plt.Axes):
     axis.get_yaxis().set_ticklabels([])
     axis.get_xaxis().set_ticklabels([])
@@ -14,10 +14,10 @@ Features:
 """
 from collections import Sequence
 from functools import lru_cache
+import hashlib
 import os.path as osp
 import io
-from itertools import cycle
-from tempfile import TemporaryDirectory
+from itertools import chain
 from typing import Union, Tuple, List
 
 import argue
@@ -26,12 +26,12 @@ from mpl_toolkits.axes_grid1 import make_axes_locatable
 import numpy as np
 
 from pylinac.core.typing import NumberLike
-from pylinac.core.utilities import open_path
+from pylinac.core.utilities import open_path, thread_map
 from .core import image
 from .core.geometry import Line, Rectangle, Point
 from .core.io import get_url, retrieve_demo_file
 from .core import pdf
-from .core.profile import MultiProfile, SingleProfile
+from .core.profile import MultiProfile, fwxm_centers
 from .log_analyzer import load_log
 from .settings import get_dicom_cmap
 
@@ -39,6 +39,9 @@ from .settings import get_dicom_cmap
 UP_DOWN = 'Up-Down'
 LEFT_RIGHT = 'Left-Right'
 
+# picket positions derived from machine logs, keyed by the SHA-1 digest of the log file.
+_LOG_PICKET_CACHE = {}
+
 
 class PFDicomImage(image.LinacDicomImage):
     """A subclass of a DICOM image that checks for noise and inversion when instantiated. Can also adjust for EPID sag."""
@@ -65,6 +68,34 @@ class PFDicomImage(image.LinacDicomImage):
         min_is_extreme = (min < near_min * 0.75) and (abs(min - near_min) > 0.1 * (near_max - near_min))
         return max_is_extreme or min_is_extreme
 
+    @classmethod
+    def from_multiples(cls, filelist: Sequence, method: str='mean', stretch: bool=True, **kwargs):
+        """Superimpose multiple DICOM images in memory.
+
+        The images are combined one at a time (see :func:`~pylinac.core.image.superimpose`). The metadata of the
+        first image is kept and the combined image is given the pixel data type of the first image.
+
+        Parameters
+        ----------
+        filelist : sequence
+            The paths of the images to superimpose.
+        method : {'mean', 'max', 'sum'}
+            How the image values are combined.
+        stretch : bool
+            Whether to stretch the values of each image to the full range of the data type before combining.
+        kwargs
+            Passed to the constructor of the first image.
+        """
+        obj = cls.__new__(cls)
+        image.LinacDicomImage.__init__(obj, filelist[0], **kwargs)
+        other_imgs = (image.load(path) for path in filelist[1:])
+        obj.array = image.superimpose(chain((obj,), other_imgs), method=method, stretch=stretch)
+        obj.check_inversion()
+        obj.array = obj.array.astype(obj._original_dtype)
+        obj._check_for_noise()
+        obj.check_inversion(position=(0.2, 0.05))
+        return obj
+
     def adjust_for_sag(self, sag, orientation):
         """Roll the image to adjust for EPID sag."""
         direction = 'y' if orientation == UP_DOWN else 'x'
@@ -110,7 +141,7 @@ class PicketFence:
             If None (default), no filtering will be done to the image.
             If an int, will perform median filtering over image of size ``filter``.
         log : str
-            Path to a log file corresponding to the delivery. The expected fluence of the log file is
+            Path to a log file corresponding to the delivery. The expected MLC positions of the log file are
             used to construct the pickets. MLC peaks are then compared to an absolute reference instead of
             a fitted picket.
         use_filename : bool
@@ -125,7 +156,7 @@ class PicketFence:
         if log is not None:
             self._load_log(log)
         else:
-            self._log_fits = None
+            self._log_pickets = None
         self._is_analyzed = False
 
     @classmethod
@@ -142,19 +173,17 @@ class PicketFence:
 
     @classmethod
     def from_multiple_images(cls, path_list: Sequence):
-        """Load and superimpose multiple images and instantiate a Starshot object.
+        """Load and superimpose multiple images and instantiate a PicketFence object.
+
+        The images are combined in memory; see :meth:`~pylinac.picketfence.PFDicomImage.from_multiples`.
 
         Parameters
         ----------
         path_list : iterable
             An iterable of path locations to the files to be loaded/combined.
         """
-        obj = cls.from_demo_image()
-        # save a combined image to a temporary dir, then load it back in as a PFDicomImage
-        with TemporaryDirectory() as tmp:
-            filename = osp.join(tmp, 'mydcm.dcm')
-            image.load_multiples(path_list, method='mean').save(filename)
-            obj.image = PFDicomImage(filename)
+        obj = cls(filename=None)
+        obj.image = PFDicomImage.from_multiples(list(path_list))
         return obj
 
     @property
@@ -204,20 +233,8 @@ class PicketFence:
         """Load a machine log that corresponds to the picket fence delivery.
 
         This log determines the location of the pickets. The MLC peaks are then compared to the expected log pickets,
-        not a simple fit of the peaks."""
-        # load the log fluence image
-        mlog = load_log(log)
-        fl = mlog.fluence.expected.calc_map(equal_aspect=True)
-        fli = image.load(fl, dpi=254)  # 254 pix/in => 1 pix/0.1mm (default fluence calc)
-
-        # equate them such that they're the same size & DPI
-        fluence_img, self.image = image.equate_images(fli, self.image)
-
-        # get picket fits from the modified fluence image
-        pf = PicketFence.from_demo_image()
-        pf.image = fluence_img
-        pf.analyze()
-        self._log_fits = cycle([p.fit for p in pf.pickets])
+        not a simple fit of the peaks. See :func:`~pylinac.picketfence.load_log_pickets`."""
+        self._log_pickets = load_log_pickets(log)
 
     @staticmethod
     def run_demo(tolerance: float=0.5, action_tolerance: float=None):
@@ -281,7 +298,17 @@ class PicketFence:
 
         """Pre-analysis"""
         self._orientation = orientation
-        self.settings = Settings(self.orientation, tolerance, action_tolerance, hdmlc, self.image, self._log_fits)
+        settings = Settings(self.orientation, tolerance, action_tolerance, hdmlc, self.image, None)
+        if self._log_pickets is not None:
+            settings.log_fits = self._log_pickets.fits(settings)
+        self._analyze_with(settings, num_pickets, sag_adjustment, invert)
+
+    def _analyze_with(self, settings: 'Settings', num_pickets: int=None, sag_adjustment: Union[float, int]=0,
+                      invert: bool=False):
+        """Analyze the image with the given settings. The settings may be shared with other images of the same
+        geometry; see :class:`~pylinac.picketfence.PicketFenceSeries`."""
+        self._orientation = settings.orientation
+        self.settings = settings
         # adjust for sag
         if sag_adjustment != 0:
             sag_pixels = int(round(sag_adjustment * self.settings.dpmm))
@@ -518,6 +545,217 @@ class Overlay:
             r.plot2axes(axes.axes, edgecolor='none', fill=True, alpha=0.1, facecolor=color)
 
 
+class PicketFenceSeries:
+    """Analyze a series of picket fence images acquired with the same setup, e.g. at several gantry angles.
+
+    Images are loaded and analyzed concurrently. Images whose headers give the same size, DPMM and CAX share one
+    set of analysis settings, so the picket orientation and leaf geometry are determined once per setup rather than
+    once per image.
+
+    Attributes
+    ----------
+    picket_fences : list
+        The :class:`~pylinac.picketfence.PicketFence` of each image, in the order given.
+
+    Examples
+    --------
+    Analyze the daily images and trend the leaf errors:
+        >>> series = PicketFenceSeries(['pf_g0.dcm', 'pf_g90.dcm', 'pf_g180.dcm', 'pf_g270.dcm'], workers=4)
+        >>> series.analyze(tolerance=0.5)
+        >>> errors = series.error_matrix  # image x leaf x picket
+    """
+    def __init__(self, filenames: Sequence, filter: int=None, use_filename: bool=False, workers: int=1):
+        """
+        Parameters
+        ----------
+        filenames : sequence
+            The paths of the images.
+        filter : int, None
+            If an int, each image is median filtered with a filter of this size when loaded.
+        use_filename : bool
+            Whether to interpret the gantry and/or collimator angle from the file names.
+        workers : int
+            The number of images loaded and analyzed concurrently in a thread pool. Default is 1 (serial).
+        """
+        self.workers = workers
+        self.picket_fences = thread_map(lambda path: PicketFence(path, filter=filter, use_filename=use_filename),
+                                        filenames, self.workers)
+        self._is_analyzed = False
+
+    @staticmethod
+    def _geometry(pf: PicketFence) -> tuple:
+        """The header values that determine the analysis geometry of an image.
+        The collimator angle is included since it determines the picket orientation."""
+        try:
+            cax = pf.image.cax
+        except AttributeError:
+            cax = pf.image.center
+        return (pf.image.shape, round(pf.image.dpmm, 6), round(cax.x, 3), round(cax.y, 3),
+                round(pf.image.collimator_angle) % 360)
+
+    def analyze(self, tolerance: float=0.5, action_tolerance: float=None, hdmlc: bool=False, num_pickets: int=None,
+                sag_adjustment: Union[float, int]=0, orientation: str=None, invert: bool=False):
+        """Analyze all the images. See :meth:`~pylinac.picketfence.PicketFence.analyze` for parameter info.
+
+        The orientation, if not passed, is determined from the first image of each geometry (image size, resolution, CAX,
+        and collimator angle) and used for the others.
+        """
+        if action_tolerance is not None and tolerance < action_tolerance:
+            raise ValueError("Tolerance cannot be lower than the action tolerance")
+        shared_settings = {}
+        for pf in self.picket_fences:
+            geometry = self._geometry(pf)
+            if geometry not in shared_settings:
+                pf._orientation = orientation
+                settings = Settings(pf.orientation, tolerance, action_tolerance, hdmlc, pf.image, None)
+                settings.leaf_centers  # computed once, before the settings are shared between threads
+                shared_settings[geometry] = settings
+        thread_map(lambda pf: pf._analyze_with(shared_settings[self._geometry(pf)], num_pickets, sag_adjustment, invert),
+                   self.picket_fences, self.workers)
+        self._is_analyzed = True
+
+    @property
+    def gantry_angles(self) -> List[float]:
+        """The gantry angle of each image."""
+        return [pf.image.gantry_angle for pf in self.picket_fences]
+
+    @property
+    def passed(self) -> bool:
+        """Whether all the MLC positions of all the images were within tolerance."""
+        return all(pf.passed for pf in self.picket_fences)
+
+    @property
+    def error_matrix(self) -> np.ndarray:
+        """The error of each leaf of each picket of each image in mm, as an array of shape
+        (images, leaves, pickets). The leaves are those of :attr:`~pylinac.picketfence.Settings.leaf_centers`.
+        Leaves that were not measured, and the padding of images with fewer leaves or pickets than others, are NaN."""
+        if not self._is_analyzed:
+            raise AttributeError("The series has not been analyzed yet")
+        num_leaves = max(len(pf.settings.leaf_centers) for pf in self.picket_fences)
+        num_pickets = max(pf.num_pickets for pf in self.picket_fences)
+        errors = np.full((len(self.picket_fences), num_leaves, num_pickets), np.nan)
+        for image_idx, pf in enumerate(self.picket_fences):
+            for picket_idx, picket in enumerate(pf.pickets):
+                leaf_errors = picket.leaf_errors
+                errors[image_idx, :len(leaf_errors), picket_idx] = leaf_errors
+        return errors
+
+
+def load_log_pickets(log: str) -> 'LogPickets':
+    """Derive the expected picket positions of a picket fence delivery directly from the MLC positions of a machine log.
+
+    No fluence is calculated. For every leaf pair, the positions where the pair sat while the bulk of the MU was
+    delivered are taken as its pickets. The result is cached by the SHA-1 digest of the log file so repeated
+    analyses of the same delivery reuse it.
+
+    Parameters
+    ----------
+    log : str
+        Path to the machine log (Dynalog A-file or Trajectory log).
+
+    Returns
+    -------
+    :class:`~pylinac.picketfence.LogPickets`
+
+    Raises
+    ------
+    ValueError
+        If the log isn't of a 60-pair (Millennium or HD) MLC.
+    """
+    with open(log, 'rb') as log_file:
+        digest = hashlib.sha1(log_file.read()).hexdigest()
+    if digest not in _LOG_PICKET_CACHE:
+        mlog = load_log(log)
+        mlc = mlog.axis_data.mlc
+        mu = mlog.axis_data.mu.expected
+        mu_differential = np.diff(np.concatenate(([0], mu)))
+        positions = []
+        for pair in range(1, mlc.num_pairs + 1):
+            if mlc.leaf_under_y_jaw(pair):
+                positions.append(np.array([]))
+                continue
+            # leaf positions are in cm; the A-bank (left) leaves are positive when retracted
+            right = mlc.leaf_axes[pair].expected * 10
+            left = -mlc.leaf_axes[pair + mlc.num_pairs].expected * 10
+            open_mu = np.where(right > left, mu_differential, 0)
+            centers = (right + left) / 2
+            # group the stationary positions of the pair and keep those that received most of the MU
+            _, groups = np.unique(np.round(centers, 1), return_inverse=True)
+            group_mu = np.bincount(groups, weights=open_mu)
+            if group_mu.max() <= 0:
+                positions.append(np.array([]))
+                continue
+            pickets = np.flatnonzero(group_mu >= group_mu.max() / 2)
+            positions.append(np.array([np.average(centers[groups == g], weights=open_mu[groups == g]) for g in pickets]))
+        # pairs that don't show the same number of pickets as most others can't be assigned and are ignored
+        num_pickets = np.bincount([len(p) for p in positions]).argmax()
+        picket_positions = np.full((num_pickets, mlc.num_pairs), np.nan)
+        for idx, pair_positions in enumerate(positions):
+            if len(pair_positions) == num_pickets:
+                picket_positions[:, idx] = pair_positions
+        _LOG_PICKET_CACHE[digest] = LogPickets(picket_positions, mlc.hdmlc)
+    return _LOG_PICKET_CACHE[digest]
+
+
+class LogPickets:
+    """The expected picket positions of a machine log delivery. Created by :func:`~pylinac.picketfence.load_log_pickets`.
+
+    Attributes
+    ----------
+    positions : numpy.ndarray
+        The picket positions in mm from the CAX along the leaf motion, one row per picket and one column per leaf pair.
+        Pairs that could not be assigned (e.g. under a jaw) are NaN.
+    hdmlc : bool
+        Whether the log is of an HD MLC.
+    """
+    num_pairs = 60
+
+    def __init__(self, positions: np.ndarray, hdmlc: bool):
+        if positions.shape[1] != self.num_pairs:
+            raise ValueError(f"Log pickets are only supported for {self.num_pairs}-pair MLCs (Millennium or HD); "
+                             f"the log has {positions.shape[1]} pairs")
+        self.positions = positions
+        self.hdmlc = hdmlc
+
+    @property
+    def pair_centers(self) -> np.ndarray:
+        """The centers of the leaf pairs in mm from the CAX, perpendicular to the leaf motion.
+        The boundary of the two central pairs is at the CAX."""
+        if self.hdmlc:
+            small_width, large_width, num_small, num_large = 2.5, 5, 32, 14
+        else:
+            small_width, large_width, num_small, num_large = 5, 10, 40, 10
+        widths = np.concatenate((np.repeat(large_width, num_large), np.repeat(small_width, num_small),
+                                 np.repeat(large_width, num_large)))
+        edges = np.cumsum(widths)
+        return edges - widths / 2 - edges[-1] / 2
+
+    def fits(self, settings: 'Settings') -> List[np.poly1d]:
+        """Convert the picket positions to fits in the pixel space of the image. Like the fits of
+        :class:`~pylinac.picketfence.Picket`, these give the position along the leaf motion as a function of the position
+        along the leaf stack. The first leaf pair is toward the smallest pixel index and positive leaf positions
+        are toward larger pixel indices, i.e. the image is assumed to be unmirrored and at collimator 0 (or 90 for
+        left-right pickets). Pickets that don't match a log picket raise an error when they are analyzed;
+        see :meth:`~pylinac.picketfence.Picket.fit`.
+
+        Parameters
+        ----------
+        settings : :class:`~pylinac.picketfence.Settings`
+            The analysis settings; provides the orientation, CAX and DPMM.
+        """
+        if settings.orientation == UP_DOWN:
+            leaf_cax, travel_cax = settings.image_center.y, settings.image_center.x
+        else:
+            leaf_cax, travel_cax = settings.image_center.x, settings.image_center.y
+        leaf_pixels = leaf_cax + self.pair_centers * settings.dpmm
+        fits = []
+        for picket in self.positions:
+            valid = ~np.isnan(picket)
+            travel_pixels = travel_cax + picket[valid] * settings.dpmm
+            fits.append(np.poly1d(np.polyfit(leaf_pixels[valid], travel_pixels, 1)))
+        return fits
+
+
 class Settings:
     """Simple class to hold various settings and info for PF analysis/plotting."""
     def __init__(self, orientation, tolerance, action_tolerance, hdmlc, image, log_fits):
@@ -671,23 +909,29 @@ class Picket:
     ----------
     mlc_meas : list
         Holds :class:`~pylinac.picketfence.MLCMeas` objects.
+    max_log_offset : float
+        The largest distance in mm at the CAX between a picket and its nearest log picket when a machine log is used.
     """
+    max_log_offset = 5
+
     def __init__(self, image, settings, approximate_idx, spacing):
         self.mlc_meas = []
         self.image = image
         self.settings = settings
         self.approximate_idx = approximate_idx
         self.spacing = spacing
+        self._sample_width = None
+        self._fit = None
         self._get_mlc_positions()
 
     def _get_mlc_positions(self):
         """Calculate the positions of all the MLC pairs."""
-        # for each MLC...
-        for mlc_num, mlc_center in enumerate(self.settings.leaf_centers):
-            # find the MLC peak
-            mlc_position = self.find_mlc_peak(mlc_center)
+        # find the MLC peaks of all the leaves at once
+        leaf_centers = self.settings.leaf_centers
+        mlc_positions = self.find_mlc_peaks(leaf_centers)
+        for mlc_center, mlc_position in zip(leaf_centers, mlc_positions):
             # add MLC measurement object
-            if mlc_position is not None:
+            if not np.isnan(mlc_position):
                 self.add_mlc_meas(mlc_center, mlc_position)
         # now add the picket fit to the measurement so it can calculate error, etc.
         for idx, meas in enumerate(self.mlc_meas):
@@ -695,15 +939,40 @@ class Picket:
 
     def find_mlc_peak(self, mlc_center):
         """Determine the center of the picket."""
-        mlc_rows = np.arange(mlc_center - self.sample_width, mlc_center + self.sample_width + 1)
+        mlc_position = self.find_mlc_peaks([mlc_center])[0]
+        if not np.isnan(mlc_position):
+            return mlc_position
+
+    def find_mlc_peaks(self, mlc_centers: Sequence) -> np.ndarray:
+        """Determine the center of the picket for each of the given leaf centers.
+
+        The median profiles of all the leaf bands are taken in one pass and their FWXM centers
+        are found together. Leaves whose profile does not rise above the picket threshold are NaN.
+        """
+        mlc_rows = np.asarray(mlc_centers, dtype=int)[:, np.newaxis] + np.arange(-self.sample_width, self.sample_width + 1)
+        picket_array = np.asarray(self.picket_array)
         if self.settings.orientation == UP_DOWN:
-            pix_vals = np.median(self.picket_array[mlc_rows, :], axis=0)
+            pix_vals = np.median(picket_array[mlc_rows, :], axis=1)
         else:
-            pix_vals = np.median(self.picket_array[:, mlc_rows], axis=1)
-        if max(pix_vals) > np.percentile(self.picket_array, 80):
-            prof = SingleProfile(pix_vals)
-            fw80mc = prof.fwxm_center(70, interpolate=True)
-            return fw80mc + self.approximate_idx - self.spacing
+            pix_vals = np.median(picket_array[:, mlc_rows], axis=2).T
+        # the threshold is the same for all the leaves
+        above_threshold = pix_vals.max(axis=1) > np.percentile(picket_array, 80)
+        mlc_positions = np.full(len(mlc_rows), np.nan)
+        if above_threshold.any():
+            fw80mcs = fwxm_centers(pix_vals[above_threshold], 70, interpolate=True)
+            mlc_positions[above_threshold] = fw80mcs + self.approximate_idx - self.spacing
+        return mlc_positions
+
+    @property
+    def leaf_errors(self) -> np.ndarray:
+        """The error of each leaf of :attr:`~pylinac.picketfence.Settings.leaf_centers` in mm.
+        Leaves that were not measured are NaN."""
+        leaf_centers = self.settings.leaf_centers
+        axis = 'y' if self.settings.orientation == UP_DOWN else 'x'
+        measured = np.searchsorted(leaf_centers, [getattr(meas.center, axis) for meas in self.mlc_meas])
+        errors = np.full(len(leaf_centers), np.nan)
+        errors[measured] = self.error_array
+        return errors
 
     def add_mlc_meas(self, mlc_center, mlc_position):
         """Add an MLC measurement point."""
@@ -719,7 +988,9 @@ class Picket:
     @property
     def sample_width(self) -> float:
         """The width to sample the MLC leaf (~40% of the leaf width)."""
-        return np.round(np.median(np.diff(self.settings.leaf_centers) * 2 / 5) / 2).astype(int)
+        if self._sample_width is None:
+            self._sample_width = np.round(np.median(np.diff(self.settings.leaf_centers) * 2 / 5) / 2).astype(int)
+        return self._sample_width
 
     @property
     @lru_cache()
@@ -764,18 +1035,41 @@ class Picket:
             raise AttributeError("No action tolerance was specified")
 
     @property
-    @lru_cache(maxsize=1)
     def fit(self):
-        """The fit of a polynomial to the MLC measurements."""
-        if self.settings.log_fits is not None:
-            return next(self.settings.log_fits)
-        x = np.array([mlc.point1.y for mlc in self.mlc_meas])
-        y = np.array([mlc.point1.x for mlc in self.mlc_meas])
+        """The fit of a polynomial to the MLC measurements. If a machine log was loaded, the log picket
+        closest to this picket is used instead; a ValueError is raised if none is within :attr:`max_log_offset`."""
+        if self._fit is None:
+            if self.settings.log_fits is not None:
+                self._fit = self._nearest_log_fit()
+            else:
+                x = np.array([mlc.point1.y for mlc in self.mlc_meas])
+                y = np.array([mlc.point1.x for mlc in self.mlc_meas])
+                if self.settings.orientation == UP_DOWN:
+                    fit = np.polyfit(x, y, 1)
+                else:
+                    fit = np.polyfit(y, x, 1)
+                self._fit = np.poly1d(fit)
+        return self._fit
+
+    def _nearest_log_fit(self) -> np.poly1d:
+        """Return the log picket fit that passes closest to the approximate picket position at the CAX.
+
+        Raises
+        ------
+        ValueError
+            If no log picket is within :attr:`max_log_offset` mm of the picket, e.g. if the image is mirrored or
+            rotated relative to the log.
+        """
         if self.settings.orientation == UP_DOWN:
-            fit = np.polyfit(x, y, 1)
+            cax = self.settings.image_center.y
         else:
-            fit = np.polyfit(y, x, 1)
-        return np.poly1d(fit)
+            cax = self.settings.image_center.x
+        distances = [abs(fit(cax) - self.approximate_idx) for fit in self.settings.log_fits]
+        nearest = int(np.argmin(distances))
+        if distances[nearest] > self.max_log_offset * self.settings.dpmm:
+            raise ValueError(f"The picket near pixel {self.approximate_idx:.0f} is more than {self.max_log_offset}mm "
+                             f"from every picket of the log. The image may be mirrored or rotated relative to the log.")
+        return self.settings.log_fits[nearest]
 
     @property
     def dist2cax(self) -> float:
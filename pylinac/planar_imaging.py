@@ -14,6 +14,7 @@ import io
 
 import matplotlib.pyplot as plt
 import numpy as np
+from scipy import ndimage
 from scipy.interpolate.interpolate import interp1d
 from skimage import feature, measure
 
@@ -22,13 +23,16 @@ from .core import image
 from .core.geometry import Point
 from .core.io import get_url, retrieve_demo_file
 from .core.profile import CollapsedCircleProfile
-from .core.roi import LowContrastDiskROI, HighContrastDiskROI, DiskROI, bbox_center
+from .core.roi import LowContrastDiskROI, HighContrastDiskROI, DiskROI, bbox_center, measure_disk_rois, \
+    low_contrast_values, high_contrast_values
 from .core import pdf
 
 
 class ImagePhantomBase:
     """Base class for planar phantom classes."""
     _demo_filename = ''
+    # the approximate size in pixels of the downsampled image the phantom is first located in
+    _registration_size = 256
 
     def __init__(self, filepath):
         """
@@ -39,6 +43,8 @@ class ImagePhantomBase:
         """
         self.image = image.load(filepath)
         self.image.invert()
+        self._canny_regions = None
+        self._phantom_ski_region = None
 
     @classmethod
     def from_demo_image(cls):
@@ -71,33 +77,88 @@ class ImagePhantomBase:
         plt.savefig(filename, **kwargs)
 
     def _get_canny_regions(self, sigma=2, percentiles=(0.001, 0.01)):
-        """Compute the canny edges of the image and return the connected regions found."""
+        """Compute the canny edges of the image and return the connected regions found.
+
+        The phantom is first located on a downsampled copy of the image (see :meth:`_find_phantom_window`); the
+        full-resolution edges are then only computed in a window around it. The regions are cached, so the canny
+        edges of an image are computed once; inverting or flipping the image afterward doesn't move the phantom
+        outline, and flips are accounted for by the phantom classes.
+        """
+        if self._canny_regions is not None:
+            return self._canny_regions
         # copy, filter, and ground the image
         img_copy = copy.copy(self.image)
-        img_copy.filter(kind='gaussian', size=sigma)
+        img_copy.filter(kind='gaussian', size=sigma, tile_size=512)
         img_copy.ground()
+        filtered = np.asarray(img_copy.array)
 
         # compute the canny edges with very low thresholds (detects nearly everything)
-        lo_th, hi_th = np.percentile(img_copy, percentiles)
-        c = feature.canny(img_copy, low_threshold=lo_th, high_threshold=hi_th)
+        lo_th, hi_th = np.percentile(filtered, percentiles)
+        window = self._find_phantom_window(sigma, percentiles)
+        edges = np.zeros(filtered.shape, dtype=bool)
+        edges[window] = feature.canny(filtered[window], low_threshold=lo_th, high_threshold=hi_th)
 
         # label the canny edge regions
-        labeled = measure.label(c)
-        regions = measure.regionprops(labeled, intensity_image=img_copy)
+        labeled = measure.label(edges)
+        regions = measure.regionprops(labeled, intensity_image=filtered)
+        self._canny_regions = regions
         return regions
 
+    def _find_phantom_window(self, sigma=2, percentiles=(0.001, 0.01)):
+        """Locate the phantom outline on a downsampled copy of the image and return the slices of a window around it
+        at full resolution. If the phantom isn't found the whole image is returned.
+
+        The image is block-averaged so that its largest side is about :attr:`_registration_size` pixels, and the
+        regions of the coarse canny edges are screened with :meth:`_is_phantom_candidate`. The largest candidate is
+        taken as the outline.
+        """
+        scale = max(int(max(self.image.shape) / self._registration_size), 1)
+        whole_image = (slice(None), slice(None))
+        if scale == 1:
+            return whole_image
+        rows, cols = (dim // scale * scale for dim in self.image.shape)
+        coarse = np.asarray(self.image.array[:rows, :cols], dtype=float)
+        coarse = coarse.reshape(rows // scale, scale, cols // scale, scale).mean(axis=(1, 3))
+        coarse = ndimage.gaussian_filter(coarse, sigma=sigma / scale)
+        coarse -= coarse.min()
+        lo_th, hi_th = np.percentile(coarse, percentiles)
+        regions = measure.regionprops(measure.label(feature.canny(coarse, low_threshold=lo_th, high_threshold=hi_th)))
+        candidates = [region for region in regions if self._is_phantom_candidate(region, scale)]
+        if not candidates:
+            return whole_image
+        outline = max(candidates, key=lambda region: region.major_axis_length)
+        # pad the window so edges near the outline aren't affected by the window border
+        margin = int(0.1 * max(self.image.shape)) + 4 * int(np.ceil(sigma))
+        min_row, min_col, max_row, max_col = (np.array(outline.bbox) * scale)
+        return (slice(max(min_row - margin, 0), min(max_row + margin, self.image.shape[0])),
+                slice(max(min_col - margin, 0), min(max_col + margin, self.image.shape[1])))
+
+    def _is_phantom_candidate(self, region, scale=1):
+        """Whether a canny region may be the phantom outline; the largest candidate is taken as the outline.
+
+        Parameters
+        ----------
+        region
+            A scikit-image region.
+        scale : int
+            The number of image pixels per pixel of the image the region was found in. Canny edges are about a pixel
+            wide, so a region's area scales with ``1/scale`` and its extent with ``scale``.
+        """
+        return False
+
     @staticmethod
     def _plot_lowcontrast(axes, rois, threshold):
         """Plot the low contrast ROIs to an axes."""
-        rois.sort(key=lambda x: x.contrast_constant, reverse=True)
-        line1, = axes.plot([roi.contrast_constant for roi in rois], marker='o', color='m', label='Contrast Constant')
+        values = low_contrast_values(rois)
+        order = np.argsort(values['contrast_constant'])[::-1]
+        line1, = axes.plot(values['contrast_constant'][order], marker='o', color='m', label='Contrast Constant')
         axes.axhline(threshold, color='k')
         axes.grid(True)
         axes.set_title('Low-frequency Contrast')
         axes.set_xlabel('ROI #')
         axes.set_ylabel('Contrast Constant')
         axes2 = axes.twinx()
-        line2, = axes2.plot([roi.contrast_to_noise for roi in rois], marker='^', label='CNR')
+        line2, = axes2.plot(values['cnr'][order], marker='^', label='CNR')
         axes2.set_ylabel('CNR')
         axes.legend(handles=[line1, line2])
 
@@ -124,8 +185,8 @@ class ImagePhantomBase:
         pass
 
     def _mtf(self, x=50):
-        norm = max(roi.mtf for roi in self.hc_rois)
-        ys = [roi.mtf / norm for roi in self.hc_rois]
+        mtfs = high_contrast_values(self.hc_rois)
+        ys = mtfs / mtfs.max()
         xs = np.arange(len(ys))
         f = interp1d(ys, xs)
         try:
@@ -151,7 +212,7 @@ class LasVegas(ImagePhantomBase):
 
     def __init__(self, filepath):
         super().__init__(filepath)
-        self._phantom_ski_region = None
+        self._phantom_center = None
         self.image.check_inversion(position=(0.1, 0.1))
 
     @staticmethod
@@ -186,8 +247,10 @@ class LasVegas(ImagePhantomBase):
         circle.filter(size=0.015, kind='median')
         valleys = circle.find_valleys(max_number=2, kind='value')
         if valleys[1] > valleys[0]:
+            # mirror the phantom center rather than locating the phantom again
+            center = self.phantom_center
             self.image.array = np.fliplr(self.image.array)
-            self._phantom_ski_region = None
+            self._phantom_center = Point(self.image.shape[1] - center.x, center.y)
 
     def _determine_low_contrast(self):
         """Sample the detail contrast regions."""
@@ -199,7 +262,6 @@ class LasVegas(ImagePhantomBase):
             roi = LowContrastDiskROI(self.image, angle, self.phantom_radius*0.03, dist, self.phantom_center,
                                      0.05)
             bg_rois.append(roi)
-        avg_bg = np.mean([roi.pixel_value for roi in bg_rois])
 
         # create X ROIs to sample the low contrast holes
         angles = np.array([77, 116, 134.5, 0, 13, 77, 142, 153, -21, -29, -107, 182, 174, -37, -55, -105, 206.5, 189.5, -48.1, -67.8]) + self.phantom_angle
@@ -208,11 +270,17 @@ class LasVegas(ImagePhantomBase):
         rois = []
         for dist, angle, radius in zip(dists, angles, roi_radii):
             roi = LowContrastDiskROI(self.image, angle, self.phantom_radius*radius, dist, self.phantom_center,
-                                     self.threshold, avg_bg)
+                                     self.threshold)
             rois.append(roi)
 
+        # measure all the ROIs at once, then set the average background
+        measure_disk_rois(bg_rois + rois)
+        avg_bg = np.mean([roi.pixel_value for roi in bg_rois])
+        for roi in rois:
+            roi.background = avg_bg
+
         # normalize the threshold
-        self.threshold *= max(roi.contrast_constant for roi in rois)
+        self.threshold *= low_contrast_values(rois)['contrast_constant'].max()
         for roi in rois:
             roi.contrast_threshold = self.threshold
         self.bg_rois = bg_rois
@@ -264,6 +332,8 @@ class LasVegas(ImagePhantomBase):
 
     @property
     def phantom_center(self):
+        if self._phantom_center is not None:
+            return self._phantom_center
         return bbox_center(self.phantom_ski_region)
 
     @property
@@ -289,28 +359,24 @@ class LasVegas(ImagePhantomBase):
     @property
     def phantom_ski_region(self):
         """The skimage region of the phantom outline."""
-        if self._phantom_ski_region is not None:
-            return self._phantom_ski_region
-        else:
+        if self._phantom_ski_region is None:
             regions = self._get_canny_regions()
-            blobs = []
-            for phantom_idx, region in enumerate(regions):
-                if region.area < 50:
-                    continue
-                hollow = region.extent < 0.02
-                sized = (130 * self.image.dpmm) < region.major_axis_length < (270 * self.image.dpmm)
-                if hollow and sized:
-                    blobs.append(phantom_idx)
-
+            blobs = [idx for idx, region in enumerate(regions) if self._is_phantom_candidate(region)]
             if not blobs:
                 raise ValueError("Unable to find the Las Vegas phantom in the image.")
 
             # find the biggest ROI and call that the phantom outline
             big_roi_idx = np.argsort([regions[phan].major_axis_length for phan in blobs])[-1]
-            phantom_idx = blobs[big_roi_idx]
+            self._phantom_ski_region = regions[blobs[big_roi_idx]]
+        return self._phantom_ski_region
 
-            self._phantom_ski_region = regions[phantom_idx]
-            return regions[phantom_idx]
+    def _is_phantom_candidate(self, region, scale=1):
+        """Whether the region is a hollow outline of about the size of the phantom."""
+        if region.area < 50 / scale:
+            return False
+        hollow = region.extent < 0.02 * scale
+        sized = (130 * self.image.dpmm / scale) < region.major_axis_length < (270 * self.image.dpmm / scale)
+        return hollow and sized
 
     def publish_pdf(self, filename, notes=None, open_file=False, metadata=None):
         """Publish (print) a PDF containing the analysis, images, and quantitative results.
@@ -338,8 +404,8 @@ class LasVegas(ImagePhantomBase):
             self.save_analyzed_image(data, image=img, low_contrast=lo)
             canvas.add_image(data, location=(w, l), dimensions=(13, 13))
         text = ['Las Vegas results:',
-                'Median Contrast: {:2.2f}'.format(np.median([roi.contrast for roi in self.lc_rois])),
-                'Median CNR: {:2.1f}'.format(np.median([roi.contrast_to_noise for roi in self.lc_rois])),
+                'Median Contrast: {:2.2f}'.format(np.median(low_contrast_values(self.lc_rois)['contrast'])),
+                'Median CNR: {:2.1f}'.format(np.median(low_contrast_values(self.lc_rois)['cnr'])),
                 'ROIs "seen": {:2.0f}'.format(sum(roi.passed_contrast_constant for roi in self.lc_rois)),
                 ]
         canvas.add_text(text=text, location=(10, 24.5))
@@ -428,8 +494,8 @@ class StandardImagingQC3(ImagePhantomBase):
         text = ['QC-3 results:',
                 'MTF 80% (lp/mm): {:2.2f}'.format(self._mtf(80)),
                 'MTF 50% (lp/mm): {:2.2f}'.format(self._mtf(50)),
-                'Median Contrast: {:2.2f}'.format(np.median([roi.contrast for roi in self.lc_rois])),
-                'Median CNR: {:2.1f}'.format(np.median([roi.contrast_to_noise for roi in self.lc_rois])),
+                'Median Contrast: {:2.2f}'.format(np.median(low_contrast_values(self.lc_rois)['contrast'])),
+                'Median CNR: {:2.1f}'.format(np.median(low_contrast_values(self.lc_rois)['cnr'])),
                 ]
         canvas.add_text(text=text, location=(10, 25.5))
         if notes is not None:
@@ -487,8 +553,8 @@ class StandardImagingQC3(ImagePhantomBase):
         # plot the high contrast MTF
         if high_contrast:
             hicon_ax = next(axes)
-            mtfs = [roi.mtf for roi in self.hc_rois]
-            mtfs /= max(mtfs)
+            mtfs = high_contrast_values(self.hc_rois)
+            mtfs /= mtfs.max()
             self._plot_highcontrast(hicon_ax, mtfs, self.hi_contrast_threshold)
 
         if show:
@@ -497,25 +563,25 @@ class StandardImagingQC3(ImagePhantomBase):
     @property
     def phantom_ski_region(self):
         """The skimage region of the phantom outline."""
-        regions = self._get_canny_regions()
-        blobs = []
-        for phantom_idx, region in enumerate(regions):
-            if region.area < 50:
-                continue
-            semi_round = 0.7 > region.eccentricity > 0.3
-            hollow = region.extent < 0.025
-            angled = region.orientation > 0.2 or region.orientation < -0.2
-            if semi_round and hollow and angled:
-                blobs.append(phantom_idx)
-
-        if not blobs:
-            raise ValueError("Unable to find the QC-3 phantom in the image.")
-
-        # find the biggest ROI and call that the phantom outline
-        big_roi_idx = np.argsort([regions[phan].major_axis_length for phan in blobs])[-1]
-        phantom_idx = blobs[big_roi_idx]
+        if self._phantom_ski_region is None:
+            regions = self._get_canny_regions()
+            blobs = [idx for idx, region in enumerate(regions) if self._is_phantom_candidate(region)]
+            if not blobs:
+                raise ValueError("Unable to find the QC-3 phantom in the image.")
 
-        return regions[phantom_idx]
+            # find the biggest ROI and call that the phantom outline
+            big_roi_idx = np.argsort([regions[phan].major_axis_length for phan in blobs])[-1]
+            self._phantom_ski_region = regions[blobs[big_roi_idx]]
+        return self._phantom_ski_region
+
+    def _is_phantom_candidate(self, region, scale=1):
+        """Whether the region is a semi-round, hollow, angled outline."""
+        if region.area < 50 / scale:
+            return False
+        semi_round = 0.7 > region.eccentricity > 0.3
+        hollow = region.extent < 0.025 * scale
+        angled = region.orientation > 0.2 or region.orientation < -0.2
+        return semi_round and hollow and angled
 
     @property
     def phantom_radius(self):
@@ -559,9 +625,11 @@ class StandardImagingQC3(ImagePhantomBase):
         bg_roi = LowContrastDiskROI(self.image, angles[0], 0.5 * self.phantom_radius, dists[0], self.phantom_center, 0.05)
 
         for dist, angle in zip(dists[1:], angles[1:]):
-            roi = LowContrastDiskROI(self.image, angle, 0.5 * self.phantom_radius, dist, self.phantom_center,
-                                     0.05, background=bg_roi.pixel_value)
+            roi = LowContrastDiskROI(self.image, angle, 0.5 * self.phantom_radius, dist, self.phantom_center, 0.05)
             rrois.append(roi)
+        measure_disk_rois([bg_roi] + rrois)
+        for roi in rrois:
+            roi.background = bg_roi.pixel_value
         return bg_roi, rrois
 
     def _high_contrast(self):
@@ -572,6 +640,7 @@ class StandardImagingQC3(ImagePhantomBase):
             roi = HighContrastDiskROI(self.image, self.phantom_angle, 0.5 * self.phantom_radius, dist, self.phantom_center,
                                       0.05)
             rrois.append(roi)
+        measure_disk_rois(rrois)
         return rrois
 
 
@@ -602,19 +671,18 @@ class LeedsTOR(ImagePhantomBase):
     @lru_cache(1)
     def _blobs(self):
         """The indices of the regions that were significant; i.e. a phantom circle outline or lead/copper square."""
-        blobs = []
-        for idx, region in enumerate(self._regions):
-            if region.area < 100:
-                continue
-            round = region.eccentricity < 0.3
-            if round:
-                blobs.append(idx)
+        blobs = [idx for idx, region in enumerate(self._regions) if self._is_phantom_candidate(region)]
         if not blobs:
             raise ValueError("Could not find the phantom in the image.")
         return blobs
 
+    def _is_phantom_candidate(self, region, scale=1):
+        """Whether the region is a significant round blob; the largest is the phantom outline."""
+        if region.area < 100 / scale:
+            return False
+        return region.eccentricity < 0.3
+
     @property
-    @lru_cache(1)
     def _regions(self):
         """All the regions of the canny image that were labeled."""
         return self._get_canny_regions()
@@ -732,11 +800,15 @@ class LeedsTOR(ImagePhantomBase):
         # sample the reference ROIs
         bubble_dist = 0.65 * self.phantom_radius
         rrois = []
-        for idx, angle_delta in enumerate(bubble_angles):
+        for angle_delta in bubble_angles:
             roi = DiskROI(self.image, angle - angle_delta, bubble_radius, bubble_dist, self.phantom_center)
-            crois[idx].background = roi.pixel_value
             rrois.append(roi)
 
+        # measure all the ROIs at once; each reference is the background of its contrast ROI
+        measure_disk_rois(crois + rrois)
+        for croi, rroi in zip(crois, rrois):
+            croi.background = rroi.pixel_value
+
         return crois, rrois
 
     def _high_contrast(self):
@@ -762,7 +834,6 @@ class LeedsTOR(ImagePhantomBase):
             roi = HighContrastDiskROI(self.image, angle - nominal_angle, ref_radius, dist, self.phantom_center,
                                       self.hi_contrast_threshold)
             rrois.append(roi)
-        mtf_norm_val = (rrois[0].pixel_value - rrois[1].pixel_value) / (rrois[0].pixel_value + rrois[1].pixel_value)
 
         # sample ROIs of each line pair region
         # ordering goes from the "biggest" line pair region downward
@@ -771,9 +842,15 @@ class LeedsTOR(ImagePhantomBase):
         contrast_radii = np.array([0.04, 0.04, 0.04, 0.03, 0.03, 0.02, 0.02, 0.018, 0.018, 0.015, 0.015, 0.012]) * self.phantom_radius
         crois = []
         for nominal_angle, dist, cradius in zip(contrast_angles, contrast_dists, contrast_radii):
-            roi = HighContrastDiskROI(self.image, angle + nominal_angle + 90, cradius, dist, self.phantom_center, self.hi_contrast_threshold, mtf_norm=mtf_norm_val)
+            roi = HighContrastDiskROI(self.image, angle + nominal_angle + 90, cradius, dist, self.phantom_center, self.hi_contrast_threshold)
             crois.append(roi)
 
+        # measure all the ROIs at once; the MTF is normalized by the contrast of the reference areas
+        measure_disk_rois(crois + rrois)
+        mtf_norm_val = (rrois[0].pixel_value - rrois[1].pixel_value) / (rrois[0].pixel_value + rrois[1].pixel_value)
+        for roi in crois:
+            roi.mtf_norm = mtf_norm_val
+
         return crois, rrois
 
     @staticmethod
@@ -821,10 +898,10 @@ class LeedsTOR(ImagePhantomBase):
         analysis goes counter-clockwise, so this method flips the image and coordinates to
         make the image ccw. Quicker than flipping the image and reanalyzing.
         """
+        center, angle = self.phantom_center, self.phantom_angle
         self.image.array = np.fliplr(self.image.array)
-        new_x = self.image.shape[1] - self.phantom_center.x
-        self._phantom_center = Point(new_x, self.phantom_center.y)
-        self._phantom_angle = np.pi - self.phantom_angle
+        self._phantom_center = Point(self.image.shape[1] - center.x, center.y)
+        self._phantom_angle = np.pi - angle
 
     def plot_analyzed_image(self, image=True, low_contrast=True, high_contrast=True, show=True):
         """Plot the analyzed image, which includes the original image with ROIs marked, low-contrast plots
@@ -875,9 +952,8 @@ class LeedsTOR(ImagePhantomBase):
         # plot the high contrast MTF
         if high_contrast:
             hicon_ax = next(axes)
-            hc_rois = [roi.mtf for roi in self.hc_rois]
-            hc_rois.insert(0, 1)
-            self._plot_highcontrast(hicon_ax, hc_rois, self.hi_contrast_threshold)
+            mtfs = np.concatenate(([1], high_contrast_values(self.hc_rois)))
+            self._plot_highcontrast(hicon_ax, mtfs, self.hi_contrast_threshold)
 
         if show:
             plt.show()
@@ -910,8 +986,8 @@ class LeedsTOR(ImagePhantomBase):
             canvas.add_image(data, location=(w, l), dimensions=(10, 10))
         text = ['Leeds TOR18 results:',
                 'MTF 80% (lp/mm): {:2.2f}'.format(self._mtf(80)),
-                'Median Contrast: {:2.2f}'.format(np.median([roi.contrast for roi in self.lc_rois])),
-                'Median CNR: {:2.1f}'.format(np.median([roi.contrast_to_noise for roi in self.lc_rois])),
+                'Median Contrast: {:2.2f}'.format(np.median(low_contrast_values(self.lc_rois)['contrast'])),
+                'Median CNR: {:2.1f}'.format(np.median(low_contrast_values(self.lc_rois)['cnr'])),
                 ]
         canvas.add_text(text=text, location=(10, 25.5))
         if notes is not None:
@@ -1,10 +1,17 @@
 """Pylinac settings"""
 from matplotlib.pyplot import cm
+import numpy as np
 
 # use a string or colormap option. See options here: http://matplotlib.org/examples/color/colormaps_reference.html
 DICOM_COLORMAP = cm.gray
 ARRAY_COLORMAP = cm.viridis
 
+# the numerical precision of CT image data and the floating point arrays derived from it.
+# 'float64' is the default. 'float32' keeps the images in single precision and 'int16' keeps them as integer HU;
+# both use single precision for derived (e.g. filtered) arrays.
+PRECISION = 'float64'
+PRECISION_DTYPES = {'float64': (None, np.float64), 'float32': (np.float32, np.float32), 'int16': (np.int16, np.float32)}
+
 
 def get_dicom_cmap():
     """Return the DICOM colormap. Passed to cmap parameter in matplotlib calls."""
@@ -14,3 +21,27 @@ def get_dicom_cmap():
 def get_array_cmap():
     """Return the array colormap. Passed to cmap parameter in matplotlib calls."""
     return ARRAY_COLORMAP
+
+
+def set_precision(precision: str):
+    """Set the numerical precision of CT image data. Must be one of 'float64', 'float32', or 'int16'.
+    The setting applies to images loaded after it is set."""
+    global PRECISION
+    if precision not in PRECISION_DTYPES:
+        raise ValueError("Precision must be one of {}; got {}".format(tuple(PRECISION_DTYPES.keys()), precision))
+    PRECISION = precision
+
+
+def get_precision():
+    """Return the numerical precision of CT image data."""
+    return PRECISION
+
+
+def get_image_dtype():
+    """Return the data type CT images are stored as. None keeps the data type of the rescaled pixel data."""
+    return PRECISION_DTYPES[PRECISION][0]
+
+
+def get_float_dtype():
+    """Return the floating point data type of arrays derived from CT images."""
+    return PRECISION_DTYPES[PRECISION][1]
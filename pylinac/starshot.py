@@ -19,17 +19,17 @@ Features:
 * **Adaptive searching** - If you passed pylinac a set of parameters and a good result wasn't found, pylinac can recover and
   do an adaptive search by adjusting parameters to find a "reasonable" wobble.
 """
+import concurrent.futures
 import copy
 import io
 from typing import Union, List
 
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy import optimize
 
 from .core import image
 from .core.decorators import value_accept
-from .core.geometry import Point, Line, Circle
+from .core.geometry import Point, Line, Circle, lines_as_arrays, minimax_point_to_lines_2d
 from .core.io import get_url, TemporaryZipDirectory, retrieve_demo_file
 from .core import pdf
 from .core.profile import SingleProfile, CollapsedCircleProfile
@@ -73,6 +73,7 @@ class Starshot:
         self.image = image.load(filepath, **kwargs)
         self.wobble = Wobble()
         self.tolerance = 1
+        self._star_profiles = {}
         if self.image.dpmm is None:
             raise ValueError("DPI was not a tag in the image nor was it passed in. Please pass a DPI value")
         if self.image.sid is None:
@@ -179,7 +180,7 @@ class Starshot:
 
     @value_accept(radius=(0.2, 0.95), min_peak_height=(0.05, 0.95))
     def analyze(self, radius: float=0.85, min_peak_height: float=0.25, tolerance: float=1.0,
-                start_point: Point=None, fwhm: bool=True, recursive: bool=True):
+                start_point: Point=None, fwhm: bool=True, recursive: bool=True, workers: int=1):
         """Analyze the starshot image.
 
         Analyze finds the minimum radius and center of a circle that touches all the lines
@@ -213,6 +214,9 @@ class Starshot:
             If False, will simply return the first determined value or raise error if a reasonable wobble could not be determined.
 
             .. warning:: It is strongly recommended to leave this setting at True.
+        workers : int
+            The number of threads used to evaluate the recursive search parameters. Default is 1 (serial).
+            The result is the same regardless of the number of workers.
 
         Raises
         ------
@@ -221,88 +225,98 @@ class Starshot:
         """
         self.tolerance = tolerance
         self._check_image_inversion()
+        self._star_profiles = {}
 
         if start_point is None:
             start_point = self._get_reasonable_start_point()
 
-        self._get_reasonable_wobble(start_point, fwhm, min_peak_height, radius, recursive)
+        self._get_reasonable_wobble(start_point, fwhm, min_peak_height, radius, recursive, workers)
 
-    def _get_reasonable_wobble(self, start_point, fwhm, min_peak_height, radius, recursive):
+    def _get_reasonable_wobble(self, start_point, fwhm, min_peak_height, radius, recursive, workers=1):
         """Determine a wobble that is "reasonable". If recursive is false, the first iteration will be passed,
-        otherwise the parameters will be tweaked to search for a reasonable wobble."""
-        wobble_unreasonable = True
+        otherwise the parameters will be tweaked to search for a reasonable wobble.
+
+        The candidate (peak height, radius) pairs are evaluated in the same order as a serial search; if ``workers``
+        is >1 they are evaluated in batches on a thread pool and the rest of a batch is cancelled once a
+        reasonable wobble is found.
+        """
         focus_point = copy.copy(start_point)
-        peak_gen = get_peak_height()
-        radius_gen = get_radius()
-        while wobble_unreasonable:
+        if not recursive:
             try:
-                self.circle_profile = StarProfile(self.image, focus_point, radius, min_peak_height, fwhm)
-                if (len(self.circle_profile.peaks) < 6) or (len(self.circle_profile.peaks) % 2 != 0):
-                    raise ValueError
-                self.lines = LineManager(self.circle_profile.peaks)
-                self._find_wobble_minimize()
+                self.circle_profile, self.lines, self.wobble = self._evaluate_candidate(focus_point, radius, min_peak_height, fwhm)
             except ValueError:
-                if not recursive:
-                    raise RuntimeError("The algorithm was unable to properly detect the radiation lines. Try setting "
-                                       "recursive to True or lower the minimum peak height")
-                else:
+                raise RuntimeError("The algorithm was unable to properly detect the radiation lines. Try setting "
+                                   "recursive to True or lower the minimum peak height")
+            return
+
+        candidates = list(_search_parameters(min_peak_height, radius))
+        batch_size = max(workers, 1)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=batch_size) as executor:
+            idx = 0
+            while idx < len(candidates):
+                batch = candidates[idx:idx + batch_size]
+                futures = [executor.submit(self._evaluate_candidate, focus_point, rad, height, fwhm) for height, rad in batch]
+                for offset, future in enumerate(futures):
                     try:
-                        min_peak_height = next(peak_gen)
-                    except StopIteration:
-                    # if no height setting works, change the radius and reset the height
-                        try:
-                            radius = next(radius_gen)
-                            peak_gen = get_peak_height()
-                        except StopIteration:
-                            raise RuntimeError("The algorithm was unable to determine a reasonable wobble. Try setting "
-                                               "recursive to False and manually adjusting algorithm parameters")
-
-            else:  # if no errors are raised
-                # set the focus point to the wobble minimum
-                # focus_point = self.wobble.center
-            # finally:
-                # stop after first iteration if not recursive
-                if not recursive:
-                    wobble_unreasonable = False
-                # otherwise, check if the wobble is reasonable
-                else:
+                        circle_profile, lines, wobble = future.result()
+                    except ValueError:
+                        continue
                     # if so, stop
-                    if self.wobble.diameter_mm < 2:
-                        focus_near_center = self.wobble.center.distance_to(focus_point) < 5
-                        if focus_near_center:
-                            wobble_unreasonable = False
-                        else:
-                            focus_point = self.wobble.center
-                    # otherwise, iterate through peak height
-                    else:
-                        try:
-                            min_peak_height = next(peak_gen)
-                        except StopIteration:
-                            # if no height setting works, change the radius and reset the height
-                            try:
-                                radius = next(radius_gen)
-                                peak_gen = get_peak_height()
-                            except StopIteration:
-                                raise RuntimeError("The algorithm was unable to determine a reasonable wobble. Try setting "
-                                                   "recursive to False and manually adjusting algorithm parameters")
-
-    def _find_wobble_minimize(self):
-        """Find the minimum distance wobble location and radius to all radiation lines.
+                    if wobble.diameter_mm < 2:
+                        for remaining in futures[offset + 1:]:
+                            remaining.cancel()
+                        if wobble.center.distance_to(focus_point) < 5:
+                            self.circle_profile, self.lines, self.wobble = circle_profile, lines, wobble
+                            return
+                        # otherwise re-center on the wobble and retry the same parameters
+                        focus_point = wobble.center
+                        idx += offset
+                        break
+                else:
+                    idx += len(batch)
+        raise RuntimeError("The algorithm was unable to determine a reasonable wobble. Try setting "
+                           "recursive to False and manually adjusting algorithm parameters")
 
-        The minimum is found using a scipy minimization function.
+    def _evaluate_candidate(self, focus_point: Point, radius: float, min_peak_height: float, fwhm: bool):
+        """Find the star lines and wobble for one set of search parameters.
+
+        Returns
+        -------
+        tuple
+            The :class:`StarProfile`, :class:`LineManager`, and :class:`Wobble`.
+
+        Raises
+        ------
+        ValueError
+            If the radiation lines could not be determined.
         """
-        # starting point
-        sp = copy.copy(self.circle_profile.center)
+        circle_profile = self._get_star_profile(focus_point, radius).with_peaks(min_peak_height, fwhm=fwhm)
+        if (len(circle_profile.peaks) < 6) or (len(circle_profile.peaks) % 2 != 0):
+            raise ValueError
+        lines = LineManager(circle_profile.peaks)
+        return circle_profile, lines, self._find_wobble_minimize(lines)
 
-        def distance(p, lines):
-            """Calculate the maximum distance to any line from the given point."""
-            return max(line.distance_to(Point(p[0], p[1])) for line in lines)
+    def _get_star_profile(self, focus_point: Point, radius: float) -> 'StarProfile':
+        """Return the sampled, peak-less star profile for a focus point and radius.
 
-        res = optimize.minimize(distance, sp.as_array(), args=(self.lines,), method='Nelder-Mead', options={'ftol': 0.001})
+        Sampling the image is the expensive part of a profile; it is cached so that a new peak height
+        only reruns the peak detection.
+        """
+        key = (focus_point.x, focus_point.y, radius)
+        if key not in self._star_profiles:
+            self._star_profiles[key] = StarProfile(self.image, focus_point, radius)
+        return self._star_profiles[key]
 
-        self.wobble.radius = res.fun
-        self.wobble.radius_mm = res.fun / self.image.dpmm
-        self.wobble.center = Point(res.x[0], res.x[1])
+    def _find_wobble_minimize(self, lines: 'LineManager') -> 'Wobble':
+        """Find the minimum distance wobble location and radius to all radiation lines.
+
+        The wobble is the smallest circle touching all the lines, which is solved exactly as a linear program.
+        See :func:`~pylinac.core.geometry.minimax_point_to_lines_2d`.
+        """
+        center, radius = minimax_point_to_lines_2d(*lines_as_arrays(lines))
+        wobble = Wobble(Point(center[0], center[1]), radius)
+        wobble.radius_mm = radius / self.image.dpmm
+        return wobble
 
     @property
     def passed(self) -> bool:
@@ -534,10 +548,17 @@ class LineManager:
 
 class StarProfile(CollapsedCircleProfile):
     """Class that holds and analyzes the circular profile which finds the radiation lines."""
-    def __init__(self, image, start_point, radius, min_peak_height, fwhm):
+    def __init__(self, image, start_point, radius, min_peak_height=None, fwhm=True):
         radius = self._convert_radius_perc2pix(image, start_point, radius)
         super().__init__(center=start_point, radius=radius, image_array=image.array, width_ratio=0.1)
-        self.get_peaks(min_peak_height, fwhm=fwhm)
+        if min_peak_height is not None:
+            self.get_peaks(min_peak_height, fwhm=fwhm)
+
+    def with_peaks(self, min_peak_height, min_peak_distance=0.02, fwhm=True) -> 'StarProfile':
+        """Return a copy of the profile with the peaks determined. The sampled values are shared, so the image is not resampled."""
+        profile = copy.copy(self)
+        profile.get_peaks(min_peak_height, min_peak_distance, fwhm)
+        return profile
 
     @staticmethod
     def _convert_radius_perc2pix(image, start_point, radius):
@@ -578,3 +599,18 @@ def get_peak_height():
 def get_radius():
     for radius in np.linspace(0.95, 0.1, 10):
         yield radius
+
+
+def _search_parameters(min_peak_height, radius):
+    """Yield the (peak height, radius) pairs of the recursive wobble search in order.
+
+    The passed values come first, then each peak height at the passed radius. When the heights are exhausted the
+    radius moves inward, starting with the last height tried, and the heights are iterated again.
+    """
+    yield min_peak_height, radius
+    for height in get_peak_height():
+        yield height, radius
+    for radius in get_radius():
+        yield height, radius
+        for height in get_peak_height():
+            yield height, radius
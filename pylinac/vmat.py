@@ -10,11 +10,17 @@ Features:
 * **Automatic identification using file names** - If your file names are clear, the image type and test type don't even
   have to be specified; just load and analyze.
 """
+from collections import OrderedDict
+from functools import partial
 from io import BytesIO
+import os.path as osp
+import time
 from typing import Union, List, Tuple, Sequence
 
 import matplotlib.pyplot as plt
 import numpy as np
+import pydicom
+from pydicom.errors import InvalidDicomError
 
 from .core import image
 from .core.decorators import value_accept
@@ -22,7 +28,8 @@ from .core.geometry import Point, Rectangle
 from .core.io import get_url, TemporaryZipDirectory, retrieve_demo_file
 from .core.pdf import PylinacCanvas
 from .core.profile import SingleProfile
-from .core.utilities import open_path
+from .core.roi import integral_image, box_means
+from .core.utilities import open_path, run_batch
 from .settings import get_dicom_cmap
 
 DMLC = 'dmlc'
@@ -54,6 +61,7 @@ class VMATBase:
         self._identify_images(image1, image2)
         self.segments = []
         self._tolerance = 0
+        self._r_devs = None
 
     @classmethod
     def from_url(cls, url: str):
@@ -158,6 +166,7 @@ class VMATBase:
         return points
 
     def _construct_segments(self, points: List[Point]):
+        self.segments = []
         for point in points:
             segment = Segment(point, self.open_image, self.dmlc_image, self._tolerance)
             self.segments.append(segment)
@@ -165,10 +174,22 @@ class VMATBase:
         self._update_r_corrs()
 
     def _update_r_corrs(self):
-        """After the Segment constructions, the R_corr must be set for each segment."""
-        avg_r_corr = np.array([segment.r_corr for segment in self.segments]).mean()
-        for segment in self.segments:
-            segment.r_dev = ((segment.r_corr / avg_r_corr) * 100) - 100
+        """After the Segment constructions, the R_corr must be set for each segment.
+
+        The mean of every segment is taken from integral images of the DMLC and open images, which are built once
+        over the region spanned by the segments."""
+        bounds = np.array([segment.bounds for segment in self.segments], dtype=float)
+        rows, cols = self.dmlc_image.shape
+        top, left = np.floor(bounds[:, [0, 2]].min(axis=0)).astype(int).clip(0)
+        bottom, right = np.ceil(bounds[:, [1, 3]].max(axis=0)).astype(int).clip(max=(rows, cols))
+        bounds -= (top, top, left, left)
+        dmlc_means = box_means(integral_image(self.dmlc_image.array[top:bottom, left:right]), bounds)
+        open_means = box_means(integral_image(self.open_image.array[top:bottom, left:right]), bounds)
+        r_corrs = dmlc_means / open_means * 100
+        self._r_devs = r_corrs / r_corrs.mean() * 100 - 100
+        for segment, r_corr, r_dev in zip(self.segments, r_corrs, self._r_devs):
+            segment._r_corr = float(r_corr)
+            segment.r_dev = float(r_dev)
 
     @property
     def passed(self) -> bool:
@@ -177,7 +198,9 @@ class VMATBase:
     @property
     def r_devs(self) -> np.ndarray:
         """Return the deviations of all segments as an array."""
-        return np.array([segment.r_dev for segment in self.segments])
+        if self._r_devs is None:
+            return np.array([segment.r_dev for segment in self.segments])
+        return self._r_devs
 
     @property
     def avg_abs_r_deviation(self) -> float:
@@ -401,6 +424,7 @@ class Segment(Rectangle):
     def __init__(self, center_point: Point, open_image: image.DicomImage, dmlc_image: image.DicomImage,
                  tolerance: Union[float, int]):
         self.r_dev: float = 0.0  # is assigned after all segments constructed
+        self._r_corr = None  # likewise; computed for all segments at once by the analyzer
         self._tolerance = tolerance
         self._open_image = open_image
         self._dmlc_image = dmlc_image
@@ -408,9 +432,16 @@ class Segment(Rectangle):
         height = self._nominal_height_mm * dmlc_image.dpmm
         super().__init__(width, height, center=center_point, as_int=True)
 
+    @property
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """The (top, bottom, left, right) pixel edges of the segment, in array indices."""
+        return self.bl_corner.y, self.bl_corner.y + self.height, self.bl_corner.x, self.bl_corner.x + self.width
+
     @property
     def r_corr(self) -> float:
         """Return the ratio of the mean pixel values of DMLC/OPEN images."""
+        if self._r_corr is not None:
+            return self._r_corr
         dmlc_value = self._dmlc_image.array[self.bl_corner.y:self.bl_corner.y + self.height,
                      self.bl_corner.x: self.bl_corner.x + self.width].mean()
         open_value = self._open_image.array[self.bl_corner.y:self.bl_corner.y + self.height,
@@ -426,3 +457,92 @@ class Segment(Rectangle):
     def get_bg_color(self) -> str:
         """Get the background color of the segment when plotted, based on the pass/fail status."""
         return 'blue' if self.passed else 'red'
+
+
+def pair_images(paths: Sequence[str]) -> List[Tuple[str, str]]:
+    """Pair the open and DMLC images of VMAT tests by their SeriesInstanceUID.
+
+    Only the DICOM headers are read; the pixel data is not loaded. Files that aren't DICOM images and series that
+    don't have exactly two images are ignored.
+
+    Parameters
+    ----------
+    paths : sequence of str
+        The paths of the files.
+
+    Returns
+    -------
+    list of tuple
+        The two paths of each pair, in the order the series were first found.
+    """
+    series = OrderedDict()
+    for path in paths:
+        try:
+            ds = pydicom.dcmread(path, stop_before_pixels=True)
+            uid, _ = ds.SeriesInstanceUID, ds.Rows
+        except (InvalidDicomError, AttributeError, OSError):
+            continue
+        series.setdefault(uid, []).append(path)
+    return [tuple(files) for files in series.values() if len(files) == 2]
+
+
+def analyze_batch(paths: Sequence[str], test_type: type=None, workers: int=1, tolerance: Union[float, int]=1.5):
+    """Pair and analyze many VMAT images, e.g. a month of DRGS and DRMLC tests.
+
+    The images are paired with :func:`pair_images`. Each pair is handled independently; a failure is recorded in its
+    result rather than stopping the batch.
+
+    Parameters
+    ----------
+    paths : sequence of str
+        The paths of the image files.
+    test_type : {:class:`DRGS`, :class:`DRMLC`, None}
+        The test of all the pairs. If None (default), the test of each pair is determined from its file names, which must
+        contain 'drgs' or 'drmlc'.
+    workers : int
+        The number of pairs analyzed concurrently in a process pool. Default is 1 (serial, in this process).
+    tolerance : float, int
+        The tolerance of the sample deviations in percent; see :meth:`~pylinac.vmat.VMATBase.analyze`.
+
+    Returns
+    -------
+    list of dict
+        One result per pair. Each has the keys 'paths', 'test', 'r_devs' (the deviation of each segment in percent),
+        'passed', 'max_r_deviation', 'avg_abs_r_deviation', 'error' (None if the analysis succeeded), and 'timings',
+        the seconds spent in the 'load' and 'analyze' stages.
+    """
+    return run_batch(partial(_analyze_pair, test_type=test_type, tolerance=tolerance), _batch_result,
+                     pair_images(paths), workers)
+
+
+def _analyze_pair(pair, timings, test_type, tolerance):
+    """Load and analyze one pair of :func:`analyze_batch`. Module-level so it can be run in a process pool."""
+    if test_type is None:
+        names = ' '.join(osp.basename(path).lower() for path in pair)
+        if 'drgs' in names:
+            test_type = DRGS
+        elif 'drmlc' in names:
+            test_type = DRMLC
+        else:
+            raise ValueError("The test type could not be determined from the file names")
+    start = time.perf_counter()
+    vmat = test_type(pair)
+    timings['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vmat.analyze(tolerance)
+    timings['analyze'] = time.perf_counter() - start
+    return vmat
+
+
+def _batch_result(pair, vmat=None):
+    """Return the compact result of a batch pair; ``vmat`` is None if the analysis failed."""
+    result = {'paths': pair, 'test': None, 'r_devs': None, 'passed': None, 'max_r_deviation': None,
+              'avg_abs_r_deviation': None}
+    if vmat is not None:
+        result['test'] = vmat._result_short_header
+        result['r_devs'] = vmat.r_devs.tolist()
+        result['passed'] = bool(vmat.passed)
+        result['max_r_deviation'] = float(vmat.max_r_deviation)
+        result['avg_abs_r_deviation'] = float(vmat.avg_abs_r_deviation)
+    return result
@@ -1,6 +1,5 @@
 """The watcher file is a script meant to be run as an ongoing process to watch a given directory and analyzing files
 that may be moved there for certain keywords. Automatic processing will be started if the file contains the keywords."""
-import collections
 import concurrent.futures
 import datetime
 import os
@@ -18,12 +17,13 @@ import yagmail
 import yaml
 
 from pylinac.core.decorators import value_accept
-from pylinac.core.io import retrieve_demo_file, is_dicom_image
+from pylinac.core.io import retrieve_demo_file
 from pylinac.core.image import prepare_for_classification, DicomImage
 from pylinac.core import schedule
 
 from pylinac import DRMLC, DRGS, Starshot, PicketFence, WinstonLutz, LeedsTOR, StandardImagingQC3, load_log, LasVegas
 from pylinac.log_analyzer import IMAGING
+from pylinac.vmat import pair_images
 
 logger = logging.getLogger("pylinac")
 
@@ -499,16 +499,12 @@ class AnalyzeVMAT(AnalyzeMixin):
                 skip_list.append(osp.basename(file))
         # analyze directory groups
         if config[cls.config_name]['use-classifier']:
-            imgs = [DicomImage(f) for f in files if is_dicom_image(f)]
-            uids = [i.metadata.SeriesInstanceUID for i in imgs]
-            c = collections.Counter(uids)
-            for uid, num in c.items():
-                if num == 2:
-                    img_uids = [i.path for i in imgs if i.metadata.SeriesInstanceUID == uid]
-                    obj = cls(img_uids, config, zip_format=False)
-                    obj.process()
-                    for img in img_uids:
-                        skip_list.append(osp.basename(img))
+            for pair in pair_images(files):
+                img_uids = list(pair)
+                obj = cls(img_uids, config, zip_format=False)
+                obj.process()
+                for img in img_uids:
+                    skip_list.append(osp.basename(img))
 
 
 def drop_skips(files, skip_list):
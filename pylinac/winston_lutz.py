@@ -14,12 +14,12 @@ Features:
 * **File name interpretation** - Rename DICOM filenames to include axis information for linacs that don't include
   such information in the DICOM tags. E.g. "myWL_gantry45_coll0_couch315.dcm".
 """
-from functools import lru_cache
+import concurrent.futures
 from itertools import zip_longest
 import io
 import math
 import os.path as osp
-from typing import Union, List, Tuple
+from typing import Union, List, Tuple, Sequence, Callable
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -27,12 +27,13 @@ from scipy import ndimage, optimize
 
 from .core import image
 from .core.decorators import value_accept
-from .core.geometry import Point, Line, Circle, Vector, cos, sin
+from .core.geometry import Point, Line, Vector, cos, sin, lines_as_arrays, distances_to_lines, distances_to_points
 from .core.io import TemporaryZipDirectory, get_url, retrieve_demo_file, is_dicom_image
 from .core.mask import filled_area_ratio, bounding_box
 from .core import pdf
 from .core.profile import SingleProfile
 from .core.utilities import is_close, open_path
+from .settings import get_dicom_cmap
 
 GANTRY = 'Gantry'
 COLLIMATOR = 'Collimator'
@@ -45,7 +46,7 @@ ALL = 'All'
 
 class ImageManager(list):
     """Manages the images of a Winston-Lutz test."""
-    def __init__(self, directory: str, use_filenames: bool):
+    def __init__(self, directory: str, use_filenames: bool, workers: int=1):
         """
         Parameters
         ----------
@@ -54,17 +55,22 @@ class ImageManager(list):
         use_filenames: bool
             Whether to try to use the file name to determine axis values.
             Useful for Elekta machines that do not include that info in the DICOM data.
+        workers : int
+            The number of processes used to load and analyze the images. If more than 1, the images are analyzed
+            in a process pool and the list holds the compact :class:`~pylinac.winston_lutz.WLImageResult`
+            of each image instead of the :class:`~pylinac.winston_lutz.WLImage`.
         """
         super().__init__()
         if isinstance(directory, list):
-            for file in directory:
-                if is_dicom_image(file):
-                    img = WLImage(file, use_filenames)
-                    self.append(img)
+            image_files = [file for file in directory if is_dicom_image(file)]
         elif not osp.isdir(directory):
             raise ValueError("Invalid directory passed. Check the correct method and file was used.")
         else:
             image_files = image.retrieve_image_files(directory)
+        if workers > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                self.extend(executor.map(_analyze_image, image_files, [use_filenames] * len(image_files)))
+        else:
             for file in image_files:
                 img = WLImage(file, use_filenames)
                 self.append(img)
@@ -78,7 +84,7 @@ class WinstonLutz:
     """Class for performing a Winston-Lutz test of the radiation isocenter."""
     images: ImageManager
 
-    def __init__(self, directory: str, use_filenames: bool = False):
+    def __init__(self, directory: str, use_filenames: bool = False, workers: int = 1):
         """
         Parameters
         ----------
@@ -87,6 +93,9 @@ class WinstonLutz:
         use_filenames: bool
             Whether to try to use the file name to determine axis values.
             Useful for Elekta machines that do not include that info in the DICOM data.
+        workers : int
+            The number of processes used to load and analyze the images. Large image sets analyze
+            much faster with several workers. See :class:`~pylinac.winston_lutz.ImageManager`.
 
         Examples
         --------
@@ -110,7 +119,8 @@ class WinstonLutz:
         ----------
         images : :class:`~pylinac.winston_lutz.ImageManager` instance
         """
-        self.images = ImageManager(directory, use_filenames)
+        self.images = ImageManager(directory, use_filenames, workers)
+        self._axis_minimizations = {}
 
     @classmethod
     def from_demo_images(cls):
@@ -119,7 +129,7 @@ class WinstonLutz:
         return cls.from_zip(demo_file)
 
     @classmethod
-    def from_zip(cls, zfile: str, use_filenames: bool=False):
+    def from_zip(cls, zfile: str, use_filenames: bool=False, workers: int=1):
         """Instantiate from a zip file rather than a directory.
 
         Parameters
@@ -129,13 +139,15 @@ class WinstonLutz:
         use_filenames : bool
             Whether to interpret axis angles using the filenames.
             Set to true for Elekta machines where the gantry/coll/couch data is not in the DICOM metadata.
+        workers : int
+            The number of processes used to load and analyze the images.
         """
         with TemporaryZipDirectory(zfile) as tmpz:
-            obj = cls(tmpz, use_filenames=use_filenames)
+            obj = cls(tmpz, use_filenames=use_filenames, workers=workers)
         return obj
 
     @classmethod
-    def from_url(cls, url: str, use_filenames: bool = False):
+    def from_url(cls, url: str, use_filenames: bool = False, workers: int = 1):
         """Instantiate from a URL.
 
         Parameters
@@ -145,9 +157,11 @@ class WinstonLutz:
         use_filenames : bool
             Whether to interpret axis angles using the filenames.
             Set to true for Elekta machines where the gantry/coll/couch data is not in the DICOM metadata.
+        workers : int
+            The number of processes used to load and analyze the images.
         """
         zfile = get_url(url)
-        return cls.from_zip(zfile, use_filenames=use_filenames)
+        return cls.from_zip(zfile, use_filenames=use_filenames, workers=workers)
 
     @staticmethod
     def run_demo():
@@ -156,27 +170,69 @@ class WinstonLutz:
         print(wl.results())
         wl.plot_summary()
 
-    @lru_cache()
-    def _minimize_axis(self, axis=GANTRY):
-        """Return the minimization result of the given axis."""
-        def distance(p, things):
-            """Calculate the maximum distance to any line from the given point."""
-            other_thing = Point(p[0], p[1], p[2])
-            if axis == COUCH:
-                other_thing = Circle(other_thing, radius=p[3])
-            return max(thing.distance_to(other_thing) for thing in things)
+    def _minimize_axis(self, axis: str=GANTRY) -> optimize.OptimizeResult:
+        """Return the minimization result of the given axis. The result is cached per axis.
 
-        if axis == GANTRY:
-            attr = 'cax_line_projection'
-        else:
-            attr = 'cax2bb_vector'
+        The optimization parameters are the (x, y, z) isocenter position for the gantry and collimator, and the
+        (x, y) center and radius of the circle the BB positions are fitted to for the couch; ``x`` of the result holds
+        these. The maximum distance to the CAX lines (gantry), BB vectors (collimator) or couch circle is minimized by
+        bounding the squared distances from above (an epigraph formulation), using the vectorized distance kernels and
+        their analytic gradients.
+        """
+        if axis in self._axis_minimizations:
+            return self._axis_minimizations[axis]
 
-        things = [getattr(image, attr) for image in self.images if image.variable_axis in (axis, REFERENCE)]
-        if len(things) <= 1:
+        images = [image for image in self.images if image.variable_axis in (axis, REFERENCE)]
+        if len(images) <= 1:
             raise ValueError("Not enough images of the given type to identify the axis isocenter")
-        bounds = [(-30, 30), (-30, 30), (-30, 30), (0, 28)]  # search bounds for the optimization
-        initial_guess = np.array([0, 0, 0, 0])
-        result = optimize.minimize(distance, initial_guess, args=things, bounds=bounds)
+        # distances(p) returns the distance to each line/vector/circle and its gradient with respect to p
+        if axis == GANTRY:
+            starts, ends = lines_as_arrays(image.cax_line_projection for image in images)
+            bounds = [(-30, 30), (-30, 30), (-30, 30)]  # search bounds for the optimization
+
+            def distances(p):
+                return distances_to_lines(p, starts, ends, gradient=True)
+        else:
+            vectors = np.array([[image.cax2bb_vector.x, image.cax2bb_vector.y, image.cax2bb_vector.z] for image in images], dtype=float)
+            if axis == COUCH:
+                vectors[:, 2] = 0  # the couch circle lies in the x-y plane
+                bounds = [(-30, 30), (-30, 30), (0, 28)]
+
+                def distances(p):
+                    dists, grads = distances_to_points(p[:2], vectors, gradient=True)
+                    # distance to the circle is the absolute difference to the radius
+                    signs = np.sign(dists - p[2])
+                    return np.abs(dists - p[2]), np.column_stack((grads[:, :2] * signs[:, np.newaxis], -signs))
+            else:
+                bounds = [(-30, 30), (-30, 30), (-30, 30)]
+
+                def distances(p):
+                    return distances_to_points(p, vectors, gradient=True)
+
+        # the last parameter is the bound on the squared distances
+        num_params = len(bounds)
+        bounds.append((0, None))
+
+        def bound_minus_squares(params):
+            dists, _ = distances(params[:num_params])
+            return params[num_params] - dists ** 2
+
+        def bound_minus_squares_jac(params):
+            dists, grads = distances(params[:num_params])
+            return np.column_stack((-2 * dists[:, np.newaxis] * grads, np.ones(len(dists))))
+
+        initial_guess = np.zeros(num_params + 1)
+        initial_guess[num_params] = np.max(distances(initial_guess[:num_params])[0] ** 2)
+        objective_jac = np.zeros(num_params + 1)
+        objective_jac[num_params] = 1
+        solution = optimize.minimize(lambda params: params[num_params], initial_guess,
+                                     jac=lambda params: objective_jac, bounds=bounds, method='SLSQP',
+                                     constraints={'type': 'ineq', 'fun': bound_minus_squares, 'jac': bound_minus_squares_jac},
+                                     options={'ftol': 1e-10, 'maxiter': 500})
+        point = solution.x[:num_params]
+        result = optimize.OptimizeResult(x=point, fun=float(np.max(distances(point)[0])),
+                                         success=solution.success, message=solution.message, nit=solution.nit)
+        self._axis_minimizations[axis] = result
         return result
 
     @property
@@ -205,7 +261,7 @@ class WinstonLutz:
         the gantry and collimator were at zero are used to determine this value."""
         num_couch_like_images = self._get_images((COUCH, REFERENCE))[0]
         if num_couch_like_images > 1:
-            return self._minimize_axis(COUCH).x[3] * 2
+            return self._minimize_axis(COUCH).x[2] * 2
         else:
             return 0
 
@@ -510,7 +566,7 @@ class WinstonLutz:
         plt.ioff()
         title = "Winston-Lutz Analysis"
         canvas = pdf.PylinacCanvas(filename, page_title=title, metadata=metadata)
-        avg_sid = np.mean([image.metadata.RTImageSID for image in self.images])
+        avg_sid = np.mean([image.sid for image in self.images])
         text = ['Winston-Lutz results:',
                 'Average SID (mm): {:2.0f}'.format(avg_sid),
                 'Number of images: {}'.format(len(self.images)),
@@ -548,125 +604,19 @@ class WinstonLutz:
         return any(True for image in self.images if image.variable_axis in (axis,))
 
 
-class WLImage(image.LinacDicomImage):
-    """Holds individual Winston-Lutz EPID images, image properties, and automatically finds the field CAX and BB."""
+class WLGeometryMixin:
+    """The quantities of a Winston-Lutz image derived from the field CAX, BB, EPID center and axis angles.
+    Shared by :class:`~pylinac.winston_lutz.WLImage` and :class:`~pylinac.winston_lutz.WLImageResult`.
 
-    def __init__(self, file: str, use_filenames: bool):
-        """
-        Parameters
-        ----------
-        file : str
-            Path to the image file.
-        use_filenames: bool
-            Whether to try to use the file name to determine axis values.
-            Useful for Elekta machines that do not include that info in the DICOM data.
-        """
-        super().__init__(file, use_filenames=use_filenames)
-        self.file = osp.basename(file)
-        self.check_inversion()
-        self.flipud()
-        self._clean_edges()
-        self.field_cax, self.bounding_box = self._find_field_centroid()
-        self.bb = self._find_bb()
+    Subclasses must also define ``_plot_image(ax=None, clear_fig=False)``, which plots the image pixels to
+    the axis (creating one if None) and returns it; :meth:`plot` draws the CAX, BB, and EPID markers over it."""
+    field_cax: Point
+    bb: Point
+    bounding_box: List
+    file: str
 
     def __repr__(self):
-        return "WLImage(G={0:.1f}, B={1:.1f}, P={2:.1f})".format(self.gantry_angle, self.collimator_angle, self.couch_angle)
-
-    def _clean_edges(self, window_size: int=2):
-        """Clean the edges of the image to be near the background level."""
-        def has_noise(self, window_size):
-            """Helper method to determine if there is spurious signal at any of the image edges.
-
-            Determines if the min or max of an edge is within 10% of the baseline value and trims if not.
-            """
-            near_min, near_max = np.percentile(self.array, [5, 99.5])
-            img_range = near_max - near_min
-            top = self[:window_size, :]
-            left = self[:, :window_size]
-            bottom = self[-window_size:, :]
-            right = self[:, -window_size:]
-            edge_array = np.concatenate((top.flatten(), left.flatten(), bottom.flatten(), right.flatten()))
-            edge_too_low = edge_array.min() < (near_min - img_range / 10)
-            edge_too_high = edge_array.max() > (near_max + img_range / 10)
-            return edge_too_low or edge_too_high
-
-        safety_stop = np.min(self.shape)/10
-        while has_noise(self, window_size) and safety_stop > 0:
-            self.remove_edges(window_size)
-            safety_stop -= 1
-
-    def _find_field_centroid(self) -> Tuple[Point, List]:
-        """Find the centroid of the radiation field based on a 50% height threshold.
-
-        Returns
-        -------
-        p
-            The CAX point location.
-        edges
-            The bounding box of the field, plus a small margin.
-        """
-        min, max = np.percentile(self.array, [5, 99.9])
-        threshold_img = self.as_binary((max - min)/2 + min)
-        # clean single-pixel noise from outside field
-        cleaned_img = ndimage.binary_erosion(threshold_img)
-        [*edges] = bounding_box(cleaned_img)
-        edges[0] -= 10
-        edges[1] += 10
-        edges[2] -= 10
-        edges[3] += 10
-        coords = ndimage.measurements.center_of_mass(threshold_img)
-        p = Point(x=coords[-1], y=coords[0])
-        return p, edges
-
-    def _find_bb(self) -> Point:
-        """Find the BB within the radiation field. Iteratively searches for a circle-like object
-        by lowering a low-pass threshold value until found.
-
-        Returns
-        -------
-        Point
-            The weighted-pixel value location of the BB.
-        """
-        # get initial starting conditions
-        hmin, hmax = np.percentile(self.array, [5, 99.9])
-        spread = hmax - hmin
-        max_thresh = hmax
-        lower_thresh = hmax - spread / 1.5
-        # search for the BB by iteratively lowering the low-pass threshold value until the BB is found.
-        found = False
-        while not found:
-            try:
-                binary_arr = np.logical_and((max_thresh > self), (self >= lower_thresh))
-                labeled_arr, num_roi = ndimage.measurements.label(binary_arr)
-                roi_sizes, bin_edges = np.histogram(labeled_arr, bins=num_roi + 1)
-                bw_bb_img = np.where(labeled_arr == np.argsort(roi_sizes)[-3], 1, 0)
-
-                if not is_round(bw_bb_img):
-                    raise ValueError
-                if not is_modest_size(bw_bb_img, self.bounding_box):
-                    raise ValueError
-                if not is_symmetric(bw_bb_img):
-                    raise ValueError
-            except (IndexError, ValueError):
-                max_thresh -= 0.05 * spread
-                if max_thresh < hmin:
-                    raise ValueError("Unable to locate the BB. Make sure the field edges do not obscure the BB and that there is no artifacts in the images.")
-            else:
-                found = True
-
-        # determine the center of mass of the BB
-        inv_img = image.load(self.array)
-        inv_img.invert()
-        x_arr = np.abs(np.average(bw_bb_img, weights=inv_img, axis=0))
-        x_com = SingleProfile(x_arr).fwxm_center(interpolate=True)
-        y_arr = np.abs(np.average(bw_bb_img, weights=inv_img, axis=1))
-        y_com = SingleProfile(y_arr).fwxm_center(interpolate=True)
-        return Point(x_com, y_com)
-
-    @property
-    def epid(self) -> Point:
-        """Center of the EPID panel"""
-        return self.center
+        return "{0}(G={1:.1f}, B={2:.1f}, P={3:.1f})".format(type(self).__name__, self.gantry_angle, self.collimator_angle, self.couch_angle)
 
     @property
     def epid_y_offset(self) -> float:
@@ -767,7 +717,7 @@ class WLImage(image.LinacDicomImage):
         clear_fig : bool
             Whether to clear the figure first before drawing.
         """
-        ax = super().plot(ax=ax, show=False, clear_fig=clear_fig)
+        ax = self._plot_image(ax=ax, clear_fig=clear_fig)
         ax.plot(self.field_cax.x, self.field_cax.y, 'gs', ms=8)
         ax.plot(self.bb.x, self.bb.y, 'ro', ms=8)
         ax.plot(self.epid.x, self.epid.y, 'b+', ms=8)
@@ -814,6 +764,262 @@ class WLImage(image.LinacDicomImage):
             return COMBO
 
 
+class WLImage(WLGeometryMixin, image.LinacDicomImage):
+    """Holds individual Winston-Lutz EPID images, image properties, and automatically finds the field CAX and BB."""
+
+    def __init__(self, file: str, use_filenames: bool):
+        """
+        Parameters
+        ----------
+        file : str
+            Path to the image file.
+        use_filenames: bool
+            Whether to try to use the file name to determine axis values.
+            Useful for Elekta machines that do not include that info in the DICOM data.
+        """
+        super().__init__(file, use_filenames=use_filenames)
+        self.file = osp.basename(file)
+        self.check_inversion()
+        self.flipud()
+        self._clean_edges()
+        self.field_cax, self.bounding_box = self._find_field_centroid()
+        self.bb = self._find_bb()
+
+    @property
+    def epid(self) -> Point:
+        """Center of the EPID panel"""
+        return self.center
+
+    def _plot_image(self, ax: plt.Axes=None, clear_fig: bool=False) -> plt.Axes:
+        """Plot the image pixels to an axis."""
+        return image.LinacDicomImage.plot(self, ax=ax, show=False, clear_fig=clear_fig)
+
+    def _clean_edges(self, window_size: int=2):
+        """Clean the edges of the image to be near the background level."""
+        def has_noise(self, window_size, near_min, near_max):
+            """Helper method to determine if there is spurious signal at any of the image edges.
+
+            Determines if the min or max of an edge is within 10% of the baseline value and trims if not.
+            """
+            img_range = near_max - near_min
+            top = self[:window_size, :]
+            left = self[:, :window_size]
+            bottom = self[-window_size:, :]
+            right = self[:, -window_size:]
+            edge_array = np.concatenate((top.flatten(), left.flatten(), bottom.flatten(), right.flatten()))
+            edge_too_low = edge_array.min() < (near_min - img_range / 10)
+            edge_too_high = edge_array.max() > (near_max + img_range / 10)
+            return edge_too_low or edge_too_high
+
+        # trimming a few edge pixels doesn't move the percentiles of the whole image; compute them once
+        near_min, near_max = np.percentile(self.array, [5, 99.5])
+        safety_stop = np.min(self.shape)/10
+        while has_noise(self, window_size, near_min, near_max) and safety_stop > 0:
+            self.remove_edges(window_size)
+            safety_stop -= 1
+
+    def _find_field_centroid(self) -> Tuple[Point, List]:
+        """Find the centroid of the radiation field based on a 50% height threshold.
+
+        Returns
+        -------
+        p
+            The CAX point location.
+        edges
+            The bounding box of the field, plus a small margin.
+        """
+        min, max = np.percentile(self.array, [5, 99.9])
+        threshold_img = self.as_binary((max - min)/2 + min)
+        # clean single-pixel noise from outside field
+        cleaned_img = ndimage.binary_erosion(threshold_img)
+        [*edges] = bounding_box(cleaned_img)
+        edges[0] -= 10
+        edges[1] += 10
+        edges[2] -= 10
+        edges[3] += 10
+        coords = ndimage.measurements.center_of_mass(threshold_img)
+        p = Point(x=coords[-1], y=coords[0])
+        return p, edges
+
+    def _find_bb(self) -> Point:
+        """Find the BB within the radiation field. Searches for a circle-like object by lowering a
+        low-pass threshold value until found. The search is first done coarse-to-fine on the field region
+        (see :meth:`_find_bb_coarse_to_fine`); if that fails the whole image is searched at full resolution.
+
+        Returns
+        -------
+        Point
+            The weighted-pixel value location of the BB.
+        """
+        # get initial starting conditions
+        hmin, hmax = np.percentile(self.array, [5, 99.9])
+        try:
+            bw_bb_img = self._find_bb_coarse_to_fine(hmin, hmax)
+        except ValueError:
+            bw_bb_img = self._find_bb_full(hmin, hmax)
+
+        # determine the center of mass of the BB
+        inv_img = image.load(self.array)
+        inv_img.invert()
+        x_arr = np.abs(np.average(bw_bb_img, weights=inv_img, axis=0))
+        x_com = SingleProfile(x_arr).fwxm_center(interpolate=True)
+        y_arr = np.abs(np.average(bw_bb_img, weights=inv_img, axis=1))
+        y_com = SingleProfile(y_arr).fwxm_center(interpolate=True)
+        return Point(x_com, y_com)
+
+    def _find_bb_full(self, hmin: float, hmax: float) -> np.ndarray:
+        """Search the whole image for the BB by iteratively lowering the low-pass threshold value
+        by 5% of the image spread until found. Returns the binary image of the BB."""
+        spread = hmax - hmin
+        max_thresh = hmax
+        lower_thresh = hmax - spread / 1.5
+        while True:
+            try:
+                return bb_candidate(self.array, max_thresh, lower_thresh, self.bounding_box).astype(int)
+            except ValueError:
+                max_thresh -= 0.05 * spread
+                if max_thresh < hmin:
+                    raise ValueError("Unable to locate the BB. Make sure the field edges do not obscure the BB and that there is no artifacts in the images.")
+
+    def _find_bb_coarse_to_fine(self, hmin: float, hmax: float) -> np.ndarray:
+        """Search for the BB within the field bounding box only.
+
+        The field region is downsampled to ~100 pixels across and the highest low-pass threshold at which the BB
+        separates is found with :func:`_highest_threshold`: the threshold is stepped down in 5% steps of the image
+        spread and then bisected between the last failed and first successful step. The BB is then segmented at full
+        resolution on the field region at that threshold; if it doesn't separate there, the full resolution threshold is
+        found the same way starting from the coarse one, which is then the failed bracket.
+
+        Returns
+        -------
+        numpy.ndarray
+            The binary image of the BB, the same shape as the image.
+        """
+        spread = hmax - hmin
+        lower_thresh = hmax - spread / 1.5
+        top, bottom, left, right = (int(round(edge)) for edge in self.bounding_box)
+        top, left = max(top, 0), max(left, 0)
+        bottom, right = min(bottom, self.shape[0]), min(right, self.shape[1])
+        field = self.array[top:bottom, left:right]
+
+        # coarse search over the downsampled field; the field area scales with the downsampling
+        factor = max(min(field.shape) // 100, 1)
+        coarse = image.downsample(field, factor)
+        coarse_bbox = [edge / factor for edge in self.bounding_box]
+        max_thresh, _ = _highest_threshold(lambda thresh: bb_candidate(coarse, thresh, lower_thresh, coarse_bbox),
+                                           hmax, hmin, 0.05 * spread)
+
+        # refine at full resolution on the field region
+        _, bw_field = _highest_threshold(lambda thresh: bb_candidate(field, thresh, lower_thresh, self.bounding_box),
+                                         max_thresh, hmin, 0.05 * spread)
+        bw_bb_img = np.zeros(self.shape, dtype=int)
+        bw_bb_img[top:bottom, left:right] = bw_field
+        return bw_bb_img
+
+
+def _highest_threshold(find: Callable, start: float, stop: float, step: float, rounds: int=4) -> Tuple[float, object]:
+    """Find the highest threshold at which ``find`` succeeds, i.e. doesn't raise a ValueError.
+
+    The threshold is lowered from ``start`` in steps of ``step`` until ``find`` succeeds, then bisected ``rounds`` times
+    between the last failed and the successful threshold. If ``find`` succeeds at ``start`` no bisection is done.
+
+    Returns
+    -------
+    float
+        The threshold.
+    object
+        The result of ``find`` at the threshold.
+
+    Raises
+    ------
+    ValueError
+        If ``find`` fails at every step down to ``stop``.
+    """
+    threshold, failed = start, None
+    while True:
+        try:
+            result = find(threshold)
+            break
+        except ValueError:
+            failed = threshold
+            threshold -= step
+            if threshold < stop:
+                raise ValueError("Unable to locate the BB within the field")
+    if failed is not None:
+        for _ in range(rounds):
+            mid_thresh = (threshold + failed) / 2
+            try:
+                result, threshold = find(mid_thresh), mid_thresh
+            except ValueError:
+                failed = mid_thresh
+    return threshold, result
+
+
+class WLImageResult(WLGeometryMixin):
+    """The compact analysis results of a single Winston-Lutz image: the axis angles, field CAX, BB position, EPID center
+    and dpmm, plus the pixels of the field region for plotting. Returned by the worker processes when a
+    :class:`~pylinac.winston_lutz.WinstonLutz` instance is created with multiple ``workers``."""
+
+    def __init__(self, wl_image: WLImage):
+        """
+        Parameters
+        ----------
+        wl_image : :class:`~pylinac.winston_lutz.WLImage`
+            The analyzed image.
+        """
+        self.file = wl_image.file
+        self.path = wl_image.path
+        self.gantry_angle = wl_image.gantry_angle
+        self.collimator_angle = wl_image.collimator_angle
+        self.couch_angle = wl_image.couch_angle
+        self.dpmm = wl_image.dpmm
+        self.sid = wl_image.sid
+        self.field_cax = wl_image.field_cax
+        self.bb = wl_image.bb
+        self.epid = wl_image.epid
+        self.bounding_box = wl_image.bounding_box
+        # keep only the field region of the pixel data; the plots are zoomed to it anyway
+        top, bottom, left, right = (int(round(edge)) for edge in self.bounding_box)
+        self._field_offset = (max(top, 0), max(left, 0))
+        self._field_array = wl_image.array[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)]
+
+    def _plot_image(self, ax: plt.Axes=None, clear_fig: bool=False) -> plt.Axes:
+        """Plot the field region pixels to an axis, in the coordinates of the full image."""
+        if ax is None:
+            fig, ax = plt.subplots()
+        if clear_fig:
+            plt.clf()
+        top, left = self._field_offset
+        rows, cols = self._field_array.shape
+        ax.imshow(self._field_array, cmap=get_dicom_cmap(),
+                  extent=(left - 0.5, left + cols - 0.5, top + rows - 0.5, top - 0.5))
+        return ax
+
+
+def _analyze_image(file: str, use_filenames: bool) -> WLImageResult:
+    """Analyze a Winston-Lutz image and return the compact results. Used by the process pool of
+    :class:`~pylinac.winston_lutz.ImageManager`."""
+    return WLImageResult(WLImage(file, use_filenames))
+
+
+def bb_candidate(array: np.ndarray, max_thresh: float, lower_thresh: float, field_bounding_box: Sequence) -> np.ndarray:
+    """Return the binary image of the BB candidate found between the two threshold values. The candidate is the
+    third-largest connected region. Raises a ValueError if the candidate is not round, modestly-sized and symmetric."""
+    binary_arr = np.logical_and((max_thresh > array), (array >= lower_thresh))
+    labeled_arr, num_roi = ndimage.measurements.label(binary_arr)
+    roi_sizes = np.bincount(labeled_arr.ravel())
+    if len(roi_sizes) < 3:
+        raise ValueError("Not enough regions found")
+    bw_bb_img = labeled_arr == np.argsort(roi_sizes)[-3]
+    if not is_round(bw_bb_img):
+        raise ValueError("Candidate is not round")
+    if not is_modest_size(bw_bb_img, field_bounding_box):
+        raise ValueError("Candidate is not the size of a BB")
+    if not is_symmetric(bw_bb_img):
+        raise ValueError("Candidate is not symmetric")
+    return bw_bb_img
+
+
 def is_symmetric(logical_array: np.ndarray) -> bool:
     """Whether the binary object's dimensions are symmetric, i.e. a perfect circle. Used to find the BB."""
     ymin, ymax, xmin, xmax = bounding_box(logical_array)
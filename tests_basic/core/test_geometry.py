@@ -1,6 +1,8 @@
 """Test the various geometric patterns in the pylinac.core.geometry module."""
 import unittest
 
+import numpy as np
+
 from pylinac.core.geometry import *
 from tests_basic.utils import test_point_equality
 
@@ -142,6 +144,43 @@ class TestLine(unittest.TestCase):
         self.assertAlmostEqual(line.distance_to(point), exp_dist, delta=0.01)
 
 
+class TestDistanceKernels(unittest.TestCase):
+
+    lines = [Line(Point(0, 0, 1), Point(10, 3, 1)), Line(Point(-4, 8, 0), Point(5, -2, 2)),
+             Line(Point(1, 1), Point(1, 7))]
+    point = Point(2, -3, 1.5)
+
+    def test_distances_to_lines(self):
+        starts, ends = lines_as_arrays(self.lines)
+        distances = distances_to_lines(self.point, starts, ends)
+        for line, distance in zip(self.lines, distances):
+            self.assertAlmostEqual(line.distance_to(self.point), distance)
+
+    def test_distances_to_lines_gradient(self):
+        starts, ends = lines_as_arrays(self.lines)
+        _, gradients = distances_to_lines(self.point, starts, ends, gradient=True)
+        delta = 1e-6
+        for axis in range(3):
+            shift = np.zeros(3)
+            shift[axis] = delta
+            numeric = (distances_to_lines(self.point.as_array() + shift, starts, ends) -
+                       distances_to_lines(self.point.as_array() - shift, starts, ends)) / (2 * delta)
+            self.assertTrue(np.allclose(gradients[:, axis], numeric, atol=1e-5))
+
+    def test_distances_to_points(self):
+        vectors = [Vector(1, 2, 3), Vector(-4, 0, 2)]
+        distances = distances_to_points(self.point, np.array([[v.x, v.y, v.z] for v in vectors]))
+        for vector, distance in zip(vectors, distances):
+            self.assertAlmostEqual(vector.distance_to(self.point), distance)
+
+    def test_minimax_lines(self):
+        # three lines forming a triangle; the minimax point is the incenter
+        lines = [Line(Point(0, 0), Point(4, 0)), Line(Point(0, 0), Point(0, 3)), Line(Point(4, 0), Point(0, 3))]
+        center, radius = minimax_point_to_lines_2d(*lines_as_arrays(lines))
+        self.assertAlmostEqual(radius, 1)
+        self.assertTrue(np.allclose(center, (1, 1)))
+
+
 class TestRectangle(unittest.TestCase):
     width = 6.9
     height = 4.1
@@ -47,6 +47,18 @@ class TestLoaders(TestCase):
         with self.assertRaises(ValueError):
             image.load_multiples(paths)
 
+    def test_superimpose_matches_stack(self):
+        """Test that the running combination matches combining the stacked arrays."""
+        arrays = [np.random.RandomState(seed).randint(0, 1000, size=(20, 30)).astype(np.uint16) for seed in range(3)]
+        stack = np.dstack(arrays)
+        for method, func in (('mean', np.mean), ('max', np.max), ('sum', np.sum)):
+            combined = image.superimpose((image.load(arr.copy()) for arr in arrays), method=method, stretch=False)
+            expected = func(stack, axis=2)
+            self.assertEqual(combined.dtype, expected.dtype)
+            self.assertTrue(np.array_equal(combined, expected))
+        with self.assertRaises(ValueError):
+            image.superimpose((image.load(arr) for arr in arrays), method='median')
+
     def test_nonsense(self):
         with self.assertRaises(FileNotFoundError):
             image.load('blahblah')
@@ -92,6 +104,23 @@ class TestBaseImage(TestCase):
         # test using a gaussian filter
         self.arr.filter(kind='gaussian')
 
+    def test_tiled_filter(self):
+        # tiled filtering must give the same result as filtering the whole array
+        array = np.random.RandomState(1).rand(300, 250)
+        for kind, size in (('median', 7), ('gaussian', 2), ('fast_median', 5)):
+            whole = image.load(array.copy())
+            whole.filter(size, kind=kind)
+            tiled = image.load(array.copy())
+            tiled.filter(size, kind=kind, tile_size=64, workers=4)
+            self.assertTrue(np.allclose(whole.array, tiled.array))
+
+    def test_fast_median_filter(self):
+        arr = np.zeros((20, 20))
+        arr[10, 10] = 100  # single hot pixel is removed just as with a true median
+        img = image.load(arr)
+        img.filter(3, kind='fast_median')
+        self.assertEqual(img.array.max(), 0)
+
     def test_ground(self):
         old_min_val = copy.copy(self.dcm.array.min())
         ground_val = self.dcm.ground()
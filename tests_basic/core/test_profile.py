@@ -2,10 +2,12 @@ from unittest import TestCase
 import os.path as osp
 
 import numpy as np
+from scipy import ndimage
 import scipy.signal as sps
 
 from pylinac.core import image
-from pylinac.core.profile import SingleProfile, MultiProfile, CircleProfile, CollapsedCircleProfile
+from pylinac.core.profile import SingleProfile, MultiProfile, CircleProfile, CollapsedCircleProfile, fwxm_centers, \
+    fwxm_edges
 
 
 class SingleProfileMixin:
@@ -45,6 +47,25 @@ class SingleProfileMixin:
         for fwxm, fwhm_idx in self.fwxm_center_indices.items():
             self.assertAlmostEqual(self.profile.fwxm_center(fwxm, interpolate=True), fwhm_idx, delta=1)
 
+    def test_stacked_fwxm_centers(self):
+        """Test that the FWXM centers of a stack of profiles match the individual profile centers."""
+        profiles = np.vstack((self.ydata, self.ydata[::-1]))
+        for interpolate in (False, True):
+            for fwxm in self.fwxm_center_indices:
+                centers = fwxm_centers(profiles, fwxm, interpolate=interpolate)
+                for values, center in zip(profiles, centers):
+                    self.assertEqual(center, SingleProfile(values).fwxm_center(fwxm, interpolate=interpolate))
+
+    def test_stacked_fwxm_edges(self):
+        """Test that the FWXM edges of a stack of profiles match the individual profile penumbra points."""
+        profiles = np.vstack((self.ydata, self.ydata[::-1]))
+        left, right = fwxm_edges(profiles, 50)
+        for values, lt, rt in zip(profiles, left, right):
+            profile = SingleProfile(values)
+            self.assertEqual(rt, profile._penumbra_point('right', 50))
+            if not np.isnan(lt):
+                self.assertEqual(lt, profile._penumbra_point('left', 50))
+
     def test_penum_widths(self):
         # test 80/20, interp and non-interp
         for side, val in self.penumbra_widths_8020.items():
@@ -211,3 +232,16 @@ class CollapsedCircleProfileStarshot(CircleProfileTestMixin, TestCase):
     peak_idxs = [241., 529., 812., 1083., 1330., 1563., 1796., 2044.]
     valley_idxs = [100., 405., 673., 960., 1241., 1481., 1714., 1916.]
     fwxm_peak_idxs = [241.0, 529.5, 812.5, 1084.0, 1330.5, 1563.0, 1797.0, 2043.5]
+
+    def test_matches_per_radius_sampling(self):
+        """Test that the single-call sampling equals sampling each radius separately."""
+        expected = np.mean([ndimage.map_coordinates(self.profile.image_array, [y, x], order=0)
+                            for y, x in zip(self.profile._multi_y_locations, self.profile._multi_x_locations)], axis=0)
+        self.assertTrue(np.allclose(self.profile._profile, expected))
+
+    def test_bilinear(self):
+        profile = self.klass(self.center_point, self.radius, self.profile.image_array, interpolation='bilinear')
+        for known, meas in zip(self.peak_idxs, profile.find_peaks()):
+            self.assertAlmostEqual(known, meas, delta=1)
+        with self.assertRaises(ValueError):
+            self.klass(self.center_point, self.radius, self.profile.image_array, interpolation='cubic')
@@ -0,0 +1,109 @@
+from unittest import TestCase
+
+import numpy as np
+
+from pylinac.core.geometry import Point
+from pylinac.core.roi import DiskROI, HighContrastDiskROI, LowContrastDiskROI, box_means, disk_stats, integral_image, \
+    measure_disk_rois, sliding_window_stats, low_contrast_values, high_contrast_values
+
+
+class TestDiskStats(TestCase):
+
+    def setUp(self):
+        self.array = np.random.RandomState(3).normal(loc=100, scale=10, size=(200, 300))
+
+    def test_matches_full_mask(self):
+        """Test that the bounding-box statistics match a NaN-masked copy of the full array."""
+        centers = [Point(150.3, 100.7), Point(20, 30), Point(5.5, 190), Point(299, 0)]
+        radii = [12.4, 7, 9.5, 3]
+        stats = disk_stats(self.array, centers, radii)
+        for idx, (center, radius) in enumerate(zip(centers, radii)):
+            roi = DiskROI(self.array, 0, radius, 0, center)
+            masked = roi.circle_mask()
+            self.assertAlmostEqual(stats['median'][idx], np.nanmedian(masked))
+            self.assertAlmostEqual(stats['mean'][idx], np.nanmean(masked))
+            self.assertAlmostEqual(stats['std'][idx], np.nanstd(masked))
+            self.assertAlmostEqual(stats['min'][idx], np.nanmin(masked))
+            self.assertAlmostEqual(stats['max'][idx], np.nanmax(masked))
+
+    def test_roi_properties(self):
+        roi = HighContrastDiskROI(self.array, 45, 10, 20, Point(150, 100), contrast_threshold=0.1)
+        masked = roi.circle_mask()
+        self.assertAlmostEqual(roi.pixel_value, np.nanmedian(masked))
+        self.assertAlmostEqual(roi.std, np.nanstd(masked))
+        self.assertAlmostEqual(roi.max, np.nanmax(masked))
+        self.assertAlmostEqual(roi.min, np.nanmin(masked))
+
+    def test_outside_array_is_nan(self):
+        stats = disk_stats(self.array, [Point(-50, -50), Point(100, 100)], [5, 5])
+        self.assertTrue(np.isnan(stats['median'][0]))
+        self.assertFalse(np.isnan(stats['median'][1]))
+
+    def test_measure_disk_rois(self):
+        rois = [DiskROI(self.array, angle, 8, 40, Point(150, 100)) for angle in (0, 90, 180, 270)]
+        measure_disk_rois(rois)
+        for roi in rois:
+            masked = roi.circle_mask()
+            self.assertAlmostEqual(roi.pixel_value, np.nanmedian(masked))
+            self.assertAlmostEqual(roi.std, np.nanstd(masked))
+
+    def test_low_contrast_values(self):
+        rois = [LowContrastDiskROI(self.array, angle, 8, 40, Point(150, 100), background=90) for angle in (0, 90, 180)]
+        values = low_contrast_values(rois)
+        for idx, roi in enumerate(rois):
+            self.assertAlmostEqual(values['contrast'][idx], roi.contrast)
+            self.assertAlmostEqual(values['cnr'][idx], roi.contrast_to_noise)
+            self.assertAlmostEqual(values['contrast_constant'][idx], roi.contrast_constant)
+            self.assertAlmostEqual(values['cnr_constant'][idx], roi.cnr_constant)
+
+    def test_high_contrast_values(self):
+        rois = [HighContrastDiskROI(self.array, angle, 8, 40, Point(150, 100), 0.1, mtf_norm=norm)
+                for angle, norm in ((0, None), (90, 0.5))]
+        mtfs = high_contrast_values(rois)
+        for mtf, roi in zip(mtfs, rois):
+            self.assertAlmostEqual(mtf, roi.mtf)
+        self.assertAlmostEqual(mtfs[1], 2 * (roi.max - roi.min) / (roi.max + roi.min))
+
+
+class TestIntegralImage(TestCase):
+
+    def setUp(self):
+        self.array = np.random.RandomState(5).normal(loc=-1000, scale=10, size=(40, 60))
+
+    def test_integral_image(self):
+        table = integral_image(self.array)
+        self.assertEqual(table.shape, (41, 61))
+        self.assertAlmostEqual(table[25, 37] - table[3, 37] - table[25, 8] + table[3, 8], self.array[3:25, 8:37].sum())
+
+    def test_sliding_window_stats(self):
+        size = 7
+        mean, std = sliding_window_stats(self.array, size)
+        self.assertEqual(mean.shape, (40 - size + 1, 60 - size + 1))
+        for row, col in ((0, 0), (12, 30), (33, 53)):
+            window = self.array[row:row+size, col:col+size]
+            self.assertAlmostEqual(mean[row, col], window.mean())
+            self.assertAlmostEqual(std[row, col], window.std())
+
+    def test_bad_window_size(self):
+        with self.assertRaises(ValueError):
+            sliding_window_stats(self.array, 41)
+
+    def test_box_means(self):
+        table = integral_image(self.array)
+        means = box_means(table, [(3, 25, 8, 37), (0, 40, 0, 60)])
+        self.assertAlmostEqual(means[0], self.array[3:25, 8:37].mean())
+        self.assertAlmostEqual(means[1], self.array.mean())
+
+    def test_box_means_past_edge(self):
+        """Test that a box running past the array is the mean of the pixels inside it."""
+        table = integral_image(self.array)
+        means = box_means(table, [(30, 50, 50, 70), (-5, 10, -5, 10)])
+        self.assertAlmostEqual(means[0], self.array[30:, 50:].mean())
+        self.assertAlmostEqual(means[1], self.array[:10, :10].mean())
+
+    def test_fractional_box_means(self):
+        """Test that partially covered pixels are weighted by their covered area."""
+        table = integral_image(self.array)
+        mean = box_means(table, (3, 5, 8, 9.5))[0]
+        expected = (self.array[3:5, 8].sum() + self.array[3:5, 9].sum() / 2) / 3
+        self.assertAlmostEqual(mean, expected)
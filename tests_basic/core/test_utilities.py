@@ -17,6 +17,24 @@ class TestUtilities(unittest.TestCase):
         for notnumeric in notnumerics:
             self.assertFalse(isnumeric(notnumeric))
 
+    def test_thread_map(self):
+        for workers in (1, 3):
+            self.assertEqual(thread_map(lambda x: x ** 2, range(5), workers), [0, 1, 4, 9, 16])
+
+    def test_run_batch(self):
+        def analyze(item, timings):
+            timings['analyze'] = 0
+            return 1 / item
+
+        def summarize(item, analysis):
+            return {'item': item, 'inverse': analysis}
+
+        good, bad = run_batch(analyze, summarize, [2, 0])
+        self.assertEqual(good, {'item': 2, 'inverse': 0.5, 'error': None, 'timings': {'analyze': 0}})
+        self.assertEqual(bad['inverse'], None)
+        self.assertIn('ZeroDivisionError', bad['error'])
+        self.assertEqual(bad['timings'], {'analyze': 0})
+
     def test_is_iterable(self):
         # test iterables
         iters = ((1,2,'t'), [4, 8, 'r'], np.array((5,6,7)))
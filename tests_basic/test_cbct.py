@@ -1,10 +1,18 @@
+import io
+import os
 import os.path as osp
+import tempfile
+import zipfile
 from unittest import TestCase
 
 import matplotlib.pyplot as plt
+import numpy as np
+import pydicom
 
-from pylinac import CatPhan503, CatPhan504, CatPhan600, CatPhan604
+from pylinac import CatPhan503, CatPhan504, CatPhan600, CatPhan604, settings
+from pylinac.ct import CTP404, CTP486, analyze_batch, get_regions, clear_localizations
 from pylinac.core.geometry import Point
+from pylinac.core.image import DicomImage
 from tests_basic.utils import save_file, LoadingTestBase, LocationMixin
 
 TEST_DIR = osp.join(osp.dirname(__file__), 'test_files', 'CBCT')
@@ -147,9 +155,18 @@ class CatPhanMixin(LocationMixin):
             meas_mtf = self.cbct.ctp528.mtf(key)
             self.assertAlmostEqual(exp_mtf, meas_mtf, delta=0.1)
 
+    def test_MTF_values_vectorized(self):
+        """Test that a sequence of MTF percents matches the individual values."""
+        percents = list(self.mtf_values.keys())
+        self.assertEqual(self.cbct.ctp528.mtf(percents), [self.cbct.ctp528.mtf(p) for p in percents])
+
     def test_pdf(self):
         save_file(self.cbct.publish_pdf, 'temp')
 
+    def test_region_analyses(self):
+        """Test that each module slice (the CTP404 and any other modules) runs the phantom region analysis at most once."""
+        self.assertLessEqual(self.cbct.num_region_analyses, len(self.cbct.modules) + 1)
+
 
 class CatPhanDemo(CatPhanMixin, TestCase):
     """Test the CBCT demo (Varian high quality head protocol)."""
@@ -180,6 +197,227 @@ class CatPhan4(CatPhanMixin, TestCase):
     slice_thickness = 2.4
 
 
+class ModuleSelection(TestCase):
+    """Test analyzing a subset of modules and building the modules concurrently."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cbct = CatPhan504.from_zip(osp.join(TEST_DIR, 'CBCT_4.zip'))
+
+    @classmethod
+    def tearDownClass(cls):
+        delattr(cls, 'cbct')
+        plt.close('all')
+
+    def test_threaded_matches_serial(self):
+        self.cbct.analyze()
+        serial_hu = {key: roi.pixel_value for key, roi in self.cbct.ctp404.hu_rois.items()}
+        serial_unif = self.cbct.ctp486.uniformity_index
+        clear_localizations()  # so the modules are built rather than taken from the cache
+        threaded = CatPhan504.from_zip(osp.join(TEST_DIR, 'CBCT_4.zip'))
+        threaded.analyze(workers=4)
+        for key, roi in threaded.ctp404.hu_rois.items():
+            self.assertAlmostEqual(roi.pixel_value, serial_hu[key])
+        self.assertAlmostEqual(threaded.ctp486.uniformity_index, serial_unif)
+
+    def test_module_subset(self):
+        self.cbct.analyze(modules=(CTP486,))
+        self.assertEqual(set(self.cbct.analyzed_modules), {CTP404, CTP486})
+        self.assertNotIn('MTF', self.cbct.results())
+        self.cbct.plot_analyzed_image(show=False)
+
+    def test_uniformity_map(self):
+        mean, std = self.cbct.ctp486.uniformity_map()
+        window = self.cbct.ctp486.uniformity_window
+        self.assertEqual(mean.shape, std.shape)
+        # the window centered on the phantom center is within the uniformity of the center ROI
+        size = self.cbct.ctp486.image.array[window].shape[0] - mean.shape[0] + 1
+        center = self.cbct.ctp486.phan_center
+        row, col = int(round(center.y)) - window[0].start - size // 2, int(round(center.x)) - window[1].start - size // 2
+        self.assertAlmostEqual(mean[row, col], self.cbct.ctp486.rois['Center'].pixel_value, delta=5)
+        self.assertGreater(std[row, col], 0)
+
+    def test_small_region_window(self):
+        """A window smaller than the 200mm threshold box uses the whole window for the threshold."""
+        self.cbct.analyze()
+        module = self.cbct.ctp404
+        labeled, regions, num_roi = get_regions(module, fill_holes=True, threshold='mean', window_mm=100)
+        self.assertEqual(labeled.shape, module.image.array.shape)
+        window = module.window(100)
+        window_labeled, _, window_num_roi = get_regions(module.image.array[window], fill_holes=True, threshold='mean')
+        self.assertEqual(num_roi, window_num_roi)
+        self.assertTrue(np.array_equal(labeled[window], window_labeled))
+
+    def test_region_window_matches_whole_slice(self):
+        self.cbct.analyze()
+        windowed_center = self.cbct.ctp404.phan_center
+        self.cbct.region_window_mm = None
+        self.cbct.analyze()
+        del self.cbct.region_window_mm
+        self.assertAlmostEqual(self.cbct.ctp404.phan_center.x, windowed_center.x)
+        self.assertAlmostEqual(self.cbct.ctp404.phan_center.y, windowed_center.y)
+
+    def test_tolerance_reanalysis(self):
+        """Test that changing only tolerances re-evaluates pass/fail without rebuilding the modules."""
+        self.cbct.analyze(hu_tolerance=40)
+        ctp404, ctp486 = self.cbct.ctp404, self.cbct.ctp486
+        self.assertTrue(self.cbct.ctp404.passed_hu)
+        self.cbct.analyze(hu_tolerance=0.5, cnr_threshold=1000)
+        self.assertIs(self.cbct.ctp404, ctp404)
+        self.assertIs(self.cbct.ctp486, ctp486)
+        self.assertEqual(self.cbct.num_region_analyses, 0)
+        self.assertFalse(self.cbct.ctp404.passed_hu)
+        self.assertFalse(self.cbct.ctp486.overall_passed)
+        self.assertEqual(self.cbct.ctp515.rois_visible, 0)
+
+    def test_localization_is_cached(self):
+        cbct = CatPhan504.from_zip(osp.join(TEST_DIR, 'CBCT_4.zip'))
+        self.assertEqual(cbct.dataset_id, self.cbct.dataset_id)
+        self.assertEqual(cbct.num_region_analyses, 0)
+        self.assertEqual(cbct.origin_slice, self.cbct.origin_slice)
+        self.assertEqual(cbct.catphan_roll, self.cbct.catphan_roll)
+
+    def test_modules_are_cached(self):
+        """A new instance of an analyzed dataset reuses the module measurements; its tolerances are its own."""
+        self.cbct.analyze(hu_tolerance=40)
+        cbct = CatPhan504.from_zip(osp.join(TEST_DIR, 'CBCT_4.zip'))
+        cbct.analyze(hu_tolerance=0.5)
+        self.assertEqual(cbct.num_region_analyses, 0)
+        self.assertIsNot(cbct.ctp404, self.cbct.ctp404)
+        for key, roi in cbct.ctp404.hu_rois.items():
+            self.assertEqual(roi.pixel_value, self.cbct.ctp404.hu_rois[key].pixel_value)
+        self.assertFalse(cbct.ctp404.passed_hu)
+        self.assertTrue(self.cbct.ctp404.passed_hu)
+
+    def test_localization_cache_key(self):
+        cbct = CatPhan504.from_zip(osp.join(TEST_DIR, 'CBCT_4.zip'))
+        cbct.region_window_mm = 250
+        cbct.localize()
+        self.assertGreater(cbct.num_region_analyses, 0)
+        clear_localizations()
+        cbct = CatPhan504.from_zip(osp.join(TEST_DIR, 'CBCT_4.zip'))
+        cbct.localize()
+        self.assertGreater(cbct.num_region_analyses, 0)
+
+    def test_unknown_module(self):
+        with self.assertRaises(ValueError):
+            self.cbct.analyze(modules=('CTP528',))
+
+
+class BatchAnalysis(TestCase):
+
+    def test_batch(self):
+        paths = [osp.join(TEST_DIR, 'CBCT_4.zip'), osp.join(TEST_DIR, 'does_not_exist.zip')]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            results = analyze_batch(paths, workers=2, publish_dir=tmpdir)
+            self.assertEqual(os.listdir(tmpdir), ['CBCT_4.pdf'])
+        good, bad = results
+        self.assertIsNone(good['error'])
+        self.assertIsNone(good['publish_error'])
+        self.assertAlmostEqual(good['hu']['Poly'], -33, delta=5)
+        self.assertAlmostEqual(good['slice_thickness'], 2.4, delta=0.3)
+        self.assertEqual(set(good['timings']), {'load', 'analyze', 'publish'})
+        self.assertIsNotNone(bad['error'])
+        self.assertIsNone(bad['passed'])
+
+    def test_publish_error_keeps_results(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            result, = analyze_batch([osp.join(TEST_DIR, 'CBCT_4.zip')], publish_dir=osp.join(tmpdir, 'missing'))
+        self.assertIsNone(result['error'])
+        self.assertIsNotNone(result['publish_error'])
+        self.assertAlmostEqual(result['hu']['Poly'], -33, delta=5)
+        self.assertIn('publish', result['timings'])
+
+
+class ReducedPrecision(TestCase):
+    """Test that the reduced precision modes give the same results as the default."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cbct = CatPhan504.from_zip(osp.join(TEST_DIR, 'CBCT_4.zip'))
+        cls.cbct.analyze()
+
+    def tearDown(self):
+        settings.set_precision('float64')
+
+    def test_bad_precision(self):
+        with self.assertRaises(ValueError):
+            settings.set_precision('float16')
+
+    def test_reduced_precision(self):
+        for precision, dtype in (('float32', 'float32'), ('int16', 'int16')):
+            settings.set_precision(precision)
+            cbct = CatPhan504.from_zip(osp.join(TEST_DIR, 'CBCT_4.zip'))
+            cbct.analyze()
+            self.assertEqual(cbct.dicom_stack[0].array.dtype, dtype)
+            self.assertEqual(cbct.origin_slice, self.cbct.origin_slice)
+            self.assertAlmostEqual(cbct.catphan_roll, self.cbct.catphan_roll, delta=0.01)
+            for name, roi in self.cbct.ctp404.hu_rois.items():
+                self.assertAlmostEqual(cbct.ctp404.hu_rois[name].pixel_value, roi.pixel_value, delta=0.5)
+            self.assertAlmostEqual(cbct.ctp486.uniformity_index, self.cbct.ctp486.uniformity_index, delta=0.05)
+            self.assertEqual(cbct.ctp528.mtf(50), self.cbct.ctp528.mtf(50))
+
+    def test_int16_out_of_range(self):
+        """Raw values above the int16 range are rescaled without wrapping; rescaled values outside it raise."""
+        with zipfile.ZipFile(osp.join(TEST_DIR, 'CBCT_4.zip')) as zfile:
+            name = next(name for name in zfile.namelist() if name.endswith('.dcm'))
+            ds = pydicom.dcmread(io.BytesIO(zfile.read(name)))
+        settings.set_precision('int16')
+        intercept = int(ds.RescaleIntercept)
+        with tempfile.TemporaryDirectory() as tmp:
+            for raw, fits in ((32767 - intercept, True), (32768 - intercept, False)):
+                array = ds.pixel_array.copy()
+                array[0, 0] = raw
+                ds.PixelData = array.tobytes()
+                path = osp.join(tmp, f'{raw}.dcm')
+                ds.save_as(path)
+                if fits:
+                    img = DicomImage(path)
+                    self.assertEqual(img.array.dtype, 'int16')
+                    self.assertEqual(img.array[0, 0], 32767)
+                else:
+                    with self.assertRaises(ValueError):
+                        DicomImage(path)
+
+
+class OffCenterPhantom(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """CBCT_4 padded to 1024x1024 with the phantom shifted 60mm to the right of the image center."""
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        with zipfile.ZipFile(osp.join(TEST_DIR, 'CBCT_4.zip')) as zfile:
+            for name in zfile.namelist():
+                if not name.endswith('.dcm'):
+                    continue
+                ds = pydicom.dcmread(io.BytesIO(zfile.read(name)))
+                if 'PixelData' not in ds:
+                    continue
+                array = ds.pixel_array
+                shift = int(round(60 / float(ds.PixelSpacing[1])))
+                padded = np.full((1024, 1024), array.min(), dtype=array.dtype)
+                top, left = (1024 - array.shape[0]) // 2, (1024 - array.shape[1]) // 2 + shift
+                padded[top:top + array.shape[0], left:left + array.shape[1]] = array
+                ds.Rows, ds.Columns = padded.shape
+                ds.PixelData = padded.tobytes()
+                ds.save_as(osp.join(cls.tmpdir.name, osp.basename(name)))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def test_region_window_matches_whole_slice(self):
+        cbct = CatPhan504(self.tmpdir.name)
+        cbct.analyze()
+        self.assertEqual(cbct.origin_slice, 32)
+        windowed_center = cbct.ctp404.phan_center
+        self.assertGreater(windowed_center.x, 512 + 50 / cbct.mm_per_pixel)
+        cbct.region_window_mm = None
+        cbct.analyze()
+        self.assertAlmostEqual(cbct.ctp404.phan_center.x, windowed_center.x, delta=0.1)
+        self.assertAlmostEqual(cbct.ctp404.phan_center.y, windowed_center.y, delta=0.1)
+
+
 class Elekta2(CatPhanMixin, TestCase):
     """An Elekta CBCT dataset"""
     catphan = CatPhan503
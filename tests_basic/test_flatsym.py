@@ -3,9 +3,11 @@ from unittest import TestCase
 import os.path as osp
 from functools import partial
 
+import numpy as np
+
 from pylinac.core.exceptions import NotAnalyzed
 from pylinac.core.io import retrieve_demo_file
-from pylinac.flatsym import FlatSym
+from pylinac.flatsym import FlatSym, FlatSymSeries
 
 from tests_basic.utils import has_www_connection, LocationMixin, save_file
 
@@ -115,6 +117,19 @@ class FlatSymBase(LocationMixin):
     def test_horiz_flatness(self):
         self.assertAlmostEqual(self.fs.flatness['horizontal']['value'], self.horiz_flatness, delta=0.2)
 
+    def test_map_matches_profiles(self):
+        maps = self.fs.analyze_map(flatness_method=self.flatness_method, symmetry_method=self.symmetry_method)
+        row = int(round(self.fs.array.shape[0] * self.horiz_position))
+        column = int(round(self.fs.array.shape[1] * self.vert_position))
+        self.assertAlmostEqual(maps['rows']['flatness'][row], self.fs.flatness['horizontal']['value'])
+        self.assertAlmostEqual(maps['rows']['symmetry'][row], self.fs.symmetry['horizontal']['value'])
+        self.assertAlmostEqual(maps['columns']['flatness'][column], self.fs.flatness['vertical']['value'])
+        self.assertAlmostEqual(maps['columns']['symmetry'][column], self.fs.symmetry['vertical']['value'])
+        self.assertEqual(len(maps['diagonals']['flatness']), 2)
+        # rows & columns beyond the field aren't evaluated
+        self.assertTrue(np.isnan(maps['rows']['flatness'][0]))
+        self.assertTrue(np.isnan(maps['columns']['symmetry'][-1]))
+
 
 class FlatSymDemo(FlatSymBase, TestCase):
     vert_flatness = 1.93
@@ -141,3 +156,39 @@ class FlatSym18X(FlatSymBase, TestCase):
     vert_symmetry = 1.23
     horiz_flatness = 1.79
     horiz_symmetry = 1.16
+
+
+class FlatSymSeriesTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        demo = retrieve_demo_file(url='flatsym_demo.dcm')
+        cls.series = FlatSymSeries([demo, demo, demo], workers=2)
+        cls.series.analyze(flatness_method='varian', symmetry_method='varian')
+
+    def test_results_fail_if_not_analyzed(self):
+        series = FlatSymSeries([retrieve_demo_file(url='flatsym_demo.dcm')])
+        with self.assertRaises(NotAnalyzed):
+            series.results()
+        with self.assertRaises(NotAnalyzed):
+            series.profiles
+
+    def test_summary(self):
+        summary = self.series.summary()
+        self.assertEqual(len(summary['file']), 3)
+        self.assertAlmostEqual(summary['vertical flatness'][1], 1.93, delta=0.2)
+        self.assertAlmostEqual(summary['horizontal symmetry'][2], 2.99, delta=0.2)
+        statistics = self.series.statistics()
+        self.assertAlmostEqual(statistics['vertical symmetry']['mean'], 2.46, delta=0.2)
+        self.assertAlmostEqual(statistics['horizontal flatness']['std'], 0)
+
+    def test_profiles(self):
+        profiles = self.series.profiles
+        self.assertEqual(profiles['vertical'].shape, (3, self.series.images[0].array.shape[0]))
+        self.assertEqual(profiles['horizontal'].shape, (3, self.series.images[0].array.shape[1]))
+
+    def test_results(self):
+        self.assertIsInstance(self.series.results(), str)
+
+    def test_pdf(self):
+        save_file(self.series.publish_pdf)
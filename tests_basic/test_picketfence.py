@@ -1,9 +1,11 @@
 import os.path as osp
-from unittest import TestCase, skip
+from unittest import TestCase
 
 import matplotlib.pyplot as plt
+import numpy as np
 
-from pylinac.picketfence import PicketFence, UP_DOWN, LEFT_RIGHT
+from pylinac.core.profile import SingleProfile
+from pylinac.picketfence import PicketFence, PicketFenceSeries, PFDicomImage, load_log_pickets, LogPickets, UP_DOWN, LEFT_RIGHT
 from tests_basic.utils import save_file, LoadingTestBase, LocationMixin
 
 TEST_DIR = osp.join(osp.dirname(__file__), 'test_files', 'Picket Fence')
@@ -17,12 +19,39 @@ class TestLoading(LoadingTestBase, TestCase):
     def test_filter_on_load(self):
         PicketFence(self.constructor_input, filter=3)  # shouldn't raise
 
-    @skip
     def test_load_with_log(self):
         log_file = osp.join(TEST_DIR, 'PF_log.bin')
         pf_file = osp.join(TEST_DIR, 'PF.dcm')
         pf = PicketFence(pf_file, log=log_file)
         pf.analyze(hdmlc=True)
+        self.assertEqual(pf.num_pickets, 6)
+        self.assertAlmostEqual(pf.abs_median_error, 0.14, delta=0.05)
+
+
+class TestLeafSampling(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pf = PicketFence(osp.join(TEST_DIR, 'AS500_PF.dcm'))
+        cls.pf.analyze()
+
+    def test_batched_matches_single_leaf(self):
+        """Test that sampling all the leaves at once matches the FWXM center of each leaf's own profile."""
+        self.assertEqual(self.pf.settings.orientation, UP_DOWN)  # leaves are rows of the picket array
+        for picket in self.pf.pickets:
+            picket_array = np.asarray(picket.picket_array)
+            threshold = np.percentile(picket_array, 80)
+            leaf_centers = self.pf.settings.leaf_centers
+            mlc_positions = picket.find_mlc_peaks(leaf_centers)
+            self.assertGreater(np.count_nonzero(~np.isnan(mlc_positions)), 0)
+            for leaf_center, mlc_position in zip(leaf_centers, mlc_positions):
+                mlc_rows = np.arange(leaf_center - picket.sample_width, leaf_center + picket.sample_width + 1)
+                pix_vals = np.median(picket_array[mlc_rows, :], axis=0)
+                if max(pix_vals) > threshold:
+                    expected = SingleProfile(pix_vals).fwxm_center(70, interpolate=True) + picket.approximate_idx - picket.spacing
+                    self.assertAlmostEqual(mlc_position, expected, places=6)
+                else:
+                    self.assertTrue(np.isnan(mlc_position))
 
 
 class GeneralTests(TestCase):
@@ -57,6 +86,105 @@ class TestPlottingSaving(TestCase):
         save_file(self.pf.save_analyzed_image)
 
 
+class TestLogPickets(TestCase):
+
+    def test_positions(self):
+        log_pickets = load_log_pickets(osp.join(TEST_DIR, 'PF_log.bin'))
+        self.assertTrue(log_pickets.hdmlc)
+        self.assertEqual(log_pickets.positions.shape, (6, 60))
+        central_pair = log_pickets.positions[:, 29]
+        self.assertTrue(np.allclose(central_pair, [-50, -30, -10, 10, 30, 50]))
+
+    def test_cached_by_file(self):
+        log_file = osp.join(TEST_DIR, 'PF_log.bin')
+        self.assertIs(load_log_pickets(log_file), load_log_pickets(log_file))
+
+    def test_fits_match_pickets(self):
+        pf = PicketFence(osp.join(TEST_DIR, 'PF.dcm'), log=osp.join(TEST_DIR, 'PF_log.bin'))
+        pf.analyze(hdmlc=True)
+        fits = pf.settings.log_fits
+        self.assertEqual(len(fits), 6)
+        # each picket is compared to its own log picket
+        self.assertEqual(len({id(picket.fit) for picket in pf.pickets}), 6)
+
+    def test_fit_convention(self):
+        """The first pair is toward the smallest pixel index and positive positions toward larger pixel indices."""
+        pf = PicketFence(osp.join(TEST_DIR, 'PF.dcm'), log=osp.join(TEST_DIR, 'PF_log.bin'))
+        pf.analyze(hdmlc=True)
+        settings = pf.settings
+        pair_centers = LogPickets(np.zeros((1, 60)), hdmlc=True).pair_centers
+        positions = 15 + 0.05 * pair_centers[np.newaxis]  # a slanted picket, ~10mm at the first pair to ~20mm at the last
+        log_pickets = LogPickets(positions, hdmlc=True)
+        fit = log_pickets.fits(settings)[0]
+        if settings.orientation == UP_DOWN:
+            leaf_cax, travel_cax = settings.image_center.y, settings.image_center.x
+        else:
+            leaf_cax, travel_cax = settings.image_center.x, settings.image_center.y
+        first_pair, last_pair = pair_centers[[0, -1]] * settings.dpmm + leaf_cax
+        self.assertLess(first_pair, last_pair)
+        self.assertAlmostEqual(fit(first_pair), travel_cax + positions[0, 0] * settings.dpmm)
+        self.assertAlmostEqual(fit(last_pair), travel_cax + positions[0, -1] * settings.dpmm)
+        self.assertLess(positions[0, 0], positions[0, -1])
+
+    def test_mismatched_log_raises(self):
+        """Image pickets that aren't near any log picket, e.g. because the image is mirrored, raise."""
+        pf = PicketFence(osp.join(TEST_DIR, 'PF.dcm'), log=osp.join(TEST_DIR, 'PF_log.bin'))
+        pf._log_pickets = LogPickets(pf._log_pickets.positions + 10, hdmlc=True)
+        with self.assertRaises(ValueError):
+            pf.analyze(hdmlc=True)
+
+    def test_other_mlcs_raise(self):
+        with self.assertRaises(ValueError):
+            LogPickets(np.zeros((3, 40)), hdmlc=False)
+
+
+class TestSeries(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.paths = [osp.join(TEST_DIR, name) for name in ('AS500_PF.dcm', 'PF.dcm', 'AS500_PF.dcm')]
+        cls.series = PicketFenceSeries(cls.paths, workers=2)
+        cls.series.analyze()
+
+    def test_shared_settings(self):
+        pfs = self.series.picket_fences
+        self.assertIs(pfs[0].settings, pfs[2].settings)
+        self.assertIsNot(pfs[0].settings, pfs[1].settings)
+
+    def test_matches_single_analysis(self):
+        for path, series_pf in zip(self.paths, self.series.picket_fences):
+            pf = PicketFence(path)
+            pf.analyze()
+            self.assertEqual(pf.orientation, series_pf.orientation)
+            self.assertEqual(pf.max_error, series_pf.max_error)
+
+    def test_error_matrix(self):
+        errors = self.series.error_matrix
+        self.assertEqual(errors.shape, (3, 46, 10))
+        self.assertAlmostEqual(np.nanmax(errors[0]), self.series.picket_fences[0].max_error)
+        # the second image has only 6 pickets; the rest is padding
+        self.assertTrue(np.isnan(errors[1, :, 6:]).all())
+
+    def test_collimator_angle_geometry(self):
+        """Images at another collimator angle get their own orientation."""
+        series = PicketFenceSeries(self.paths[:1] * 2)
+        for pf in series.picket_fences:
+            pf.image.array = pf.image.array[:, 64:448]  # square, so the rotated image has the same shape
+        rotated = series.picket_fences[1].image
+        rotated.array = np.rot90(rotated.array)
+        rotated.metadata.BeamLimitingDeviceAngle = 90
+        series.analyze()
+        pfs = series.picket_fences
+        self.assertIsNot(pfs[0].settings, pfs[1].settings)
+        self.assertEqual(pfs[0].orientation, UP_DOWN)
+        self.assertEqual(pfs[1].orientation, LEFT_RIGHT)
+
+    def test_not_analyzed(self):
+        series = PicketFenceSeries(self.paths[:1])
+        with self.assertRaises(AttributeError):
+            series.error_matrix
+
+
 class PFTestMixin(LocationMixin):
     """Base Mixin for testing a picketfence image."""
     dir_location = TEST_DIR
@@ -136,3 +264,9 @@ class MultipleImagesPF(PFTestMixin, TestCase):
         path2 = osp.join(TEST_DIR, 'combo-mlc.dcm')
         cls.pf = PicketFence.from_multiple_images([path1, path2])
         cls.pf.analyze(hdmlc=cls.hdmlc, sag_adjustment=cls.sag_adjustment, orientation='left', invert=True)
+
+    def test_image_from_first_frame(self):
+        """Test that the combined image keeps the metadata and data type of the first image."""
+        first = PFDicomImage(osp.join(TEST_DIR, 'combo-jaw.dcm'))
+        self.assertEqual(self.pf.image.metadata.SOPInstanceUID, first.metadata.SOPInstanceUID)
+        self.assertEqual(self.pf.image.array.dtype, first.array.dtype)
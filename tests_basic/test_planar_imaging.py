@@ -12,6 +12,11 @@ TEST_DIR = osp.join(osp.dirname(__file__), 'test_files', 'Planar imaging')
 class PlanarPhantomMixin(LocationMixin):
     klass = object
     dir_location = TEST_DIR
+    phantom_center = None
+    phantom_radius = None
+    phantom_angle = None
+    mtf_50 = None
+    low_contrast_visible = None
 
     @classmethod
     def setUpClass(cls):
@@ -28,6 +33,26 @@ class PlanarPhantomMixin(LocationMixin):
         self.instance.analyze()
         self.instance.analyze(invert=True)
 
+    def test_phantom_location(self):
+        self.instance.analyze()
+        if self.phantom_center is not None:
+            self.assertAlmostEqual(self.instance.phantom_center.x, self.phantom_center[0], delta=1)
+            self.assertAlmostEqual(self.instance.phantom_center.y, self.phantom_center[1], delta=1)
+        if self.phantom_radius is not None:
+            self.assertAlmostEqual(self.instance.phantom_radius, self.phantom_radius, delta=0.5)
+
+    def test_angle(self):
+        if self.phantom_angle is not None:
+            self.instance.analyze()
+            self.assertAlmostEqual(self.instance.phantom_angle, self.phantom_angle, delta=1)
+
+    def test_contrast(self):
+        self.instance.analyze()
+        if self.mtf_50 is not None:
+            self.assertAlmostEqual(self.instance._mtf(50), self.mtf_50, delta=0.05)
+        if self.low_contrast_visible is not None:
+            self.assertEqual(sum(roi.passed for roi in self.instance.lc_rois), self.low_contrast_visible)
+
     def test_plotting(self):
         self.instance.plot_analyzed_image()
         self.instance.plot_analyzed_image(low_contrast=False, high_contrast=False)
@@ -53,6 +78,11 @@ class LeedsDemo(LeedsTORTestMixin, TestCase):
 
 class LeedsCCW(LeedsTORTestMixin, TestCase):
     file_path = ['Leeds_ccw.dcm']
+    phantom_center = (515.5, 387.8)
+    phantom_radius = 295.4
+    phantom_angle = -1.6
+    mtf_50 = 0.66
+    low_contrast_visible = 6
 
 
 class SIQC3TestMixin(PlanarPhantomMixin):
@@ -67,6 +97,11 @@ class SIQC3Demo(SIQC3TestMixin, TestCase):
 
 class SIQC3_1(SIQC3TestMixin, TestCase):
     file_path = ['QC3 2.5MV.dcm']
+    phantom_center = (643.5, 640.5)
+    phantom_radius = 48.2
+    phantom_angle = -45.3
+    mtf_50 = 2.98
+    low_contrast_visible = 5
 
 
 class LasVegasTestMixin(PlanarPhantomMixin):
@@ -78,12 +113,30 @@ class LasVegasTestMixin(PlanarPhantomMixin):
         self.instance.plot_analyzed_image(low_contrast=False)
         self.instance.plot_analyzed_image(image=False, low_contrast=False)
 
-    def test_angle(self):
-        self.assertAlmostEqual(self.instance.phantom_angle, self.phantom_angle, delta=1)
-
 
 class LasVegasDemo(LasVegasTestMixin, TestCase):
     phantom_angle = 284
 
     def test_demo(self):
         LasVegas.run_demo()  # shouldn't raise
+
+
+class PhantomWindow(TestCase):
+    """Test the downsampled phantom registration on local images."""
+    images = ((StandardImagingQC3, 'QC3 2.5MV.dcm'), (LeedsTOR, 'Leeds_ccw.dcm'))
+
+    def test_phantom_window(self):
+        for klass, name in self.images:
+            with self.subTest(name):
+                phantom = klass(osp.join(TEST_DIR, name))
+                phantom.analyze()
+                rows, cols = phantom._find_phantom_window()
+                self.assertLess(phantom.image.array[rows, cols].size, phantom.image.array.size)
+                self.assertTrue(cols.start <= phantom.phantom_center.x < cols.stop)
+                self.assertTrue(rows.start <= phantom.phantom_center.y < rows.stop)
+
+    def test_regions_cached(self):
+        for klass, name in self.images:
+            with self.subTest(name):
+                phantom = klass(osp.join(TEST_DIR, name))
+                self.assertIs(phantom._get_canny_regions(), phantom._get_canny_regions())
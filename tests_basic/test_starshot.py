@@ -141,6 +141,20 @@ class Starshot1(StarMixin, TestCase):
     num_rad_lines = 4
 
 
+class TestThreadedSearch(TestCase):
+
+    def test_threaded_search_matches_serial(self):
+        """Test that evaluating the recursive search on a thread pool gives the serial result."""
+        path = osp.join(TEST_DIR, 'Starshot#1.tif')
+        serial = Starshot(path, sid=1000)
+        serial.analyze(radius=0.3, min_peak_height=0.1)
+        threaded = Starshot(path, sid=1000)
+        threaded.analyze(radius=0.3, min_peak_height=0.1, workers=4)
+        self.assertAlmostEqual(threaded.wobble.diameter_mm, serial.wobble.diameter_mm, places=6)
+        self.assertAlmostEqual(threaded.wobble.center.x, serial.wobble.center.x, places=6)
+        self.assertAlmostEqual(threaded.wobble.center.y, serial.wobble.center.y, places=6)
+
+
 class Starshot1FWHM(Starshot1):
     fwhm = False
 
@@ -1,11 +1,15 @@
 from functools import partial
 from os import path as osp
+import tempfile
 from typing import Union, List
 from unittest import TestCase
 
+import pydicom
+
 from pylinac.core.geometry import Point
 from pylinac.core.io import retrieve_demo_file
 from pylinac import DRGS, DRMLC
+from pylinac.vmat import analyze_batch, pair_images
 
 from tests_basic.utils import save_file, has_www_connection
 
@@ -116,6 +120,23 @@ class VMATMixin:
             within_1(self.vmat.segments[key].r_dev, value['r_dev'])
             within_1(self.vmat.segments[key].r_corr, value['r_corr'])
 
+    def test_r_corr_matches_segment_slices(self):
+        for segment in self.vmat.segments:
+            top, bottom, left, right = segment.bounds
+            dmlc = self.vmat.dmlc_image.array[top:bottom, left:right].mean()
+            open_value = self.vmat.open_image.array[top:bottom, left:right].mean()
+            self.assertAlmostEqual(segment.r_corr, dmlc / open_value * 100)
+
+    def test_r_corr_edge_segment(self):
+        """A segment running past the image edge is the ratio of the means of its pixels inside the image."""
+        segment = self.vmat.segments[-1]
+        segment.center.x = self.vmat.dmlc_image.shape[1] - segment.width / 4
+        self.vmat._update_r_corrs()
+        top, bottom, left, right = segment.bounds
+        dmlc = self.vmat.dmlc_image.array[top:bottom, left:right].mean()
+        open_value = self.vmat.open_image.array[top:bottom, left:right].mean()
+        self.assertAlmostEqual(segment.r_corr, dmlc / open_value * 100)
+
     def test_deviations(self):
         self.assertAlmostEqual(self.vmat.avg_abs_r_deviation, self.avg_abs_r_deviation, delta=0.05)
         self.assertAlmostEqual(self.vmat.avg_r_deviation, self.avg_r_deviation, delta=0.02)
@@ -216,3 +237,51 @@ class TestDRGS2(VMATMixin, TestCase):
     avg_r_deviation = 0
     max_r_deviation = 1.6
     passes = False
+
+
+class TestBatch(TestCase):
+    """Test pairing and analyzing a folder of images. The test images share an anonymized SeriesInstanceUID,
+    so copies with a distinct UID per pair are written."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.paths = []
+        for idx, names in enumerate((('DRGS#2_dmlc.dcm', 'DRGS#2_open.dcm'), ('DRMLC#2_dmlc.dcm', 'DRMLC#2_open.dcm'),
+                                     ('no_test_type_dmlc.dcm', 'no_test_type_open.dcm'))):
+            for name in names:
+                ds = pydicom.dcmread(osp.join(TEST_DIR, name))
+                ds.SeriesInstanceUID = '1.2.3.{}'.format(idx)
+                path = osp.join(cls.tmpdir.name, name)
+                ds.save_as(path)
+                cls.paths.append(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def test_pair_images(self):
+        pairs = pair_images(self.paths + [osp.join(TEST_DIR, 'DRMLC.zip')])
+        self.assertEqual(pairs, [tuple(self.paths[0:2]), tuple(self.paths[2:4]), tuple(self.paths[4:6])])
+
+    def test_unpaired_series_are_ignored(self):
+        self.assertEqual(pair_images(self.paths[:3]), [tuple(self.paths[0:2])])
+
+    def test_analyze_batch(self):
+        results = analyze_batch(self.paths)
+        drgs, drmlc, unknown = results
+        self.assertEqual(drgs['test'], 'DR/GS')
+        self.assertEqual(len(drgs['r_devs']), 7)
+        self.assertAlmostEqual(drgs['max_r_deviation'], 1.6, delta=0.1)
+        self.assertFalse(drgs['passed'])
+        self.assertEqual(drmlc['test'], 'DR/MLCS')
+        self.assertTrue(drmlc['passed'])
+        self.assertIsNone(drmlc['error'])
+        self.assertIn('analyze', drmlc['timings'])
+        # the test type can't be determined from these file names
+        self.assertIsNotNone(unknown['error'])
+
+    def test_analyze_batch_with_test_type(self):
+        results = analyze_batch(self.paths[2:], test_type=DRMLC, workers=2)
+        self.assertEqual([result['test'] for result in results], ['DR/MLCS', 'DR/MLCS'])
+        self.assertTrue(all(result['error'] is None for result in results))
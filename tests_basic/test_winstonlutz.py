@@ -3,9 +3,10 @@ from unittest import TestCase
 
 import matplotlib.pyplot as plt
 import numpy as np
+from scipy import ndimage, optimize
 
 from pylinac import WinstonLutz
-from pylinac.winston_lutz import GANTRY, COLLIMATOR, COUCH, REFERENCE
+from pylinac.winston_lutz import GANTRY, COLLIMATOR, COUCH, REFERENCE, WLImageResult, _highest_threshold
 from pylinac.core.geometry import Vector, vector_is_close
 from tests_basic import TEST_BANK_DIR, TEST_FILES_DIR
 from tests_basic.utils import save_file, LoadingTestBase, LocationMixin
@@ -30,6 +31,86 @@ class GeneralTests(TestCase):
         print(self.wl.results())  # shouldn't raise
 
 
+class TestBBSearch(TestCase):
+
+    def test_coarse_to_fine_matches_full_search(self):
+        wl = WinstonLutz.from_zip(osp.join(TEST_FILES_DIR, 'Winston-Lutz', 'lat3mm.zip'))
+        for img in wl.images:
+            hmin, hmax = np.percentile(img.array, [5, 99.9])
+            coarse_to_fine = ndimage.center_of_mass(img._find_bb_coarse_to_fine(hmin, hmax))
+            full = ndimage.center_of_mass(img._find_bb_full(hmin, hmax))
+            self.assertTrue(np.allclose(coarse_to_fine, full, atol=0.5))
+
+
+    def test_threshold_bisection(self):
+        """The threshold is stepped down to the first success and then bisected, not stepped finely."""
+        calls = []
+
+        def find(threshold):
+            calls.append(threshold)
+            if threshold > 0.37:
+                raise ValueError
+            return threshold
+
+        threshold, result = _highest_threshold(find, 1, 0, 0.05)
+        self.assertEqual(result, threshold)
+        self.assertAlmostEqual(threshold, 0.37, delta=0.05 / 2 ** 4)
+        self.assertLessEqual(threshold, 0.37)
+        self.assertEqual(len(calls), 14 + 4)
+        with self.assertRaises(ValueError):
+            _highest_threshold(find, 1, 0.5, 0.05)
+        self.assertEqual(_highest_threshold(find, 0.2, 0, 0.05)[0], 0.2)
+
+
+class TestParallelAnalysis(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        wl_zip = osp.join(TEST_FILES_DIR, 'Winston-Lutz', 'lat3mm.zip')
+        cls.wl_serial = WinstonLutz.from_zip(wl_zip)
+        cls.wl_parallel = WinstonLutz.from_zip(wl_zip, workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        plt.close('all')
+
+    def test_results_match(self):
+        self.assertIsInstance(self.wl_parallel.images[0], WLImageResult)
+        self.assertAlmostEqual(self.wl_parallel.gantry_iso_size, self.wl_serial.gantry_iso_size)
+        self.assertAlmostEqual(self.wl_parallel.cax2bb_distance('max'), self.wl_serial.cax2bb_distance('max'))
+        self.assertTrue(vector_is_close(self.wl_parallel.bb_shift_vector, self.wl_serial.bb_shift_vector))
+
+    def test_plotting(self):
+        self.wl_parallel.plot_summary(show=False)  # shouldn't raise
+        self.wl_parallel.plot_images(show=False)  # shouldn't raise
+
+
+class TestAxisMinimization(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.wl = WinstonLutz.from_zip(osp.join(TEST_FILES_DIR, 'Winston-Lutz', 'lutz.zip'), use_filenames=True)
+
+    def test_parameters(self):
+        """The gantry and collimator fit an (x, y, z) point; the couch fits an (x, y) center and radius."""
+        for axis in (GANTRY, COLLIMATOR, COUCH):
+            self.assertEqual(len(self.wl._minimize_axis(axis).x), 3)
+        self.assertAlmostEqual(self.wl.couch_iso_size, 2 * self.wl._minimize_axis(COUCH).x[2])
+
+    def test_couch_circle(self):
+        """The couch circle is no worse than a derivative-free fit of the maximum distance to the circle."""
+        vectors = np.array([[img.cax2bb_vector.x, img.cax2bb_vector.y] for img in self.wl.images
+                            if img.variable_axis in (COUCH, REFERENCE)])
+
+        def max_distance(p):
+            return np.max(np.abs(np.hypot(*(vectors - p[:2]).T) - p[2]))
+
+        reference = optimize.minimize(max_distance, [0, 0, 0.5], method='Nelder-Mead', options={'xatol': 1e-8, 'fatol': 1e-10})
+        result = self.wl._minimize_axis(COUCH)
+        self.assertAlmostEqual(result.fun, max_distance(result.x))
+        self.assertLessEqual(result.fun, reference.fun + 1e-4)
+
+
 class TestPlottingSaving(TestCase):
 
     def setUp(self):